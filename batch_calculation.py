@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Prototype"
+
+""" Calculate the compatibility between one reference graph and many candidate
+graphs in parallel
+"""
+
+from compatibility_lib import Graph
+from compatibility_lib import create_graph
+from compatibility_calculation import calculate_final_compatibility
+from compatibility_calculation import calculate_global_compatibility
+from compatibility_calculation import calculate_initial_compatibility
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import logging
+import click
+import glob
+import time
+import os
+
+
+# create logger
+logger = logging.getLogger("BATCH")
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+SUMMARY_COLUMNS = ["candidate", "graph_name", "num_of_states", "iterations",
+                   "initial_comp", "global_comp", "time"]
+
+# reference graph of a worker process, set once by init_worker
+_reference_graph = None
+
+
+def find_candidates(candidates:str) -> list:
+    """List the candidate json files
+
+    Args:
+        candidates (str): directory containing json files or a glob pattern
+
+    Returns:
+        list: sorted paths of the candidate files
+    """
+    if os.path.isdir(candidates):
+        candidates = os.path.join(candidates, "*.json")
+
+    return sorted(path for path in glob.glob(candidates) if os.path.isfile(path))
+
+
+def init_worker(reference_graph:Graph, log_level:int):
+    """Initialize a worker process, the reference graph is sent only once per worker
+
+    Args:
+        reference_graph (Graph): parsed reference graph
+        log_level (int): level of the COMPATIBILITY logger
+    """
+    global _reference_graph
+    _reference_graph = reference_graph
+    logging.getLogger("COMPATIBILITY").setLevel(log_level)
+
+
+def compare_candidate(path:str, iterate:int, engine:str, tolerance:float = None) -> tuple:
+    """Calculate the compatibility between the reference graph and a candidate
+
+    Args:
+        path (str): path to the json file of the candidate
+        iterate (int): (maximum) number of iteration
+        engine (str): "python", "numpy" or "worklist"
+        tolerance (float, optional): early stopping tolerance. Defaults to None.
+
+    Returns:
+        tuple: (summary row, matrix of the last iteration)
+    """
+    start_time = time.perf_counter()
+    candidate_graph = create_graph(path)
+
+    comp_matrix, iterations = calculate_final_compatibility(_reference_graph, candidate_graph, iterate,
+                                                            engine, tolerance)
+
+    summary = [path,
+               candidate_graph._name,
+               len(candidate_graph.get_states_list()),
+               iterations,
+               calculate_initial_compatibility(_reference_graph, candidate_graph, comp_matrix),
+               round(calculate_global_compatibility(comp_matrix), 3),
+               round(time.perf_counter() - start_time, 3)]
+
+    return (summary, comp_matrix)
+
+
+def compare_candidates(reference_graph:Graph,
+                       paths:list,
+                       iterate:int,
+                       engine:str = "python",
+                       tolerance:float = None,
+                       jobs:int = None,
+                       log_level:int = logging.CRITICAL) -> tuple:
+    """Compare the reference graph with every candidate in a process pool
+
+    Args:
+        reference_graph (Graph): parsed reference graph
+        paths (list): paths to the json files of the candidates
+        iterate (int): (maximum) number of iteration
+        engine (str, optional): "python", "numpy" or "worklist". Defaults to "python".
+        tolerance (float, optional): early stopping tolerance. Defaults to None.
+        jobs (int, optional): number of worker processes. Defaults to None,
+                              i.e. number of cores.
+        log_level (int, optional): level of the COMPATIBILITY logger in the
+                                   workers. Defaults to logging.CRITICAL.
+
+    Returns:
+        tuple: (summary table, dict path -> matrix of the last iteration)
+    """
+    rows = []
+    matrices = {}
+
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=init_worker,
+                             initargs=(reference_graph, log_level)) as executor:
+        futures = {executor.submit(compare_candidate, path, iterate, engine, tolerance): path for path in paths}
+
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summary, comp_matrix = future.result()
+            except Exception as error:
+                logger.error("candidate = %s failed: %s", path, error)
+                rows.append([path, None, None, None, None, None, None])
+            else:
+                logger.info("candidate = %s done", path)
+                rows.append(summary)
+                matrices[path] = comp_matrix
+
+    summary_table = pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+    summary_table = summary_table.sort_values("candidate").reset_index(drop=True)
+
+    return (summary_table, matrices)
+
+
+@click.command()
+@click.option("--reference", required=True, help="path to the json file containing the reference graph")
+@click.option("--candidates", required=True,
+              help="directory or glob pattern of the json files containing the candidate graphs")
+@click.option("--iterate", help="number of iteration", default = 1)
+@click.option("--tolerance", help="stop a comparison early when the max change of an iteration is below this value",
+              type=float, default = None)
+@click.option("--engine", help="calculation engine: python, numpy or worklist", default = "python",
+              type=click.Choice(["python", "numpy", "worklist"]))
+@click.option("--jobs", help="number of worker processes, default is the number of cores", type=int, default = None)
+@click.option("--output", help="file to store the summary and the final matrices", default = "batch_result.txt")
+@click.option("--log_level", help="logging level: info, debug, or none", default = "none")
+def batch_calculation(reference, candidates, iterate, tolerance, engine, jobs, output, log_level):
+    if log_level == "none":
+        worker_log_level = logging.CRITICAL
+    elif log_level == "info":
+        worker_log_level = logging.INFO
+    elif log_level == "debug":
+        worker_log_level = logging.DEBUG
+    else:
+        worker_log_level = logging.CRITICAL
+
+    paths = find_candidates(candidates)
+    if len(paths) == 0:
+        logger.error("no candidate found in %s", candidates)
+        return
+
+    reference_graph = create_graph(reference)
+    logger.info("reference = %s, %d candidates, %s workers", reference, len(paths), jobs or os.cpu_count())
+
+    summary_table, matrices = compare_candidates(reference_graph, paths, iterate, engine, tolerance,
+                                                 jobs, worker_log_level)
+
+    print("")
+    print("Summary:")
+    print(summary_table.to_string())
+    print("")
+
+    with open(output, "w") as file:
+        file.write("Reference = {}\n\n".format(reference))
+        file.write(summary_table.to_string())
+        file.write("\n\n")
+
+        for path in summary_table["candidate"]:
+            if path in matrices:
+                file.write("For candidate = {}\n".format(path))
+                file.write(matrices[path].to_string())
+                file.write("\n\n")
+
+    print("Batch calculation is complete. The result is exported to {}".format(output))
+
+
+if __name__ == "__main__":
+    batch_calculation()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+""" Benchmarks of the parser and of the compatibility calculation
+"""
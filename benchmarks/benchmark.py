@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+""" Time the parser and the compatibility calculation on generated graphs
+
+For every size, a graph pair is generated with a fixed seed and the following
+scenarios are timed:
+    parse: create_graph of the first graph
+    one_iteration: one iteration, including the label table and engine setup
+    iterations: --iterations iterations, including the setup
+
+The wall time and the CPU time of every repetition are written to a json file,
+so two runs can be compared to find a performance regression. Run it from the
+root of the repository:
+
+    python -m benchmarks.benchmark --sizes 10 --sizes 100 --output benchmark_result.json
+"""
+
+from compatibility_lib import create_graph
+from compatibility_calculation import calculate_final_compatibility
+from compatibility_calculation import calculate_sparse_compatibility
+from .generate_graph import generate_graph_pair, write_graph
+import statistics
+import subprocess
+import tempfile
+import platform
+import datetime
+import logging
+import pandas as pd
+import numpy as np
+import click
+import json
+import time
+import os
+
+
+# create logger
+logger = logging.getLogger("BENCHMARK")
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+# the calculation must not log while it is timed
+logging.getLogger("COMPATIBILITY").setLevel(logging.CRITICAL)
+
+
+def measure(function, repeat:int) -> dict:
+    """Call a function several times and measure it
+
+    Args:
+        function: function without argument
+        repeat (int): number of calls
+
+    Returns:
+        dict: wall and cpu times of every call, in seconds
+    """
+    wall_times = []
+    cpu_times = []
+    for i in range(repeat):
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        function()
+        cpu_times.append(time.process_time() - start_cpu)
+        wall_times.append(time.perf_counter() - start_wall)
+
+    return {"wall_times": wall_times,
+            "cpu_times": cpu_times,
+            "wall_min": min(wall_times),
+            "wall_median": statistics.median(wall_times),
+            "cpu_min": min(cpu_times)}
+
+
+def get_environment() -> dict:
+    """Describe the machine and the code being measured
+
+    Returns:
+        dict: environment of the benchmark
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__}
+
+
+def run_benchmark(sizes:list,
+                  engines:list,
+                  iterations:int = 10,
+                  repeat:int = 3,
+                  max_python_states:int = 100,
+                  generator_options:dict = None) -> list:
+    """Run all the scenarios
+
+    Args:
+        sizes (list): number of states of the generated graphs
+        engines (list): "python", "numpy", "worklist" and/or "sparse"
+        iterations (int, optional): number of iterations of the iterations
+                                    scenario. Defaults to 10.
+        repeat (int, optional): repetitions of each scenario. Defaults to 3.
+        max_python_states (int, optional): the python engine is skipped above
+                                           this size. Defaults to 100.
+        generator_options (dict, optional): options of generate_graph_pair.
+                                            Defaults to None.
+
+    Returns:
+        list: one result per scenario, size and engine
+    """
+    generator_options = generator_options or {}
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for num_of_states in sizes:
+            graph1_dict, graph2_dict = generate_graph_pair(num_of_states, **generator_options)
+            path1 = os.path.join(directory, "graph1_{}.json".format(num_of_states))
+            path2 = os.path.join(directory, "graph2_{}.json".format(num_of_states))
+            write_graph(graph1_dict, path1)
+            write_graph(graph2_dict, path2)
+
+            common = {"states": num_of_states,
+                      "transitions": sum(len(state["transitions"]) for state in graph1_dict["states"]),
+                      "cells": num_of_states*num_of_states}
+
+            logger.info("states = %d, scenario = parse", num_of_states)
+            result = {"scenario": "parse", "engine": None}
+            result.update(common)
+            result.update(measure(lambda: create_graph(path1), repeat))
+            results.append(result)
+
+            graph1 = create_graph(path1)
+            graph2 = create_graph(path2)
+
+            for engine in engines:
+                for scenario, num_of_iterations in (("one_iteration", 1), ("iterations", iterations)):
+                    result = {"scenario": scenario, "engine": engine, "iterations": num_of_iterations}
+                    result.update(common)
+
+                    if engine == "python" and num_of_states > max_python_states:
+                        logger.info("states = %d, scenario = %s, engine = %s skipped", num_of_states, scenario, engine)
+                        result["skipped"] = "more than {} states".format(max_python_states)
+                    else:
+                        logger.info("states = %d, scenario = %s, engine = %s", num_of_states, scenario, engine)
+                        if engine == "sparse":
+                            result.update(measure(lambda: calculate_sparse_compatibility(graph1, graph2,
+                                                                                         num_of_iterations),
+                                                  repeat))
+                        else:
+                            result.update(measure(lambda: calculate_final_compatibility(graph1, graph2,
+                                                                                        num_of_iterations, engine),
+                                                  repeat))
+                    results.append(result)
+
+    return results
+
+
+@click.command()
+@click.option("--sizes", help="number of states of the generated graphs, can be repeated", multiple=True,
+              type=int, default = [10, 100, 1000, 5000])
+@click.option("--engine", help="calculation engine, can be repeated", multiple=True,
+              type=click.Choice(["python", "numpy", "worklist", "sparse"]),
+              default = ["python", "numpy", "worklist", "sparse"])
+@click.option("--iterations", help="number of iterations of the iterations scenario", default = 10)
+@click.option("--repeat", help="repetitions of each scenario", default = 3)
+@click.option("--max-python-states", help="skip the python engine above this number of states", default = 100)
+@click.option("--out-degree", help="number of outgoing transitions per state", default = 3)
+@click.option("--emission-ratio", help="probability of a message to be an emission", default = 0.5)
+@click.option("--min-params", help="minimum number of parameters of a message", default = 0)
+@click.option("--max-params", help="maximum number of parameters of a message", default = 6)
+@click.option("--overlap", help="part of the messages of the second graph shared with the first one", default = 0.5)
+@click.option("--seed", help="seed of the random generator", default = 0)
+@click.option("--output", help="json file to store the results", default = "benchmark_result.json")
+def benchmark(sizes, engine, iterations, repeat, max_python_states, out_degree, emission_ratio,
+              min_params, max_params, overlap, seed, output):
+    generator_options = {"out_degree": out_degree,
+                         "emission_ratio": emission_ratio,
+                         "min_params": min_params,
+                         "max_params": max_params,
+                         "overlap": overlap,
+                         "seed": seed}
+
+    results = run_benchmark(list(sizes), list(engine), iterations, repeat, max_python_states, generator_options)
+
+    report = {"environment": get_environment(),
+              "generator": generator_options,
+              "results": results}
+    with open(output, "w") as file:
+        json.dump(report, file, indent=4)
+
+    print("")
+    table = pd.DataFrame(results)
+    columns = [column for column in ["scenario", "engine", "states", "iterations", "wall_min", "cpu_min", "skipped"]
+               if column in table.columns]
+    print(table[columns].to_string())
+    print("")
+    print("Benchmark is complete. The result is exported to {}".format(output))
+
+
+if __name__ == "__main__":
+    benchmark()
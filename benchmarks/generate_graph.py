@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+""" Generate synthetic pairs of state machines in the json format of parser.py
+
+The same seed always gives the same graphs. Every state i has a transition to
+the state i+1, so every state is reachable from the initial state 0, the last
+state is the final state and has no outgoing transition. A transition name
+always has the same type and parameters within a graph. A part of the names of
+the second graph (--overlap) are taken from the first graph with the opposite
+direction, as in a real protocol pair, so their label compatibility is not 0.
+"""
+
+import random
+import json
+import click
+
+
+DATA_TYPES = ["integer", "string", "PhysicalValueType", "unsignedInt", "unsignedByte",
+              "number", "byte", "boolean", "ocpp_enum", "iso_enum"]
+
+
+def create_messages(prefix:str,
+                    num_of_messages:int,
+                    emission_ratio:float,
+                    min_params:int,
+                    max_params:int,
+                    rng:random.Random) -> list:
+    """Create the messages, i.e. the transition names, of a graph
+
+    Args:
+        prefix (str): prefix of the transition names
+        num_of_messages (int): number of messages
+        emission_ratio (float): probability of a message to be an emission
+        min_params (int): minimum number of parameters of a message
+        max_params (int): maximum number of parameters of a message
+        rng (random.Random): random generator
+
+    Returns:
+        list: (name, transition_type, params) of the messages
+    """
+    messages = []
+    for i in range(num_of_messages):
+        transition_type = "emission" if rng.random() < emission_ratio else "reception"
+        params = ["{}_param{}:{}".format(prefix, j, rng.choice(DATA_TYPES))
+                  for j in range(rng.randint(min_params, max_params))]
+        messages.append(("{}_msg{}".format(prefix, i), transition_type, params))
+    return messages
+
+
+def create_graph_dict(graph_name:str,
+                      num_of_states:int,
+                      out_degree:int,
+                      messages:list,
+                      rng:random.Random) -> dict:
+    """Create a graph in the json format of parser.py
+
+    Args:
+        graph_name (str): name of the graph
+        num_of_states (int): number of states, at least 2
+        out_degree (int): number of outgoing transitions of every state but the
+                          final one
+        messages (list): (name, transition_type, params) to choose from
+        rng (random.Random): random generator
+
+    Returns:
+        dict: content of the json file
+    """
+    state_names = ["{}_s{}".format(graph_name, i) for i in range(num_of_states)]
+    states = []
+
+    for i, state_name in enumerate(state_names):
+        if i == 0:
+            state_type = "initial"
+        elif i == num_of_states - 1:
+            state_type = "final"
+        else:
+            state_type = "normal"
+
+        transitions = []
+        if state_type != "final":
+            # the initial state has no incoming transition
+            next_states = [state_names[i + 1]]
+            next_states += [rng.choice(state_names[1:]) for j in range(out_degree - 1)]
+            for next_state in next_states:
+                name, transition_type, params = rng.choice(messages)
+                transitions.append({"transition_name": name,
+                                    "transition_type": transition_type,
+                                    "params": list(params),
+                                    "next_state": next_state})
+
+        states.append({"state_name": state_name,
+                       "state_type": state_type,
+                       "transitions": transitions})
+
+    return {"graph_name": graph_name, "states": states}
+
+
+def generate_graph_pair(num_of_states:int,
+                        out_degree:int = 3,
+                        emission_ratio:float = 0.5,
+                        min_params:int = 0,
+                        max_params:int = 6,
+                        overlap:float = 0.5,
+                        num_of_messages:int = None,
+                        seed:int = 0) -> tuple:
+    """Generate two graphs of the same size
+
+    Args:
+        num_of_states (int): number of states of each graph, at least 2
+        out_degree (int, optional): outgoing transitions per state. Defaults to 3.
+        emission_ratio (float, optional): probability of a message to be an
+                                          emission. Defaults to 0.5.
+        min_params (int, optional): minimum number of parameters of a message.
+                                    Defaults to 0.
+        max_params (int, optional): maximum number of parameters of a message.
+                                    Defaults to 6.
+        overlap (float, optional): part of the messages of graph2 shared with
+                                   graph1. Defaults to 0.5.
+        num_of_messages (int, optional): number of messages of each graph.
+                                         Defaults to None, i.e. one message
+                                         for 2 states.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        tuple: (graph1 dict, graph2 dict)
+    """
+    if num_of_states < 2:
+        raise Exception("a graph needs at least 2 states")
+    if out_degree < 1:
+        raise Exception("out_degree must be at least 1")
+    if min_params > max_params:
+        raise Exception("min_params is greater than max_params")
+
+    rng = random.Random(seed)
+    if num_of_messages is None:
+        num_of_messages = max(1, num_of_states//2)
+
+    messages1 = create_messages("g1", num_of_messages, emission_ratio, min_params, max_params, rng)
+
+    # shared messages have the opposite direction in the other graph
+    num_of_shared = int(round(overlap*num_of_messages))
+    shared = [(name, "reception" if transition_type == "emission" else "emission", params)
+              for name, transition_type, params in rng.sample(messages1, num_of_shared)]
+    messages2 = shared + create_messages("g2", num_of_messages - num_of_shared, emission_ratio,
+                                         min_params, max_params, rng)
+
+    graph1 = create_graph_dict("g1", num_of_states, out_degree, messages1, rng)
+    graph2 = create_graph_dict("g2", num_of_states, out_degree, messages2, rng)
+    return (graph1, graph2)
+
+
+def write_graph(graph_dict:dict, path:str):
+    """Write a generated graph to a json file
+
+    Args:
+        graph_dict (dict): generated graph
+        path (str): path to the json file
+    """
+    with open(path, "w") as file:
+        json.dump(graph_dict, file, indent=4)
+
+
+@click.command()
+@click.option("--states", help="number of states of each graph", default = 100)
+@click.option("--out-degree", help="number of outgoing transitions per state", default = 3)
+@click.option("--emission-ratio", help="probability of a message to be an emission", default = 0.5)
+@click.option("--min-params", help="minimum number of parameters of a message", default = 0)
+@click.option("--max-params", help="maximum number of parameters of a message", default = 6)
+@click.option("--overlap", help="part of the messages of the second graph shared with the first one", default = 0.5)
+@click.option("--seed", help="seed of the random generator", default = 0)
+@click.option("--output", nargs = 2, help="paths to the two json files", default = ("graph1.json", "graph2.json"))
+def generate(states, out_degree, emission_ratio, min_params, max_params, overlap, seed, output):
+    graph1, graph2 = generate_graph_pair(states, out_degree, emission_ratio, min_params, max_params,
+                                         overlap, seed=seed)
+    write_graph(graph1, output[0])
+    write_graph(graph2, output[1])
+    print("Graphs are exported to {} and {}".format(output[0], output[1]))
+
+
+if __name__ == "__main__":
+    generate()
@@ -0,0 +1,50 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for generate_graph.py module
+"""
+
+import os
+import pytest
+from compatibility_lib import create_graph, StateType
+from .generate_graph import generate_graph_pair, write_graph
+
+
+def test_same_seed_same_graphs():
+    assert generate_graph_pair(20, seed=1) == generate_graph_pair(20, seed=1)
+    assert generate_graph_pair(20, seed=1) != generate_graph_pair(20, seed=2)
+
+
+@pytest.mark.parametrize("overlap", [0, 0.5, 1])
+def test_generated_graphs_are_valid(tmp_path, overlap):
+    graph1_dict, graph2_dict = generate_graph_pair(30, out_degree=4, max_params=3, overlap=overlap)
+    path1 = os.path.join(tmp_path, "graph1.json")
+    path2 = os.path.join(tmp_path, "graph2.json")
+    write_graph(graph1_dict, path1)
+    write_graph(graph2_dict, path2)
+
+    graph1 = create_graph(path1)
+    graph2 = create_graph(path2)
+
+    for graph in (graph1, graph2):
+        states = graph.get_states_list()
+        assert len(states) == 30
+        assert states[0]._type == StateType.INIT
+        assert states[0].get_num_of_incoming_transistions() == 0
+        assert states[-1]._type == StateType.FINAL
+        assert states[-1].get_num_of_outgoing_transitions() == 0
+        for state in states[:-1]:
+            assert state.get_num_of_outgoing_transitions() == 4
+
+    names1 = set(transition["transition_name"] for state in graph1_dict["states"] for transition in state["transitions"])
+    names2 = set(transition["transition_name"] for state in graph2_dict["states"] for transition in state["transitions"])
+    if overlap == 0:
+        assert names1.isdisjoint(names2)
+    if overlap == 1:
+        assert names2 <= names1
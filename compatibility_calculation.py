@@ -16,9 +16,30 @@ from compatibility_lib import Graph
 from compatibility_lib import State, StateType
 from compatibility_lib import Transition, TransitionType
 from compatibility_lib import create_graph
+from compatibility_lib import create_graph_from_dict
+from compatibility_lib import create_graph_cached
+from compatibility_lib import create_graph_streaming
+from compatibility_lib import CompatibilityEngine
+from compatibility_lib import WorklistSolver
+from compatibility_lib import SparseCompatibility
+from compatibility_lib import LabelCompatibilityTable
+from compatibility_lib import Profiler
+from compatibility_lib import best_assignment_sum
+from compatibility_lib import TauClosure, has_tau_transition
+from compatibility_lib import DataTypeTable, load_data_type_table, num_of_unshared_types
+from compatibility_lib import top_k_matches
+from compatibility_lib import check_top_k
+from compatibility_lib import parser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import pandas as pd
 import logging
+import numpy as np
+import cProfile
 import click
+import json
+import time
+import sys
 import os
 
 
@@ -36,6 +57,15 @@ parser_logger = logging.getLogger("PARSER")
 #parser_logger.setLevel(logging.ERROR)
 parser_logger.setLevel(logging.CRITICAL)
 
+label_logger = logging.getLogger("LABEL")
+label_logger.setLevel(logging.CRITICAL)
+
+engine_logger = logging.getLogger("ENGINE")
+engine_logger.setLevel(logging.CRITICAL)
+
+sparse_logger = logging.getLogger("SPARSE")
+sparse_logger.setLevel(logging.CRITICAL)
+
 # create logger
 logger = logging.getLogger("COMPATIBILITY")
 logger.setLevel(logging.DEBUG)
@@ -58,51 +88,67 @@ ch.setFormatter(formatter)
 # add ch to logger
 logger.addHandler(ch)
 
-data_type_exception = {
-    "base64Binary":"string"
-}
-
-
-def num_of_unshare(data_types1:list, data_types2:list):
-    unshares = list(set(data_types1).symmetric_difference(set(data_types2)))
-    logger.debug("list of unshare data type: {}".format(unshares))
-    return len(unshares)
+def num_of_unshare(type_mask1:int, type_mask2:int):
+    # bitmasks of the canonical data type ids, see compatibility_lib.data_types
+    unshares = num_of_unshared_types(type_mask1, type_mask2)
+    logger.debug("number of unshare data type: %s", unshares)
+    return unshares
 
 
 def calculate_lab_comp(transition1:Transition, transition2:Transition) -> float:
-    logger.info("")
-    logger.info("x-------------------------------------------------------------x")
-    logger.info("calculate lab_comp({},{})".format(transition1.name, transition2.name))
-    datatypes1 = transition1.get_data_types()
-    datatypes2 = transition2.get_data_types()
+    log_info = logger.isEnabledFor(logging.INFO)
+    if log_info:
+        logger.info("")
+        logger.info("x-------------------------------------------------------------x")
+        logger.info("calculate lab_comp(%s,%s)", transition1.name, transition2.name)
+    params1 = transition1.params
+    params2 = transition2.params
     
-    logger.debug("list of datatypes in message = {}: {}".format(transition1.name, datatypes1))
-    logger.debug("list of datatypes in message = {}: {}".format(transition2.name,datatypes2))
+    if log_info:
+        logger.debug("list of datatypes in message = %s: %s", transition1.name, params1.data_types)
+        logger.debug("list of datatypes in message = %s: %s", transition2.name, params2.data_types)
     
     if transition1.name == transition2.name and transition1.type != transition2.type:
-        num_of_unshare_type = num_of_unshare(datatypes1, datatypes2)
-        logger.debug("lab_comp = 1 - ({}/6*({} + {}))".format(num_of_unshare_type,
-                                                                    len(transition1.params),
-                                                                    len(transition2.params)))
+        # the ids of the data types are only comparable within a table
+        if params1.data_type_table is not params2.data_type_table:
+            raise Exception("transitions = {} do not use the same data type table".format(transition1.name))
+        num_of_unshare_type = num_of_unshare(params1.type_mask, params2.type_mask)
+        if log_info:
+            logger.debug("lab_comp = 1 - (%s/6*(%s + %s))", num_of_unshare_type,
+                                                             len(params1),
+                                                             len(params2))
         
-        if len(transition1.params) > 0 or len(transition2.params) > 0:
-            lab_comp = 1 - (num_of_unshare_type/(6*(len(transition1.params) + len(transition2.params))))
+        if len(params1) > 0 or len(params2) > 0:
+            lab_comp = 1 - (num_of_unshare_type/(6*(len(params1) + len(params2))))
         else:
             lab_comp = 1
     else:
         lab_comp = 0
     
-    logger.info(" lab_comp = {}".format(lab_comp))
-    logger.info("")
+    if log_info:
+        logger.info(" lab_comp = %s", lab_comp)
+        logger.info("")
     return lab_comp
 
-def calculate_best_sum_compatibility(emissions:list, receptions:list, last_comp_matrix:pd.DataFrame) -> float:
+def calculate_best_sum_compatibility(emissions:list,
+                                     receptions:list,
+                                     last_comp_matrix:pd.DataFrame,
+                                     lab_comp_table:LabelCompatibilityTable = None,
+                                     one_to_one:bool = False) -> float:
+    log_debug = logger.isEnabledFor(logging.DEBUG)
     sum = 0
+    # with one_to_one, the scores are kept for the assignment
+    scores = []
     for emission in emissions:
         #0 is OK because we dont have negative value
         max = 0
+        if one_to_one:
+            scores.append([])
         for recepition in receptions:
-            lab_comp = calculate_lab_comp(emission, recepition)
+            if lab_comp_table is None:
+                lab_comp = calculate_lab_comp(emission, recepition)
+            else:
+                lab_comp = lab_comp_table.get(emission, recepition)
             
             if recepition.next_state in last_comp_matrix.index:
                 previous_comp = last_comp_matrix.loc[recepition.next_state, emission.next_state]
@@ -110,43 +156,93 @@ def calculate_best_sum_compatibility(emissions:list, receptions:list, last_comp_
                 previous_comp = last_comp_matrix.loc[emission.next_state, recepition.next_state]
             
             temp = lab_comp*previous_comp
-            logger.debug("lab*comp({},{}) = {}".format(emission.name, recepition.name, temp))
+            if one_to_one:
+                scores[-1].append(temp)
+            if log_debug:
+                logger.debug("lab*comp(%s,%s) = %s", emission.name, recepition.name, temp)
             if temp > max:
                 max = temp
-                logger.debug("current max = {}".format(max))
+                if log_debug:
+                    logger.debug("current max = %s", max)
             else:
                 # do nothing
                 pass
         sum += max
 
-    logger.info("best sum = {}".format(sum))
+    if one_to_one:
+        sum = best_assignment_sum(scores)
+
+    logger.info("best sum = %s", sum)
     return sum
 
 
+def calculate_tau_distance(neighbors:list,
+                           observable:bool,
+                           obs_comp_state1_state2:float,
+                           neighbor_propagation) -> float:
+    """d(si,sj) of a state si with tau transitions
+
+    Args:
+        neighbors (list): states reached by the tau transitions of si
+        observable (bool): si has a transition which is not tau
+        obs_comp_state1_state2 (float): obs_comp of the state pair
+        neighbor_propagation: function giving the propagation of the pair of
+                              a neighbor and sj
+
+    Returns:
+        float: d(si,sj)
+    """
+    if neighbors == []:
+        # only tau transitions in a tau cycle
+        return obs_comp_state1_state2
+    
+    sum = 0
+    for neighbor in neighbors:
+        sum += neighbor_propagation(neighbor)
+    
+    if observable:
+        return (sum + obs_comp_state1_state2)/(len(neighbors) + 1)
+    return sum/len(neighbors)
+
+
 def calculate_fw_propation(state1: State,
                            state2: State, 
                            obs_comp_state1_state2: float, 
                            graph1:Graph,
                            graph2:Graph,  
-                           last_comp_matrix:pd.DataFrame)-> float:
-    logger.info("")
-    logger.info("x-------------------------------------------------------------x")
+                           last_comp_matrix:pd.DataFrame,
+                           propagation:dict = None)-> float:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("")
+        logger.info("x-------------------------------------------------------------x")
     d_fw_1 = 0
     d_fw_2 = 0
     if state1.get_outgoing_tau_list() == []:
-        logger.info("state = {} has no tau".format(state1.get_name()))
+        logger.info("state = %s has no tau", state1.get_name())
         d_fw_1 = obs_comp_state1_state2
     else:
-        raise Exception("tau calculation is not yet supported")
+        closure1 = propagation["closures"][0]
+        d_fw_1 = calculate_tau_distance(closure1.get_neighbors(state1),
+                                        closure1.has_observable(state1),
+                                        obs_comp_state1_state2,
+                                        lambda state: calculate_tau_propagation(state, state2, graph1, graph2,
+                                                                                last_comp_matrix, propagation))
+        logger.info("d_fw(%s,%s) = %s", state1.get_name(), state2.get_name(), d_fw_1)
     
     if state2.get_outgoing_tau_list() == []:
-        logger.info("state = {} has no tau".format(state2.get_name()))
+        logger.info("state = %s has no tau", state2.get_name())
         d_fw_2 = obs_comp_state1_state2
     else:
-        raise Exception("tau calculation is not yet supported")
+        closure2 = propagation["closures"][1]
+        d_fw_2 = calculate_tau_distance(closure2.get_neighbors(state2),
+                                        closure2.has_observable(state2),
+                                        obs_comp_state1_state2,
+                                        lambda state: calculate_tau_propagation(state1, state, graph1, graph2,
+                                                                                last_comp_matrix, propagation))
+        logger.info("d_fw(%s,%s) = %s", state2.get_name(), state1.get_name(), d_fw_2)
     
     fw_propagation = (d_fw_1 + d_fw_2)/2
-    logger.info("fw_propation({},{}) = {}".format(state1.get_name(), state2.get_name(), fw_propagation))
+    logger.info("fw_propation(%s,%s) = %s", state1.get_name(), state2.get_name(), fw_propagation)
     
     return fw_propagation
     
@@ -156,62 +252,178 @@ def calculate_bw_propation(state1: State,
                            obs_comp_state1_state2: float, 
                            graph1:Graph,
                            graph2:Graph,  
-                           last_comp_matrix:pd.DataFrame)-> float:
-    logger.info("")
-    logger.info("x-------------------------------------------------------------x")
+                           last_comp_matrix:pd.DataFrame,
+                           propagation:dict = None)-> float:
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("")
+        logger.info("x-------------------------------------------------------------x")
     d_bw_1 = 0
     d_bw_2 = 0
     if state1.get_imcoming_tau_list() == []:
-        logger.info("state = {} has no tau".format(state1.get_name()))
+        logger.info("state = %s has no tau", state1.get_name())
         d_bw_1 = obs_comp_state1_state2
     else:
-        raise Exception("tau calculation is not yet supported")
+        closure1 = propagation["closures"][0]
+        d_bw_1 = calculate_tau_distance(closure1.get_neighbors(state1, backward=True),
+                                        closure1.has_observable(state1, backward=True),
+                                        obs_comp_state1_state2,
+                                        lambda state: calculate_tau_propagation(state, state2, graph1, graph2,
+                                                                                last_comp_matrix, propagation,
+                                                                                backward=True))
+        logger.info("d_bw(%s,%s) = %s", state1.get_name(), state2.get_name(), d_bw_1)
     
     if state2.get_imcoming_tau_list() == []:
-        logger.info("state = {} has no tau".format(state2.get_name()))
+        logger.info("state = %s has no tau", state2.get_name())
         d_bw_2 = obs_comp_state1_state2
     else:
-        raise Exception("tau calculation is not yet supported")
+        closure2 = propagation["closures"][1]
+        d_bw_2 = calculate_tau_distance(closure2.get_neighbors(state2, backward=True),
+                                        closure2.has_observable(state2, backward=True),
+                                        obs_comp_state1_state2,
+                                        lambda state: calculate_tau_propagation(state1, state, graph1, graph2,
+                                                                                last_comp_matrix, propagation,
+                                                                                backward=True))
+        logger.info("d_bw(%s,%s) = %s", state2.get_name(), state1.get_name(), d_bw_2)
     
     bw_propagation = (d_bw_1 + d_bw_2)/2
-    logger.info("bw_propation({},{}) = {}".format(state1.get_name(), state2.get_name(), bw_propagation))
+    logger.info("bw_propation(%s,%s) = %s", state1.get_name(), state2.get_name(), bw_propagation)
     
     return bw_propagation
 
 
-def calculate_obs_comp(state1:State, state2:State, last_comp_matrix:pd.DataFrame) -> float:
-    logger.info("obs_comp({},{})".format(state1.get_name(), state2.get_name()))
+def create_tau_propagation(graph1:Graph,
+                           graph2:Graph,
+                           last_comp_matrix:pd.DataFrame,
+                           lab_comp_table:LabelCompatibilityTable,
+                           one_to_one:bool = False,
+                           tau_closures:tuple = None) -> dict:
+    """Create the context of the tau propagations of an iteration
+
+    The obs_comp and the propagations of the state pairs are kept, so the
+    pairs reached by the tau transitions are calculated once per iteration.
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        last_comp_matrix (pd.DataFrame): matrix of the previous iteration
+        lab_comp_table (LabelCompatibilityTable): label compatibility of the
+                                                  two graphs
+        one_to_one (bool, optional): one-to-one best sums. Defaults to False.
+        tau_closures (tuple, optional): TauClosure of both graphs. Defaults to
+                                        None, i.e. built here.
+
+    Returns:
+        dict: context of the iteration
+    """
+    if tau_closures is None:
+        tau_closures = (TauClosure(graph1), TauClosure(graph2))
+    
+    return {
+        "closures": tau_closures,
+        "last_comp_matrix": last_comp_matrix,
+        "lab_comp_table": lab_comp_table,
+        "one_to_one": one_to_one,
+        "obs_comp": {},
+        "fw": {},
+        "bw": {},
+    }
+
+
+def get_obs_comp(state1:State, state2:State, propagation:dict) -> float:
+    """obs_comp of a state pair, calculated once per iteration
+
+    Args:
+        state1 (State): state of graph1
+        state2 (State): state of graph2
+        propagation (dict): context of the iteration
+
+    Returns:
+        float: obs_comp
+    """
+    key = (state1.get_name(), state2.get_name())
+    cache = propagation["obs_comp"]
+    if key not in cache:
+        cache[key] = calculate_obs_comp(state1, state2, propagation["last_comp_matrix"],
+                                        propagation["lab_comp_table"], propagation["one_to_one"])
+    return cache[key]
+
+
+def calculate_tau_propagation(state1:State,
+                              state2:State,
+                              graph1:Graph,
+                              graph2:Graph,
+                              last_comp_matrix:pd.DataFrame,
+                              propagation:dict,
+                              backward:bool = False) -> float:
+    """Forward (backward) propagation of a state pair, calculated once per iteration
+
+    Args:
+        state1 (State): state of graph1
+        state2 (State): state of graph2
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        last_comp_matrix (pd.DataFrame): matrix of the previous iteration
+        propagation (dict): context of the iteration
+        backward (bool, optional): backward propagation. Defaults to False.
+
+    Returns:
+        float: the propagation
+    """
+    key = (state1.get_name(), state2.get_name())
+    cache = propagation["bw" if backward else "fw"]
+    if key not in cache:
+        obs_comp = get_obs_comp(state1, state2, propagation)
+        function = calculate_bw_propation if backward else calculate_fw_propation
+        cache[key] = function(state1, state2, obs_comp, graph1, graph2, last_comp_matrix, propagation)
+    return cache[key]
+
+
+def calculate_obs_comp(state1:State,
+                       state2:State,
+                       last_comp_matrix:pd.DataFrame,
+                       lab_comp_table:LabelCompatibilityTable = None,
+                       one_to_one:bool = False) -> float:
+    logger.info("obs_comp(%s,%s)", state1.get_name(), state2.get_name())
+    emissions1 = state1.get_outgoing_emission_list()
+    emissions2 = state2.get_outgoing_emission_list()
+    receptions1 = state1.get_outgoing_reception_list()
+    receptions2 = state2.get_outgoing_reception_list()
+    
     sum1 = 0
     sum2 = 0
-    if len(state1.get_outgoing_emission_list()) and len(state2.get_outgoing_reception_list()) > 0:   
-        sum1 = calculate_best_sum_compatibility(state1.get_outgoing_emission_list(),
-                                                state2.get_outgoing_reception_list(),
-                                                last_comp_matrix)
+    if len(emissions1) and len(receptions2) > 0:   
+        sum1 = calculate_best_sum_compatibility(emissions1,
+                                                receptions2,
+                                                last_comp_matrix,
+                                                lab_comp_table,
+                                                one_to_one)
     else:
-        logger.debug("{} has no emission".format(state1.get_name()))
+        logger.debug("%s has no emission", state1.get_name())
     
-    if len(state2.get_outgoing_emission_list()) and len(state1.get_outgoing_reception_list()) > 0:   
-        sum2 = calculate_best_sum_compatibility(state2.get_outgoing_emission_list(),
-                                                state1.get_outgoing_reception_list(),
-                                                last_comp_matrix)
+    if len(emissions2) and len(receptions1) > 0:   
+        sum2 = calculate_best_sum_compatibility(emissions2,
+                                                receptions1,
+                                                last_comp_matrix,
+                                                lab_comp_table,
+                                                one_to_one)
     else:
-        logger.debug("{} has no emission".format(state2.get_name()))
+        logger.debug("%s has no emission", state2.get_name())
         
-    if len(state1.get_outgoing_emission_list()) > 0 or len(state2.get_outgoing_emission_list()) > 0:
-        obs_comp = (sum1 + sum2)/(len(state1.get_outgoing_emission_list()) + len(state2.get_outgoing_emission_list()))
-        logger.debug("obs_comp = ({} + {}) / ({} + {})".format(sum1,
-                                                sum2,
-                                                len(state1.get_outgoing_emission_list()),
-                                                len(state2.get_outgoing_emission_list())))
+    if len(emissions1) > 0 or len(emissions2) > 0:
+        obs_comp = (sum1 + sum2)/(len(emissions1) + len(emissions2))
+        logger.debug("obs_comp = (%s + %s) / (%s + %s)", sum1,
+                                                         sum2,
+                                                         len(emissions1),
+                                                         len(emissions2))
         
     elif (state1._type == StateType.FINAL) and (state2._type == StateType.FINAL):
         obs_comp = 1
-        logger.info("Final state -> obs_comp = {}".format(obs_comp))
+        logger.info("Final state -> obs_comp = %s", obs_comp)
     else:
         obs_comp = 0
-        logger.info("both states have no emission transition => obs_comp = {}".format(obs_comp))
+        logger.info("both states have no emission transition => obs_comp = %s", obs_comp)
 
-    logger.info("obs_comp = {}".format(obs_comp))
+    logger.info("obs_comp = %s", obs_comp)
     
     return obs_comp
     
@@ -222,7 +434,10 @@ def calculate_state_nature(state1:State, state2:State) -> float:
     else:
         return 0
 
-def calculate_w1_w2_w3(state1:State, state2:State) -> tuple:
+def calculate_w1_w2_w3(state1:State,
+                       state2:State,
+                       fw_propagation:float = None,
+                       bw_propagation:float = None) -> tuple:
     w1 = 0
     w2 = 0
     w3 = 0
@@ -230,50 +445,59 @@ def calculate_w1_w2_w3(state1:State, state2:State) -> tuple:
     if (state1.get_imcoming_tau_list() == [] and state2.get_imcoming_tau_list() == [] and
         state1.get_outgoing_tau_list() == [] and state2.get_outgoing_tau_list() == []):
         w3 = 1
+    elif fw_propagation == 1 and bw_propagation == 1:
+        # the tau transitions do not change anything
+        w3 = 0
     else:
-        raise Exception("tau is not supported")
+        w3 = 1
  
-    w1 = len(state1.get_outgoing_transitions_list()) + len(state2.get_outgoing_transitions_list())
-    w2 = len(state1.get_incoming_transitions_list()) + len(state2.get_incoming_transitions_list())
+    w1 = state1.get_num_of_outgoing_transitions() + state2.get_num_of_outgoing_transitions()
+    w2 = state1.get_num_of_incoming_transistions() + state2.get_num_of_incoming_transistions()
     
-    logger.info("w1 = {}, w2 = {}, w3 = {}".format(w1, w2, w3))
+    logger.info("w1 = %s, w2 = %s, w3 = %s", w1, w2, w3)
     
     return (w1, w2, w3)
 
-def calculate_w1_w2_w3_ver2(state1:State, state2:State) -> tuple:
+def calculate_w1_w2_w3_ver2(state1:State,
+                            state2:State,
+                            fw_propagation:float = None,
+                            bw_propagation:float = None) -> tuple:
     num_of_best_matching_outgoing = 0
     num_of_best_matching_incomming = 0
     w3 = 0
-    logger.info("calculate_w1_w2_w3_ver2({},{})".format(state1.get_name(),state2.get_name() ))
+    logger.info("calculate_w1_w2_w3_ver2(%s,%s)", state1.get_name(),state2.get_name())
     
     for incoming1 in state1.get_incoming_transitions_list():
         for incoming2 in state2.get_incoming_transitions_list():
-            logger.debug("    Checking({}-{},{}-{})".format(incoming1.name,
-                                                            incoming1.type,
-                                                            incoming2.name,
-                                                            incoming2.type))
+            logger.debug("    Checking(%s-%s,%s-%s)", incoming1.name,
+                                                     incoming1.type,
+                                                     incoming2.name,
+                                                     incoming2.type)
             
             if incoming1.name == incoming2.name and incoming1.type != incoming2.type:
-                logger.debug("    -->best matching incoming found({},{})".format(incoming1.name,incoming2.name ))
+                logger.debug("    -->best matching incoming found(%s,%s)", incoming1.name,incoming2.name)
                 num_of_best_matching_incomming += 1
             
     for outgoing1 in state1.get_outgoing_transitions_list():
         for outgoing2 in state2.get_outgoing_transitions_list():
-            logger.debug("    Checking({}-{},{}-{})".format(outgoing1.name,
-                                                            outgoing1.type,
-                                                            outgoing2.name,
-                                                            outgoing2.type))
+            logger.debug("    Checking(%s-%s,%s-%s)", outgoing1.name,
+                                                     outgoing1.type,
+                                                     outgoing2.name,
+                                                     outgoing2.type)
             if outgoing1.name == outgoing2.name and outgoing1.type != outgoing2.type:
-                logger.debug("    -->best matching outgoing found({},{})".format(outgoing1.name,outgoing2.name ))
+                logger.debug("    -->best matching outgoing found(%s,%s)", outgoing1.name,outgoing2.name)
                 num_of_best_matching_outgoing += 1
 
     if (state1.get_imcoming_tau_list() == [] and state2.get_imcoming_tau_list() == [] and
         state1.get_outgoing_tau_list() == [] and state2.get_outgoing_tau_list() == []):
         w3 = 1
+    elif fw_propagation == 1 and bw_propagation == 1:
+        # the tau transitions do not change anything
+        w3 = 0
     else:
-        raise Exception("tau is not supported")
+        w3 = 1
     
-    logger.info("w1 = {}, w2 = {}, w3 = {}".format(num_of_best_matching_outgoing, num_of_best_matching_incomming, w3))
+    logger.info("w1 = %s, w2 = %s, w3 = %s", num_of_best_matching_outgoing, num_of_best_matching_incomming, w3)
     return(num_of_best_matching_outgoing,num_of_best_matching_incomming, w3)
                 
                 
@@ -284,7 +508,7 @@ def create_default_comp_matrix(graph1:Graph, graph2:Graph):
     num_of_colunm = len(graph1.get_states_list())
     num_of_rows = len(graph2.get_states_list())
     
-    logger.info("matrix has the size = {}x{}".format(num_of_rows, num_of_colunm))
+    logger.info("matrix has the size = %sx%s", num_of_rows, num_of_colunm)
     
     #Build the data
     for state in graph1.get_states_list():
@@ -298,42 +522,690 @@ def create_default_comp_matrix(graph1:Graph, graph2:Graph):
     return comp_matrix
 
 
-def calculate_compatibility(graph1:Graph, graph2:Graph, last_comp_matrix:pd.DataFrame = None) ->pd.DataFrame:
+# propagation context of the state pairs of graphs without tau transition
+NO_TAU_PROPAGATION = False
+
+
+def calculate_pair_compatibility(state1:State,
+                                 state2:State,
+                                 graph1:Graph,
+                                 graph2:Graph,
+                                 last_comp_matrix:pd.DataFrame,
+                                 lab_comp_table:LabelCompatibilityTable,
+                                 log_info:bool = False,
+                                 one_to_one:bool = False,
+                                 propagation:dict = None) -> float:
+    """Compatibility of one state pair, i.e. one cell of the matrix
+
+    Args:
+        state1 (State): state of graph1
+        state2 (State): state of graph2
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        last_comp_matrix (pd.DataFrame): matrix of the previous iteration
+        lab_comp_table (LabelCompatibilityTable): label compatibility of the
+                                                  two graphs
+        log_info (bool, optional): log the calculation. Defaults to False.
+        one_to_one (bool, optional): a reception is taken by at most one
+                                     emission in the best sums. Defaults to False.
+        propagation (dict, optional): context of the tau propagations of the
+                                      iteration, NO_TAU_PROPAGATION when the
+                                      caller has checked that the graphs have
+                                      no tau transition. Defaults to None,
+                                      i.e. the graphs are checked here.
+
+    Returns:
+        float: compatibility before rounding
+    """
+    if log_info:
+        logger.info("")
+        logger.info("####################################################################")
+        logger.info("#")
+        logger.info("# Compatibillity (%s,%s)", state1.get_name(), state2.get_name())
+        logger.info("#")
+        logger.info("####################################################################")
+        logger.info("")
+    
+    if propagation is None and (has_tau_transition(graph1) or has_tau_transition(graph2)):
+        propagation = create_tau_propagation(graph1, graph2, last_comp_matrix, lab_comp_table, one_to_one)
+    
+    if propagation is None or propagation is NO_TAU_PROPAGATION:
+        obs_comp = calculate_obs_comp(state1, state2, last_comp_matrix, lab_comp_table, one_to_one)
+        fw_propagation = calculate_fw_propation(state1, state2, obs_comp, graph1, graph2, last_comp_matrix)
+        bw_propagation = calculate_bw_propation(state1, state2, obs_comp, graph1, graph2, last_comp_matrix)
+    else:
+        fw_propagation = calculate_tau_propagation(state1, state2, graph1, graph2, last_comp_matrix, propagation)
+        bw_propagation = calculate_tau_propagation(state1, state2, graph1, graph2, last_comp_matrix, propagation,
+                                                   backward=True)
+
+    w1,w2,w3 = calculate_w1_w2_w3(state1, state2, fw_propagation, bw_propagation)
+    
+    #below calculation is unused
+    #w1,w2,w3 = calculate_w1_w2_w3_ver2(state1, state2, fw_propagation, bw_propagation)
+
+    state_comp = (w1*fw_propagation + w2*bw_propagation + w3*calculate_state_nature(state1, state2))/(w1 + w2 + w3)
+    compatibility = (last_comp_matrix.loc[state2.get_name(), state1.get_name()] + state_comp)/2
+    
+    if log_info:
+        logger.info("")
+        logger.info("=== CONCLUCSION ===")
+        logger.info("state_comp(%s,%s) = %s", state1.get_name(), state2.get_name(), state_comp)
+        logger.info("comp(%s,%s) = %s", state1.get_name(), state2.get_name(), compatibility)
+    
+    return compatibility
+
+
+def write_comp(comp_matrix:pd.DataFrame, state1:State, state2:State, compatibility:float):
+    """Write the rounded compatibility of a state pair into the matrix
+
+    Args:
+        comp_matrix (pd.DataFrame): matrix of the current iteration
+        state1 (State): state of graph1
+        state2 (State): state of graph2
+        compatibility (float): compatibility before rounding
+    """
+    comp_matrix.loc[state2.get_name(), state1.get_name()] = round(compatibility,3)
+
+
+def calculate_compatibility(graph1:Graph,
+                            graph2:Graph,
+                            last_comp_matrix:pd.DataFrame = None,
+                            lab_comp_table:LabelCompatibilityTable = None,
+                            one_to_one:bool = False,
+                            tau_closures:tuple = None) ->pd.DataFrame:
     if last_comp_matrix is None:
         logger.info("Initial data matrix, set everything to 1")
         return create_default_comp_matrix(graph1, graph2)
     else:
+        if lab_comp_table is None:
+            lab_comp_table = LabelCompatibilityTable(graph1, graph2)
+        
+        # the log calls of the inner loop are skipped when INFO is disabled
+        log_info = logger.isEnabledFor(logging.INFO)
+        
+        # the graphs are checked for tau transitions once, not for every pair
+        propagation = NO_TAU_PROPAGATION
+        if tau_closures is not None or has_tau_transition(graph1) or has_tau_transition(graph2):
+            propagation = create_tau_propagation(graph1, graph2, last_comp_matrix, lab_comp_table, one_to_one,
+                                                 tau_closures)
+        
         starting_matrix = create_default_comp_matrix(graph1, graph2)
         for state1 in graph1.get_states_list():
             for state2 in graph2.get_states_list():
-                logger.info("")
-                logger.info("####################################################################")
-                logger.info("#")
-                logger.info("# Compatibillity ({},{})".format(state1.get_name(), state2.get_name()))
-                logger.info("#")
-                logger.info("####################################################################")
-                logger.info("")
+                compatibility = calculate_pair_compatibility(state1, state2, graph1, graph2,
+                                                             last_comp_matrix, lab_comp_table, log_info,
+                                                             one_to_one, propagation)
+                write_comp(starting_matrix, state1, state2, compatibility)
                 
-                obs_comp = calculate_obs_comp(state1, state2, last_comp_matrix)
-                fw_propagation = calculate_fw_propation(state1, state2, obs_comp, graph1, graph2, last_comp_matrix)
-                bw_propagation = calculate_bw_propation(state1, state2, obs_comp, graph1, graph2, last_comp_matrix)
+        return starting_matrix
 
-                w1,w2,w3 = calculate_w1_w2_w3(state1, state2)
-                
-                #below calculation is unused
-                #w1,w2,w3 = calculate_w1_w2_w3_ver2(state1, state2)
 
-                logger.info("")
-                logger.info("=== CONCLUCSION ===")
-                state_comp = (w1*fw_propagation + w2*bw_propagation + w3*calculate_state_nature(state1, state2))/(w1 + w2 + w3)
-                logger.info("state_comp({},{}) = {}".format(state1.get_name(), state2.get_name(), state_comp))
-                
-                compatibility = (last_comp_matrix.loc[state2.get_name(), state1.get_name()] + state_comp)/2
-                logger.info("comp({},{}) = {}".format(state1.get_name(), state2.get_name(), compatibility))
-                
-                starting_matrix.loc[state2.get_name(), state1.get_name()] = round(compatibility,3)
-                
-        return starting_matrix
+# graphs and shared matrices of a worker process, set once by init_parallel_worker
+_parallel_worker = None
+
+
+def init_parallel_worker(graph1:Graph,
+                         graph2:Graph,
+                         last_buffer_name:str,
+                         next_buffer_name:str,
+                         log_level:int,
+                         one_to_one:bool = False):
+    """Initialize a worker process of ParallelCompatibility
+
+    The graphs are sent once per worker. The matrices are attached from the
+    shared memory blocks of the main process, so nothing is copied per
+    iteration.
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        last_buffer_name (str): shared memory holding the previous matrix
+        next_buffer_name (str): shared memory receiving the new matrix
+        log_level (int): level of the COMPATIBILITY logger
+        one_to_one (bool, optional): one-to-one best sums. Defaults to False.
+    """
+    global _parallel_worker
+    logger.setLevel(log_level)
+    
+    shape = (len(graph2.get_states_list()), len(graph1.get_states_list()))
+    last_buffer = shared_memory.SharedMemory(name=last_buffer_name)
+    next_buffer = shared_memory.SharedMemory(name=next_buffer_name)
+    last_array = np.ndarray(shape, dtype=np.float64, buffer=last_buffer.buf)
+    
+    _parallel_worker = {
+        "graph1": graph1,
+        "graph2": graph2,
+        "lab_comp_table": LabelCompatibilityTable(graph1, graph2),
+        # the buffers must stay referenced as long as the arrays are used
+        "buffers": (last_buffer, next_buffer),
+        "last_comp_matrix": pd.DataFrame(last_array,
+                                         index=[state.get_name() for state in graph2.get_states_list()],
+                                         columns=[state.get_name() for state in graph1.get_states_list()],
+                                         copy=False),
+        "next_array": np.ndarray(shape, dtype=np.float64, buffer=next_buffer.buf),
+        "one_to_one": one_to_one,
+        "tau_closures": ((TauClosure(graph1), TauClosure(graph2))
+                         if has_tau_transition(graph1) or has_tau_transition(graph2) else None),
+    }
+
+
+def calculate_compatibility_columns(start:int, stop:int):
+    """Calculate the columns [start, stop) of the matrix in a worker process,
+    i.e. the compatibility of the states start to stop-1 of graph1 with every
+    state of graph2
+
+    Args:
+        start (int): index of the first state of graph1
+        stop (int): index after the last state of graph1
+    """
+    graph1 = _parallel_worker["graph1"]
+    graph2 = _parallel_worker["graph2"]
+    lab_comp_table = _parallel_worker["lab_comp_table"]
+    last_comp_matrix = _parallel_worker["last_comp_matrix"]
+    next_array = _parallel_worker["next_array"]
+    one_to_one = _parallel_worker["one_to_one"]
+    log_info = logger.isEnabledFor(logging.INFO)
+    
+    propagation = NO_TAU_PROPAGATION
+    if _parallel_worker["tau_closures"] is not None:
+        propagation = create_tau_propagation(graph1, graph2, last_comp_matrix, lab_comp_table, one_to_one,
+                                             _parallel_worker["tau_closures"])
+    
+    states1 = graph1.get_states_list()
+    for column in range(start, stop):
+        for row, state2 in enumerate(graph2.get_states_list()):
+            compatibility = calculate_pair_compatibility(states1[column], state2, graph1, graph2,
+                                                         last_comp_matrix, lab_comp_table, log_info,
+                                                         one_to_one, propagation)
+            next_array[row, column] = round(compatibility,3)
+
+
+class ParallelCompatibility():
+    def __init__(self, graph1:Graph, graph2:Graph, workers:int, one_to_one:bool = False) -> None:
+        """Python calculation with the states of graph1 split across processes
+
+        Every cell of an iteration only depends on the previous matrix, so the
+        outer loop of calculate_compatibility is split into chunks of columns.
+        The previous and the new matrix live in shared memory, the workers
+        read the first one and write their columns into the second one.
+        Call close() (or use a with statement) to free the processes and the
+        shared memory.
+
+        Args:
+            graph1 (Graph): first graph
+            graph2 (Graph): second graph
+            workers (int): number of worker processes
+            one_to_one (bool, optional): one-to-one best sums. Defaults to False.
+        """
+        self.graph1 = graph1
+        self.graph2 = graph2
+        self.workers = workers
+        self.index = [state.get_name() for state in graph2.get_states_list()]
+        self.columns = [state.get_name() for state in graph1.get_states_list()]
+        self.shape = (len(self.index), len(self.columns))
+        
+        size = max(1, self.shape[0]*self.shape[1]*np.dtype(np.float64).itemsize)
+        self._last_buffer = shared_memory.SharedMemory(create=True, size=size)
+        self._next_buffer = shared_memory.SharedMemory(create=True, size=size)
+        self._last_array = np.ndarray(self.shape, dtype=np.float64, buffer=self._last_buffer.buf)
+        self._next_array = np.ndarray(self.shape, dtype=np.float64, buffer=self._next_buffer.buf)
+        
+        # a few chunks per worker, so a slow chunk does not leave the others idle
+        num_of_chunks = min(self.shape[1], 4*workers)
+        bounds = np.linspace(0, self.shape[1], num_of_chunks + 1).astype(int)
+        self._chunks = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        
+        self._executor = ProcessPoolExecutor(max_workers=workers,
+                                             initializer=init_parallel_worker,
+                                             initargs=(graph1, graph2,
+                                                       self._last_buffer.name, self._next_buffer.name,
+                                                       logger.getEffectiveLevel(), one_to_one))
+        logger.info("%s chunks of columns on %s workers", len(self._chunks), workers)
+
+    def step(self, last_comp_matrix:pd.DataFrame) -> pd.DataFrame:
+        """Calculate the next iteration, same result as calculate_compatibility
+
+        Args:
+            last_comp_matrix (pd.DataFrame): matrix of the previous iteration
+
+        Returns:
+            pd.DataFrame: matrix of the next iteration
+        """
+        self._last_array[:] = last_comp_matrix.loc[self.index, self.columns].to_numpy(dtype=np.float64)
+        
+        futures = [self._executor.submit(calculate_compatibility_columns, start, stop)
+                   for start, stop in self._chunks]
+        for future in futures:
+            # raise the exception of a worker, if any
+            future.result()
+        
+        return pd.DataFrame(self._next_array.copy(), index=self.index, columns=self.columns)
+
+    def close(self):
+        """Stop the workers and free the shared memory
+        """
+        self._executor.shutdown()
+        # the arrays must be released before the shared memory is closed
+        self._last_array = None
+        self._next_array = None
+        for buffer in (self._last_buffer, self._next_buffer):
+            buffer.close()
+            buffer.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iterate_compatibility(graph1:Graph,
+                          graph2:Graph,
+                          engine:str = "python",
+                          lab_comp_table:LabelCompatibilityTable = None,
+                          double_buffer:bool = False,
+                          workers:int = 1,
+                          requeue_tolerance:float = 0.0,
+                          one_to_one:bool = False):
+    """Generate the compatibility matrices of the iterations 0, 1, 2, ...
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        engine (str, optional): "python", "numpy" or "worklist". Defaults to "python".
+        lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the two graphs. Defaults to None.
+        double_buffer (bool, optional): the numpy and worklist engines
+                                alternate between two buffers, so a yielded
+                                matrix is only valid until the next one after
+                                it is yielded. Defaults to False.
+        workers (int, optional): number of processes of the python engine.
+                                 Defaults to 1.
+        requeue_tolerance (float, optional): smallest change of a cell which
+                                 makes the worklist engine calculate its
+                                 readers again. Defaults to 0.0, i.e. same
+                                 result as the other engines.
+        one_to_one (bool, optional): a reception is taken by at most one
+                                 emission in the best sums, not supported
+                                 by the worklist engine. Defaults to False.
+
+    Yields:
+        pd.DataFrame: compatibility matrix of the next iteration
+    """
+    if lab_comp_table is None:
+        lab_comp_table = LabelCompatibilityTable(graph1, graph2)
+    
+    comp_matrix = calculate_compatibility(graph1, graph2, None)
+    yield comp_matrix
+    
+    if engine == "numpy":
+        compiled = CompatibilityEngine(graph1, graph2, lab_comp_table, one_to_one)
+        matrix = compiled.initial_matrix()
+        buffer = np.empty(compiled.shape) if double_buffer else None
+        while True:
+            if double_buffer:
+                matrix, buffer = compiled.step(matrix, out=buffer), matrix
+            else:
+                matrix = compiled.step(matrix)
+            yield compiled.to_dataframe(matrix)
+    elif engine == "worklist":
+        compiled = CompatibilityEngine(graph1, graph2, lab_comp_table, one_to_one)
+        solver = WorklistSolver(compiled, requeue_tolerance)
+        matrix = compiled.initial_matrix()
+        buffer = np.empty(compiled.shape) if double_buffer else None
+        while True:
+            if double_buffer:
+                # the yielded matrix stays valid until the next one after it,
+                # so the new values are written into a copy in the other buffer
+                np.copyto(buffer, matrix)
+                matrix, buffer = solver.step(buffer, in_place=True), matrix
+            else:
+                matrix = solver.step(matrix)
+            logger.info("%d cells calculated, %d active cells", solver.num_of_calculated_cells,
+                        solver.get_num_of_active_cells())
+            yield compiled.to_dataframe(matrix)
+    elif workers > 1:
+        with ParallelCompatibility(graph1, graph2, workers, one_to_one) as parallel:
+            while True:
+                comp_matrix = parallel.step(comp_matrix)
+                yield comp_matrix
+    else:
+        # the tau transitions are condensed once for all the iterations
+        tau_closures = None
+        if has_tau_transition(graph1) or has_tau_transition(graph2):
+            tau_closures = (TauClosure(graph1), TauClosure(graph2))
+        while True:
+            comp_matrix = calculate_compatibility(graph1, graph2, comp_matrix, lab_comp_table, one_to_one,
+                                                  tau_closures)
+            yield comp_matrix
+
+
+def calculate_delta(comp_matrix1:pd.DataFrame, comp_matrix2:pd.DataFrame) -> float:
+    """Maximum absolute change between two compatibility matrices
+
+    Args:
+        comp_matrix1 (pd.DataFrame): first matrix
+        comp_matrix2 (pd.DataFrame): second matrix
+
+    Returns:
+        float: max |comp_matrix1 - comp_matrix2|
+    """
+    return float(np.abs(comp_matrix1.to_numpy(dtype=float) - comp_matrix2.to_numpy(dtype=float)).max())
+
+
+def calculate_final_compatibility(graph1:Graph,
+                                  graph2:Graph,
+                                  iterate:int,
+                                  engine:str = "python",
+                                  tolerance:float = None,
+                                  lab_comp_table:LabelCompatibilityTable = None,
+                                  workers:int = 1,
+                                  one_to_one:bool = False) -> tuple:
+    """Run the calculation and keep only the matrix of the last iteration
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        iterate (int): (maximum) number of iteration
+        engine (str, optional): "python", "numpy" or "worklist". Defaults to "python".
+        tolerance (float, optional): stop as soon as the max change of an
+                                     iteration is below this value. Defaults
+                                     to None, i.e. always run iterate times.
+        lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the two graphs. Defaults to None.
+        workers (int, optional): number of processes of the python engine.
+                                 Defaults to 1.
+        one_to_one (bool, optional): a reception is taken by at most one
+                                 emission in the best sums. Defaults to False.
+
+    Returns:
+        tuple: (matrix of the last iteration, number of iterations)
+    """
+    last_matrix = None
+    iterations = iterate_compatibility(graph1, graph2, engine, lab_comp_table, True, workers,
+                                       one_to_one=one_to_one)
+    for i, comp_matrix in enumerate(iterations):
+        if tolerance is not None and i > 0 and calculate_delta(comp_matrix, last_matrix) < tolerance:
+            break
+        if i == iterate:
+            break
+        last_matrix = comp_matrix
+    # stop the workers, if any
+    iterations.close()
+    
+    return (comp_matrix.copy(), i)
+
+
+def calculate_sparse_compatibility(graph1:Graph,
+                                   graph2:Graph,
+                                   iterate:int,
+                                   tolerance:float = None,
+                                   lab_comp_table:LabelCompatibilityTable = None,
+                                   profiler:Profiler = None) -> tuple:
+    """Run the calculation with the sparse matrix, the dense matrix is never
+    allocated
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        iterate (int): (maximum) number of iteration
+        tolerance (float, optional): stop as soon as the max change of an
+                                     iteration is below this value. Defaults
+                                     to None, i.e. always run iterate times.
+        lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the two graphs. Defaults to None.
+        profiler (Profiler, optional): profiler recording every iteration, the
+                                       setup of the sparse matrix as the
+                                       iteration 0. Defaults to None.
+
+    Returns:
+        tuple: (SparseCompatibility of the last iteration, number of iterations)
+    """
+    if profiler is not None:
+        profiler.start_iteration()
+    sparse = SparseCompatibility(graph1, graph2, lab_comp_table)
+    if profiler is not None:
+        profiler.end_iteration(0)
+    
+    for i in range(1, iterate + 1):
+        if profiler is not None:
+            profiler.start_iteration()
+        delta = sparse.step()
+        if profiler is not None:
+            profiler.end_iteration(i)
+        if tolerance is not None and delta < tolerance:
+            break
+
+    return (sparse, sparse.iteration)
+
+
+def get_top_k(comp_matrix:pd.DataFrame, k:int, of:str = "graph1") -> pd.DataFrame:
+    """Get the k most compatible states of the other graph for every state
+    of a compatibility matrix
+
+    Args:
+        comp_matrix (pd.DataFrame): compatibility matrix
+        k (int): number of states per state
+        of (str, optional): "graph1" for the best states of graph2 of every
+                            state of graph1, "graph2" for the best states of
+                            graph1 of every state of graph2. Defaults to "graph1".
+
+    Returns:
+        pd.DataFrame: state, rank, best state of the other graph and compatibility
+    """
+    return top_k_matches(comp_matrix.to_numpy(dtype=np.float64), list(comp_matrix.columns), list(comp_matrix.index),
+                         k, of)
+
+
+def calculate_top_k(graph1:Graph,
+                    graph2:Graph,
+                    k:int,
+                    iterate:int,
+                    engine:str = "python",
+                    of:str = "graph1",
+                    tolerance:float = None,
+                    lab_comp_table:LabelCompatibilityTable = None,
+                    workers:int = 1,
+                    one_to_one:bool = False) -> pd.DataFrame:
+    """Run the calculation and get the k most compatible states of the other
+    graph for every state, from the last iteration
+
+    Only the last two matrices are kept, and with the sparse engine only the k
+    best states of every state, so the result stays small.
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        k (int): number of states per state
+        iterate (int): (maximum) number of iteration
+        engine (str, optional): "python", "numpy", "worklist" or "sparse".
+                                Defaults to "python".
+        of (str, optional): "graph1" for the best states of graph2 of every
+                            state of graph1, "graph2" for the best states of
+                            graph1 of every state of graph2. Defaults to "graph1".
+        tolerance (float, optional): stop as soon as the max change of an
+                                     iteration is below this value. Defaults
+                                     to None, i.e. always run iterate times.
+        lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the two graphs. Defaults to None.
+        workers (int, optional): number of processes of the python engine.
+                                 Defaults to 1.
+        one_to_one (bool, optional): a reception is taken by at most one
+                                 emission in the best sums. Defaults to False.
+
+    Raises:
+        Exception: k is less than 1 or of is not graph1 or graph2
+
+    Returns:
+        pd.DataFrame: state, rank, best state of the other graph and compatibility
+    """
+    # checked before the calculation runs
+    check_top_k(k, of)
+    if engine == "sparse":
+        sparse, i = calculate_sparse_compatibility(graph1, graph2, iterate, tolerance, lab_comp_table)
+        return sparse.top_k(k, of)
+
+    comp_matrix, i = calculate_final_compatibility(graph1, graph2, iterate, engine, tolerance, lab_comp_table,
+                                                   workers, one_to_one)
+    return get_top_k(comp_matrix, k, of)
+
+
+def calculate_global_compatibility(comp_matrix:pd.DataFrame) -> float:
+    """Global compatibility of two graphs, i.e. the average over the states
+    of graph1 of their best compatibility with a state of graph2
+
+    Args:
+        comp_matrix (pd.DataFrame): compatibility matrix
+
+    Returns:
+        float: global compatibility between 0 and 1
+    """
+    return float(comp_matrix.to_numpy(dtype=float).max(axis=0).mean())
+
+
+def calculate_initial_compatibility(graph1:Graph, graph2:Graph, comp_matrix:pd.DataFrame) -> float:
+    """Compatibility of the initial states of two graphs
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        comp_matrix (pd.DataFrame): compatibility matrix
+
+    Returns:
+        float: compatibility of the first initial states or None
+    """
+    for state1 in graph1.get_states_list():
+        if state1._type == StateType.INIT:
+            for state2 in graph2.get_states_list():
+                if state2._type == StateType.INIT:
+                    return float(comp_matrix.loc[state2.get_name(), state1.get_name()])
+    return None
+
+
+def write_result(file, iterate:int, comp_matrix:pd.DataFrame):
+    """Print the matrix of an iteration and write it to the result file
+
+    Args:
+        file: opened result file
+        iterate (int): number of the iteration
+        comp_matrix (pd.DataFrame): compatibility matrix
+    """
+    print("For iterate = {}\n".format(iterate))
+    print(comp_matrix.to_string())
+    print("")
+    print("")
+    
+    file.write("For iterate = {}\n".format(iterate))
+    file.write(comp_matrix.to_string())
+    file.write("\n\n")
+    file.flush()
+
+
+def write_sparse_result(file, iterate:int, sparse:SparseCompatibility, top_k:int = None, top_k_of:str = "graph1"):
+    """Print the result of the sparse engine and write it to the result file
+
+    Without top_k, only the stored cells are written, every other cell has the
+    value of its trivial class.
+
+    Args:
+        file: opened result file
+        iterate (int): number of the iteration
+        sparse (SparseCompatibility): sparse compatibility matrix
+        top_k (int, optional): number of best states of the other graph per
+                               state. Defaults to None.
+        top_k_of (str, optional): graph of the states of top_k, graph1 or
+                                  graph2. Defaults to "graph1".
+    """
+    if top_k is None:
+        table = sparse.to_sparse()
+    else:
+        table = sparse.top_k(top_k, top_k_of)
+    write_result(file, iterate, table)
+
+
+def save_state(path:str, graph_texts:tuple, comp_matrices:list, one_to_one:bool = False):
+    """Store the graphs and the matrices of every iteration of a run, so a
+    later run on edited graphs can be calculated incrementally
+
+    Args:
+        path (str): path to the npz file
+        graph_texts (tuple): content of the json files of graph1 and graph2
+        comp_matrices (list): matrices of the iterations 0, 1, 2, ...
+        one_to_one (bool, optional): the run used one-to-one best sums.
+                                     Defaults to False.
+    """
+    np.savez_compressed(path,
+                        matrices=np.stack([comp_matrix.to_numpy(dtype=np.float64) for comp_matrix in comp_matrices]),
+                        graph1=np.array(graph_texts[0]),
+                        graph2=np.array(graph_texts[1]),
+                        one_to_one=np.array(one_to_one))
+
+
+def load_state(path:str, data_type_table:DataTypeTable = None) -> tuple:
+    """Load a run stored by save_state
+
+    Args:
+        path (str): path to the npz file
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types of the run. Defaults
+                                                   to None.
+
+    Returns:
+        tuple: (graph1, graph2, matrices of the iterations 0, 1, 2, ...,
+                one-to-one best sums)
+    """
+    with np.load(path) as state:
+        graph1 = create_graph_from_dict(json.loads(str(state["graph1"])), data_type_table)
+        graph2 = create_graph_from_dict(json.loads(str(state["graph2"])), data_type_table)
+        matrices = state["matrices"]
+        # runs stored before the option was recorded used the plain best sums
+        one_to_one = bool(state["one_to_one"]) if "one_to_one" in state.files else False
+    
+    index = [state.get_name() for state in graph2.get_states_list()]
+    columns = [state.get_name() for state in graph1.get_states_list()]
+    comp_matrices = [pd.DataFrame(matrix, index=index, columns=columns) for matrix in matrices]
+    
+    return (graph1, graph2, comp_matrices, one_to_one)
+
+
+def start_profiler() -> Profiler:
+    """Time the phases of the parsing and of the calculation until the
+    profiler is restored
+
+    Returns:
+        Profiler: profiler of the phases
+    """
+    profiler = Profiler()
+    this_module = sys.modules[__name__]
+    
+    for attribute, name in (("create_graph", "parse"),
+                            ("LabelCompatibilityTable", "label table"),
+                            ("create_default_comp_matrix", "matrix creation"),
+                            ("calculate_obs_comp", "obs_comp"),
+                            ("calculate_best_sum_compatibility", "best sum"),
+                            ("calculate_fw_propation", "fw propagation"),
+                            ("calculate_bw_propation", "bw propagation"),
+                            ("calculate_w1_w2_w3", "w1 w2 w3"),
+                            ("write_comp", "matrix write"),
+                            ("calculate_delta", "delta"),
+                            ("write_result", "output")):
+        profiler.instrument(this_module, attribute, name)
+    
+    for attribute, name in (("load_graph_dict", "parse: json load"),
+                            ("create_states", "parse: states"),
+                            ("add_incoming_transitions_to_states", "parse: incoming links")):
+        profiler.instrument(parser, attribute, name)
+    
+    for attribute, name in (("__init__", "numpy: compile"),
+                            ("step", "numpy: step"),
+                            ("to_dataframe", "numpy: to dataframe")):
+        profiler.instrument(CompatibilityEngine, attribute, name)
+    
+    for attribute, name in (("__init__", "sparse: compile"),
+                            ("step", "sparse: step")):
+        profiler.instrument(SparseCompatibility, attribute, name)
+    
+    return profiler
 
 
 def main():
@@ -356,74 +1228,222 @@ def main():
 @click.option("--iterate", help="number of iteration", default = 1)
 @click.option("--output", help="file to store the calculation", default = "result.txt")
 @click.option("--log_level", help="logging level: info, debug, or none", default = "none")
-def compatibility_calculation(graph, iterate, output, log_level):
-    if log_level == "none":
-        logger.setLevel(logging.CRITICAL)
-    elif log_level == "info":
-        logger.setLevel(logging.INFO)
-    elif log_level == "debug":
-        logger.setLevel(logging.DEBUG)
-    else:
-        pass
+@click.option("--engine", help="calculation engine: python, numpy, worklist or sparse", default = "python",
+              type=click.Choice(["python", "numpy", "worklist", "sparse"]))
+@click.option("--top-k", help="output only the k most compatible states of the other graph for every state, from "
+              "the last iteration", default = None, type=click.IntRange(min=1))
+@click.option("--top-k-of", help="states of the --top-k table: the best states of graph2 of every state of graph1, "
+              "or the other way", default = "graph1", type=click.Choice(["graph1", "graph2"]))
+@click.option("--one-to-one", is_flag=True,
+              help="a reception is taken by at most one emission in the best sums (python and numpy engines)")
+@click.option("--requeue-tolerance", help="worklist engine: smallest change of a cell which makes its readers "
+              "calculated again", default = 0.0)
+@click.option("--until-converged", is_flag=True,
+              help="iterate until the matrix converges instead of --iterate times")
+@click.option("--tolerance", help="stop when the max change of an iteration is below this value",
+              default = 0.0005)
+@click.option("--max-iter", help="maximum number of iteration with --until-converged", default = 100)
+@click.option("--stream", is_flag=True,
+              help="keep only the last two matrices and write every iteration as soon as it is calculated")
+@click.option("--final-only", is_flag=True,
+              help="only output the matrix of the last iteration, always the case with the sparse engine")
+@click.option("--workers", help="number of processes sharing the states of the first graph (python engine)",
+              default = 1)
+@click.option("--profile", is_flag=True,
+              help="print the wall time, cpu time and number of calls of every phase and iteration")
+@click.option("--profile-stats", help="file to store the cProfile statistics, readable with pstats", default = None)
+@click.option("--save-state", "state_path", help="npz file to store the graphs and the matrices of every iteration, "
+              "used by incremental_calculation.py, not with the sparse engine", default = None)
+@click.option("--graph-cache", is_flag=True,
+              help="load the graphs from a binary cache, written next to the json files when they change")
+@click.option("--cache-dir", help="directory of the graph cache instead of next to the json files, "
+              "implies --graph-cache", default = None)
+@click.option("--streaming-parser", is_flag=True,
+              help="build the states while the json files are read, for files too large to be loaded at once")
+@click.option("--data-types", "data_types_path", help="json file of the equivalent data types, "
+              "e.g. data_types.json, by default every data type is different", default = None)
+def compatibility_calculation(graph, iterate, output, log_level, engine, requeue_tolerance, until_converged, tolerance,
+                              max_iter, stream, final_only, workers, profile, profile_stats, state_path, top_k,
+                              graph_cache, cache_dir, streaming_parser, one_to_one, data_types_path, top_k_of):
+    profiler = start_profiler() if profile else None
+    try:
+        if profile_stats is not None:
+            stats_profiler = cProfile.Profile()
+            stats_profiler.enable()
+    
+        if one_to_one and engine in ("worklist", "sparse"):
+            raise click.UsageError("--one-to-one is not supported by the {} engine".format(engine))
+        
+        # the sparse engine only writes the last iteration, the other options
+        # need the dense matrix of every iteration
+        if engine == "sparse":
+            for option, used in (("--stream", stream), ("--workers", workers > 1),
+                                 ("--save-state", state_path is not None)):
+                if used:
+                    raise click.UsageError("{} is not supported by the sparse engine".format(option))
+    
+        if log_level == "none":
+            logger.setLevel(logging.CRITICAL)
+        elif log_level == "info":
+            logger.setLevel(logging.INFO)
+        elif log_level == "debug":
+            logger.setLevel(logging.DEBUG)
+        else:
+            pass
       
-    if(len(graph) != 2):
-        logger.error("Invalid number of graph. Must be 2")
-    else:
-        path1, path2 = graph
+        if(len(graph) != 2):
+            logger.error("Invalid number of graph. Must be 2")
+        else:
+            path1, path2 = graph
         
-        graph1 = create_graph(path1)
-        graph2 = create_graph(path2)
+            if state_path is not None:
+                graph_texts = []
+                for path in graph:
+                    with open(path, "r") as file:
+                        graph_texts.append(file.read())
+                state_matrices = []
         
-        #Fancy banner
-        print("")
-        print("")
-        print("#################################################################")
-        print("#")
-        print("# Compatibility Calculation")
-        print("# Author: {}".format(__author__))
-        print("# Version: {}".format(__version__))
-        print("# Status: {}".format(__status__))
-        print("#")
-        print("#################################################################")
+            # both graphs share the canonical data type ids of the table
+            data_type_table = None
+            if data_types_path is not None:
+                data_type_table = load_data_type_table(data_types_path)
         
-        print("")
-        print("GRAPHS GENERATION REPORT")
-        print("")
-        graph1.print_graph()
-        print("")
-        graph2.print_graph()
-        print("")
+            if graph_cache or cache_dir is not None:
+                graph1 = create_graph_cached(path1, cache_dir, data_type_table)
+                graph2 = create_graph_cached(path2, cache_dir, data_type_table)
+            elif streaming_parser:
+                graph1 = create_graph_streaming(path1, data_type_table=data_type_table)
+                graph2 = create_graph_streaming(path2, data_type_table=data_type_table)
+            else:
+                graph1 = create_graph(path1, data_type_table)
+                graph2 = create_graph(path2, data_type_table)
         
-        compatible_matrices = []
+            #Fancy banner
+            print("")
+            print("")
+            print("#################################################################")
+            print("#")
+            print("# Compatibility Calculation")
+            print("# Author: {}".format(__author__))
+            print("# Version: {}".format(__version__))
+            print("# Status: {}".format(__status__))
+            print("#")
+            print("#################################################################")
         
-        for i in range(iterate + 1):
-            if i == 0:
-                compatible_matrices.append(calculate_compatibility(graph1, graph2, None))
-            else:
-                compatible_matrices.append(calculate_compatibility(graph1, graph2, compatible_matrices[i - 1]))
-
-        if os.path.isfile(output) == True:
-            os.remove(output)
-            
+            print("")
+            print("GRAPHS GENERATION REPORT")
+            print("")
+            graph1.print_graph()
+            print("")
+            graph2.print_graph()
+            print("")
         
-        print("Compatibility calculation is complete. The result is exported to {}".format)
-        print("Results:")
-        with open(output, "a") as file:
-            for i in range(len(compatible_matrices)):
-                print("For iterate = {}\n".format(i))
-                print(compatible_matrices[i].to_string())
-                print("")
+            compatible_matrices = []
+            lab_comp_table = LabelCompatibilityTable(graph1, graph2)
+        
+            if until_converged:
+                iterate = max_iter
+                print("ITERATIONS")
                 print("")
+        
+            if os.path.isfile(output) == True:
+                os.remove(output)
+        
+            if engine == "sparse":
+                with open(output, "a") as file:
+                    sparse, i = calculate_sparse_compatibility(graph1, graph2, iterate,
+                                                               tolerance if until_converged else None,
+                                                               lab_comp_table, profiler)
+                    if until_converged:
+                        print("{} after {} iterations".format("converged" if i < iterate else "not converged", i))
+                    print("Results:")
+                    write_sparse_result(file, i, sparse, top_k, top_k_of)
+                    print("Compatibility calculation is complete. The result is exported to {}".format(output))
+            else:
+                with open(output, "a") as file:
+                    if stream:
+                        print("Results:")
+            
+                    # with --stream or --final-only, only the last two matrices are kept
+                    last_matrix = None
+                    comp_matrix = None
+            
+                    start_time = time.perf_counter()
+                    if profiler is not None:
+                        profiler.start_iteration()
+                    iterations = iterate_compatibility(graph1, graph2, engine, lab_comp_table, stream, workers,
+                                                       requeue_tolerance, one_to_one)
+                    for i, comp_matrix in enumerate(iterations):
+                        if profiler is not None:
+                            profiler.end_iteration(i)
+                
+                        if state_path is not None:
+                            state_matrices.append(comp_matrix.copy())
                 
-                file.write("For iterate = {}\n".format(i))
-                file.write(compatible_matrices[i].to_string())
-                file.write("\n\n")
+                        # with --top-k, only the table of the last iteration is written
+                        if final_only == False and top_k is None:
+                            if stream:
+                                write_result(file, i, comp_matrix)
+                            else:
+                                compatible_matrices.append(comp_matrix)
+                
+                        if until_converged and i > 0:
+                            delta = calculate_delta(comp_matrix, last_matrix)
+                            print("iterate = {}, delta = {:.6f}, time = {:.3f}s".format(i, delta, time.perf_counter() - start_time))
+                    
+                            if delta < tolerance:
+                                print("converged after {} iterations".format(i))
+                                break
+                
+                        if i == iterate:
+                            if until_converged:
+                                print("not converged after {} iterations".format(i))
+                            break
+                
+                        last_matrix = comp_matrix
+                        start_time = time.perf_counter()
+                        if profiler is not None:
+                            profiler.start_iteration()
+                    # stop the workers, if any
+                    iterations.close()
+            
+                    if stream:
+                        if top_k is not None:
+                            write_result(file, i, get_top_k(comp_matrix, top_k, top_k_of))
+                        elif final_only:
+                            write_result(file, i, comp_matrix)
+                        print("Compatibility calculation is complete. The result is exported to {}".format(output))
+                    else:
+                        print("Compatibility calculation is complete. The result is exported to {}".format(output))
+                        print("Results:")
+                        if top_k is not None:
+                            write_result(file, i, get_top_k(comp_matrix, top_k, top_k_of))
+                        elif final_only:
+                            write_result(file, i, comp_matrix)
+                        for i in range(len(compatible_matrices)):
+                            write_result(file, i, compatible_matrices[i])
+        
+            if state_path is not None and engine != "sparse":
+                save_state(state_path, graph_texts, state_matrices, one_to_one)
+                print("State is exported to {}".format(state_path))
+    
+        if profile_stats is not None:
+            stats_profiler.disable()
+            stats_profiler.dump_stats(profile_stats)
+            print("cProfile statistics are exported to {}".format(profile_stats))
+    finally:
+        # the functions are put back even if the calculation fails
+        if profiler is not None:
+            profiler.restore()
+    
+    if profiler is not None:
+        print("")
+        print("PROFILE")
+        print("")
+        print(profiler.report())
                 
         
         
         
 if __name__ == "__main__":
-    compatibility_calculation()
-
-                
-                    
\ No newline at end of file
+    compatibility_calculation()
\ No newline at end of file
@@ -13,4 +13,13 @@ __status__ = "Development"
 """
 
 from .graph import *
-from .parser import create_graph
\ No newline at end of file
+from .data_types import DataTypeTable, load_data_type_table, num_of_unshared_types
+from .parser import create_graph, create_graph_from_dict, create_graph_streaming
+from .cache import create_graph_cached
+from .label import LabelCompatibilityTable
+from .engine import CompatibilityEngine, WorklistSolver, calculate_compatibility_vectorized
+from .sparse import SparseCompatibility
+from .matches import TopKAccumulator, top_k_indexes, top_k_matches, check_top_k
+from .assignment import best_assignment_sum, best_assignment_sums
+from .tau import TauClosure, has_tau_transition
+from .profiler import Profiler
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""One-to-one assignment of the emissions to the receptions.
+
+The best sum compatibility lets each emission take the reception with the
+highest score, so several emissions may share the same reception. In the
+one-to-one mode, a reception is taken by at most one emission and the best sum
+is the maximum weight matching of the |emissions|x|receptions| score matrix of
+the state pair.
+
+Most score matrices need no matching at all: when the best receptions of the
+emissions are all different, the greedy sum is optimal. The other matrices are
+grouped by shape; the small ones are solved together by enumerating every
+assignment with whole-array operations, the larger ones with the Hungarian
+algorithm (scipy's linear_sum_assignment when it is installed).
+
+Every matrix is first reduced to its rows and columns having a non zero score,
+and the sums are accumulated row by row, so a matrix gives the same value
+whatever zero rows or columns it had and whichever engine calculated it.
+"""
+
+from itertools import permutations
+import numpy as np
+import logging
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# create logger
+logger = logging.getLogger("ASSIGNMENT")
+
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+# largest number of assignments of a matrix solved by enumeration
+ENUMERATION_LIMIT = 720
+# number of scores enumerated at once
+CHUNK_SIZE = 1 << 20
+
+_assignments = {}
+
+
+def get_assignments(rows: int, columns: int) -> np.ndarray:
+    """Get every assignment of the rows to distinct columns
+
+    Args:
+        rows (int): number of rows
+        columns (int): number of columns, not less than rows
+
+    Returns:
+        np.ndarray: (number of assignments)x(rows) array of column indexes
+    """
+    key = (rows, columns)
+    if key not in _assignments:
+        _assignments[key] = np.array(list(permutations(range(columns), rows)), dtype=np.int64).reshape(-1, rows)
+    return _assignments[key]
+
+
+def get_num_of_assignments(rows: int, columns: int) -> int:
+    """Get number of assignments of the rows to distinct columns
+
+    Args:
+        rows (int): number of rows
+        columns (int): number of columns, not less than rows
+
+    Returns:
+        int: columns!/(columns - rows)!
+    """
+    count = 1
+    for column in range(columns - rows + 1, columns + 1):
+        count *= column
+    return count
+
+
+def hungarian(scores: np.ndarray) -> np.ndarray:
+    """Maximum weight assignment of the rows with the Hungarian algorithm
+
+    Shortest augmenting paths with potentials, O(rows^2 x columns).
+
+    Args:
+        scores (np.ndarray): score matrix with no more rows than columns
+
+    Returns:
+        np.ndarray: column assigned to every row
+    """
+    num_of_rows, num_of_columns = scores.shape
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(scores, maximize=True)[1]
+
+    # minimum cost with 1-based rows and columns, column 0 is the virtual
+    # start of the augmenting path
+    cost = scores.max() - scores
+    u = np.zeros(num_of_rows + 1)
+    v = np.zeros(num_of_columns + 1)
+    row_of = np.zeros(num_of_columns + 1, dtype=np.int64)
+    way = np.zeros(num_of_columns + 1, dtype=np.int64)
+
+    for row in range(1, num_of_rows + 1):
+        row_of[0] = row
+        column = 0
+        min_slack = np.full(num_of_columns + 1, np.inf)
+        used = np.zeros(num_of_columns + 1, dtype=bool)
+        while row_of[column] != 0:
+            used[column] = True
+            current_row = row_of[column]
+            free = ~used
+            slack = cost[current_row - 1] - u[current_row] - v[1:]
+            update = free[1:] & (slack < min_slack[1:])
+            min_slack[1:][update] = slack[update]
+            way[1:][update] = column
+
+            candidates = np.where(free, min_slack, np.inf)
+            candidates[0] = np.inf
+            next_column = int(np.argmin(candidates))
+            delta = candidates[next_column]
+            u[row_of[used]] += delta
+            v[used] -= delta
+            min_slack[free] -= delta
+            column = next_column
+
+        # flip the augmenting path
+        while column != 0:
+            previous = way[column]
+            row_of[column] = row_of[previous]
+            column = previous
+
+    assigned = np.empty(num_of_rows, dtype=np.int64)
+    matched = np.flatnonzero(row_of[1:])
+    assigned[row_of[1:][matched] - 1] = matched
+    return assigned
+
+
+def _row_sums(values: np.ndarray) -> np.ndarray:
+    """Sum in the order of the rows, like the greedy best sum
+
+    Args:
+        values (np.ndarray): (matrices, rows) assigned scores
+
+    Returns:
+        np.ndarray: sum of every matrix
+    """
+    totals = np.zeros(values.shape[:-1])
+    for row in range(values.shape[-1]):
+        totals += values[..., row]
+    return totals
+
+
+def reduce_scores(scores: np.ndarray) -> tuple:
+    """Move the rows and the columns having a non zero score first, in their order
+
+    Args:
+        scores (np.ndarray): (matrices, rows, columns) score matrices
+
+    Returns:
+        tuple: (reordered matrices, number of non zero rows, number of non zero columns)
+    """
+    positive = scores > 0
+    rows = positive.any(axis=2)
+    columns = positive.any(axis=1)
+    scores = np.take_along_axis(scores, np.argsort(~rows, axis=1, kind="stable")[:, :, None], axis=1)
+    scores = np.take_along_axis(scores, np.argsort(~columns, axis=1, kind="stable")[:, None, :], axis=2)
+    return (scores, rows.sum(axis=1), columns.sum(axis=1))
+
+
+def solve_assignments(scores: np.ndarray) -> np.ndarray:
+    """Best one-to-one sum of matrices of the same shape
+
+    Args:
+        scores (np.ndarray): (matrices, rows, columns) score matrices, with
+                             no more rows than columns
+
+    Returns:
+        np.ndarray: maximum sum of every matrix
+    """
+    num_of_matrices, num_of_rows, num_of_columns = scores.shape
+    rows = np.arange(num_of_rows)
+
+    # the greedy sum is optimal when the best columns of the rows are distinct
+    best_columns = scores.argmax(axis=2)
+    sums = _row_sums(np.take_along_axis(scores, best_columns[:, :, None], axis=2)[:, :, 0])
+    sorted_columns = np.sort(best_columns, axis=1)
+    conflicts = np.flatnonzero((sorted_columns[:, 1:] == sorted_columns[:, :-1]).any(axis=1))
+    if len(conflicts) == 0:
+        return sums
+
+    if get_num_of_assignments(num_of_rows, num_of_columns) <= ENUMERATION_LIMIT:
+        # (matrices, assignments, rows) scores of every assignment, a chunk
+        # of the matrices at a time
+        assignments = get_assignments(num_of_rows, num_of_columns)
+        chunk = max(1, CHUNK_SIZE // assignments.size)
+        for start in range(0, len(conflicts), chunk):
+            matrices = conflicts[start:start + chunk]
+            sums[matrices] = _row_sums(scores[matrices][:, rows, assignments]).max(axis=1)
+    else:
+        for matrix in conflicts.tolist():
+            sums[matrix] = _row_sums(scores[matrix, rows, hungarian(scores[matrix])])
+
+    logger.debug("%s %sx%s matrices solved by a matching", len(conflicts), num_of_rows, num_of_columns)
+    return sums
+
+
+def best_assignment_sums(scores: np.ndarray) -> np.ndarray:
+    """Best one-to-one sum of many score matrices
+
+    The matrices are reduced to their rows and columns with a non zero score,
+    and those of the same reduced shape are solved together.
+
+    Args:
+        scores (np.ndarray): (matrices, emissions, receptions) score matrices,
+                             one per state pair and direction
+
+    Returns:
+        np.ndarray: maximum sum of every matrix, each row and each column is
+                    used at most once
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    sums = np.zeros(len(scores))
+    if scores.size == 0:
+        return sums
+
+    scores, num_of_rows, num_of_columns = reduce_scores(scores)
+    shapes = np.stack((num_of_rows, num_of_columns), axis=1)
+    for shape in np.unique(shapes[(num_of_rows > 0)], axis=0).tolist():
+        matrices = np.flatnonzero((shapes == shape).all(axis=1))
+        batch = scores[matrices, :shape[0], :shape[1]]
+        if shape[0] > shape[1]:
+            batch = batch.transpose(0, 2, 1)
+        sums[matrices] = solve_assignments(batch)
+    return sums
+
+
+def best_assignment_sum(scores: np.ndarray) -> float:
+    """Best one-to-one sum of a score matrix
+
+    Args:
+        scores (np.ndarray): |emissions|x|receptions| score matrix
+
+    Returns:
+        float: maximum sum, each row and each column is used at most once
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    return float(best_assignment_sums(scores.reshape((1,) + scores.shape))[0])
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Binary cache of the parsed graphs.
+
+A graph created from a json file is stored as flat arrays in a binary file,
+keyed by the sha256 of the json file. The next runs map the file in memory and
+rebuild the states and transitions from the arrays, without parsing and
+validating the json file again. Every string (names of the states and of the
+transitions, parameters) is stored once.
+
+The file is:
+
+    magic (8 bytes), version (uint32), header length (uint32),
+    header (json: graph name and offset, dtype and length of every array),
+    arrays, each aligned on 8 bytes
+
+The cache files are named after the json file, a short hash of its absolute
+path, so json files of the same name in different directories can share a
+cache directory, and the hash of its content. A cache file which cannot be
+read, e.g. cut by a full disk, is replaced by parsing the json file again.
+When a new cache file is written, the cache files of the older versions of the
+same json file are removed.
+"""
+
+from .graph import *
+from .parser import create_graph
+import numpy as np
+import hashlib
+import logging
+import mmap
+import json
+import os
+
+CACHE_MAGIC = b"PCMGRAPH"
+CACHE_VERSION = 1
+CACHE_EXTENSION = ".graphcache"
+
+# create logger
+logger = logging.getLogger("CACHE")
+
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+
+def get_cache_path(input_path: str, cache_dir: str = None) -> str:
+    """Get the path of the cache of a json file
+
+    Args:
+        input_path (str): path to the json file
+        cache_dir (str, optional): directory of the cache files. Defaults to
+                                   None, i.e. next to the json file.
+
+    Returns:
+        str: path of the cache file, named after the path and the hash of the
+             json file
+    """
+    with open(input_path, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()[:16]
+
+    input_path = os.path.abspath(input_path)
+    path_digest = hashlib.sha256(input_path.encode("utf-8")).hexdigest()[:8]
+    directory, name = os.path.split(input_path)
+    if cache_dir is not None:
+        directory = cache_dir
+    return os.path.join(directory, ".{}.{}.{}{}".format(os.path.splitext(name)[0], path_digest, digest,
+                                                        CACHE_EXTENSION))
+
+
+def graph_to_arrays(graph: Graph) -> dict:
+    """Flatten a graph to arrays
+
+    Args:
+        graph (Graph): the graph
+
+    Returns:
+        dict: arrays of the graph, the strings are ids in the "strings" list
+    """
+    string_ids = {}
+    def intern(string: str) -> int:
+        return string_ids.setdefault(string, len(string_ids))
+
+    states = graph.get_states_list()
+    state_index = {}
+    for i, state in enumerate(states):
+        state_index.setdefault(state.get_name(), i)
+
+    state_name = [intern(state.get_name()) for state in states]
+    state_type = [state._type.value for state in states]
+    state_transitions = [0]
+    transition_name, transition_type, transition_next, transition_params, params = [], [], [], [0], []
+    for state in states:
+        for transition in state.get_outgoing_transitions_list():
+            transition_name.append(intern(transition.name))
+            transition_type.append(transition.type.value)
+            transition_next.append(state_index[transition.next_state])
+            params.extend(intern(param) for param in transition.params)
+            transition_params.append(len(params))
+        state_transitions.append(len(transition_name))
+
+    strings = list(string_ids)
+    string_offsets = np.cumsum([0] + [len(string) for string in strings], dtype=np.int64)
+    return {"strings": np.frombuffer("".join(strings).encode("utf-32-le"), dtype=np.uint32),
+            "string_offsets": string_offsets,
+            "state_name": np.array(state_name, dtype=np.int32),
+            "state_type": np.array(state_type, dtype=np.int8),
+            "state_transitions": np.array(state_transitions, dtype=np.int64),
+            "transition_name": np.array(transition_name, dtype=np.int32),
+            "transition_type": np.array(transition_type, dtype=np.int8),
+            "transition_next": np.array(transition_next, dtype=np.int32),
+            "transition_params": np.array(transition_params, dtype=np.int64),
+            "params": np.array(params, dtype=np.int32)}
+
+
+def graph_from_arrays(name: str, arrays: dict, data_type_table: DataTypeTable = None) -> Graph:
+    """Rebuild a graph from its arrays, the graph was validated before it was
+    flattened
+
+    Args:
+        name (str): name of the graph
+        arrays (dict): arrays of graph_to_arrays
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types. Defaults to None.
+
+    Returns:
+        Graph: the graph
+    """
+    text = arrays["strings"].tobytes().decode("utf-32-le")
+    offsets = arrays["string_offsets"].tolist()
+    strings = [text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    state_name = [strings[i] for i in arrays["state_name"].tolist()]
+    state_transitions = arrays["state_transitions"].tolist()
+    transition_name = arrays["transition_name"].tolist()
+    transition_type = [TransitionType(value) for value in arrays["transition_type"].tolist()]
+    transition_next = arrays["transition_next"].tolist()
+    transition_params = arrays["transition_params"].tolist()
+    params = [strings[i] for i in arrays["params"].tolist()]
+
+    transitions = [Transition(name=strings[transition_name[j]],
+                              type=transition_type[j],
+                              next_state=state_name[transition_next[j]],
+                              params=params[transition_params[j]:transition_params[j + 1]],
+                              data_type_table=data_type_table)
+                   for j in range(len(transition_name))]
+    states = [State(name=state_name[i], type=StateType(value),
+                    outgoing=transitions[state_transitions[i]:state_transitions[i + 1]])
+              for i, value in enumerate(arrays["state_type"].tolist())]
+
+    # same order of the incoming transitions as the parser
+    for transition, next_state in zip(transitions, transition_next):
+        states[next_state].add_incoming_transition(transition)
+
+    return Graph(name=name, states=states)
+
+
+def write_graph_cache(cache_path: str, graph: Graph):
+    """Store a graph in a cache file
+
+    The file is written under a temporary name first, so a run reading the
+    cache never sees a partial file.
+
+    Args:
+        cache_path (str): path to the cache file
+        graph (Graph): the graph
+    """
+    arrays = graph_to_arrays(graph)
+
+    sections = {}
+    offset = 0
+    for key, array in arrays.items():
+        sections[key] = [array.dtype.str, offset, len(array)]
+        offset += -(-array.nbytes // 8)*8
+    header = json.dumps({"graph_name": graph._name, "sections": sections}).encode("utf-8")
+    header += b" "*(-(len(CACHE_MAGIC) + 8 + len(header)) % 8)
+
+    temp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    with open(temp_path, "wb") as file:
+        file.write(CACHE_MAGIC)
+        file.write(np.array([CACHE_VERSION, len(header)], dtype="<u4").tobytes())
+        file.write(header)
+        for array in arrays.values():
+            file.write(array.tobytes())
+            file.write(b"\0"*(-array.nbytes % 8))
+    os.replace(temp_path, cache_path)
+
+
+def read_graph_cache(cache_path: str, data_type_table: DataTypeTable = None) -> Graph:
+    """Load a graph from a cache file
+
+    Args:
+        cache_path (str): path to the cache file
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types. Defaults to None.
+
+    Returns:
+        Graph: the graph or None if the file is not a valid cache of this version
+    """
+    if os.path.getsize(cache_path) < len(CACHE_MAGIC) + 8:
+        logger.warning("%s is not a graph cache", cache_path)
+        return None
+
+    with open(cache_path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            prefix = len(CACHE_MAGIC) + 8
+            if buffer[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+                logger.warning("%s is not a graph cache", cache_path)
+                return None
+            version, header_length = np.frombuffer(buffer, dtype="<u4", count=2, offset=len(CACHE_MAGIC)).tolist()
+            if version != CACHE_VERSION:
+                logger.warning("%s has version %s, expected %s", cache_path, version, CACHE_VERSION)
+                return None
+
+            arrays = None
+            try:
+                header = json.loads(buffer[prefix:prefix + header_length].decode("utf-8"))
+                start = prefix + header_length
+                arrays = {key: np.frombuffer(buffer, dtype=dtype, count=count, offset=start + offset)
+                          for key, (dtype, offset, count) in header["sections"].items()}
+                with gc_paused():
+                    graph = graph_from_arrays(header["graph_name"], arrays, data_type_table)
+            except Exception as error:
+                # cut or corrupted file, the graph is parsed again
+                logger.warning("%s is corrupted: %s", cache_path, error)
+                graph = None
+            finally:
+                # the arrays must be released before the buffer is closed
+                del arrays
+
+    return graph
+
+
+def remove_old_caches(cache_path: str):
+    """Remove the cache files of the older versions of a json file
+
+    Args:
+        cache_path (str): path of the cache file of the current version
+    """
+    directory, name = os.path.split(cache_path)
+    # ".<json name>.<hash of the json path>." followed by the 16 digits of the
+    # hash of the content, the caches of other json files of the same name
+    # have another prefix
+    prefix = name[:-(16 + len(CACHE_EXTENSION))]
+    for other in os.listdir(directory):
+        if other == name or len(other) != len(name) or not other.startswith(prefix) \
+                or not other.endswith(CACHE_EXTENSION):
+            continue
+        digest = other[len(prefix):len(prefix) + 16]
+        if all(digit in "0123456789abcdef" for digit in digest):
+            try:
+                os.remove(os.path.join(directory, other))
+                logger.debug("remove old cache = %s", other)
+            except OSError as error:
+                logger.warning("cannot remove old cache = %s: %s", other, error)
+
+
+def create_graph_cached(input_path: str, cache_dir: str = None, data_type_table: DataTypeTable = None) -> Graph:
+    """Create a graph from a json file, or load it from its cache when the
+    json file has not changed since the cache was written
+
+    Args:
+        input_path (str): path to the json file
+        cache_dir (str, optional): directory of the cache files. Defaults to
+                                   None, i.e. next to the json file.
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types. Defaults to None.
+
+    Returns:
+        Graph: the graph
+    """
+    if os.path.isfile(input_path) == False:
+        logger.error("file does not exist")
+        return
+
+    cache_path = get_cache_path(input_path, cache_dir)
+    if os.path.isfile(cache_path):
+        graph = read_graph_cache(cache_path, data_type_table)
+        if graph is not None:
+            logger.debug("load graph = %s from cache = %s", graph._name, cache_path)
+            return graph
+
+    graph = create_graph(input_path, data_type_table)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    write_graph_cache(cache_path, graph)
+    remove_old_caches(cache_path)
+    logger.debug("store graph = %s in cache = %s", graph._name, cache_path)
+    return graph
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Equivalence of the data types of the parameters.
+
+The label compatibility counts the data types which are not shared by an
+emission and a reception. Some data types of two protocols carry the same
+values under different names, e.g. base64Binary is a string. A data type
+table maps each data type to the data type it is equivalent to:
+
+{
+    "base64Binary": "string",
+    "normalizedString": "string",
+    "token": ["string", "normalizedString"]
+}
+
+The table only holds equivalence classes, not subtyping: the data types linked
+by the table get the same canonical integer id. A list names several data
+types of one class, so its data types must already be equivalent, a list of
+two unrelated data types (e.g. two supertypes) is rejected. When a
+graph is loaded, the data types of the parameters of every transition are
+compiled into a bitmask of their ids, so the number of unshared data types of
+two transitions is the number of bits of the XOR of their masks.
+
+For the vectorized calculations, the masks of many transitions are packed in
+a (transitions, words) array of uint64, with the ids 0 to 63 in the first
+word, 64 to 127 in the second word and so on.
+"""
+
+import numpy as np
+import logging
+import json
+
+# create logger
+logger = logging.getLogger("DATA_TYPES")
+
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+
+class DataTypeTable():
+    def __init__(self, equivalences: dict = None) -> None:
+        """Canonical ids of the data types
+
+        Data types which are not in the table get their own id the first time
+        they are seen, so a table without equivalence gives every data type a
+        different id. The table also keeps the parsed parameters of the
+        transitions using it (see graph.parse_params), so they share one
+        object per list of parameters.
+
+        Args:
+            equivalences (dict, optional): data type -> equivalent data type or
+                                           list of equivalent data types.
+                                           Defaults to None.
+
+        Raises:
+            Exception: an equivalent data type is not a string
+            Exception: the data types of a list are not equivalent
+        """
+        self._parents = {}
+        self._ids = {}
+        self._num_of_ids = 0
+        self.parsed_params = {}
+
+        for data_type, others in (equivalences or {}).items():
+            if type(others) != list:
+                others = [others]
+            for other in others:
+                if type(other) != str:
+                    raise Exception("equivalent data type of {} must be a string".format(data_type))
+            # the data types of a list would become equivalent to each other
+            if len({self._find(other) for other in others}) > 1:
+                raise Exception("equivalent data types of {} = {} are not equivalent to each other, the table "
+                                "only holds equivalence classes".format(data_type, others))
+            for other in others:
+                self._union(data_type, other)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s data types in %s classes",
+                         len(self._parents), len({self._find(data_type) for data_type in self._parents}))
+
+    def _find(self, data_type: str) -> str:
+        """Find the representative data type of the class of a data type
+
+        Args:
+            data_type (str): the data type
+
+        Returns:
+            str: representative data type
+        """
+        root = data_type
+        while self._parents.get(root, root) != root:
+            root = self._parents[root]
+        while data_type != root:
+            self._parents[data_type], data_type = root, self._parents[data_type]
+        return root
+
+    def _union(self, data_type: str, other: str):
+        """Put two data types in the same class, the representative of the
+        class of the equivalent data type stays the representative
+
+        Args:
+            data_type (str): the data type
+            other (str): its equivalent data type
+        """
+        root = self._find(data_type)
+        other_root = self._find(other)
+        self._parents.setdefault(other_root, other_root)
+        if root != other_root:
+            self._parents[root] = other_root
+
+    def __getstate__(self) -> dict:
+        # the parsed parameters are parsed again by the process loading the
+        # pickle, they refer to the table being loaded
+        state = self.__dict__.copy()
+        state["parsed_params"] = {}
+        return state
+
+    def get_canonical_type(self, data_type: str) -> str:
+        """Get the representative data type of a data type
+
+        Args:
+            data_type (str): the data type
+
+        Returns:
+            str: the representative data type, the data type itself when it
+                 has no equivalent data type
+        """
+        return self._find(data_type)
+
+    def get_type_id(self, data_type: str) -> int:
+        """Get the canonical id of a data type
+
+        Args:
+            data_type (str): the data type, None for a parameter without data type
+
+        Returns:
+            int: the id, the same for the equivalent data types
+        """
+        type_id = self._ids.get(data_type)
+        if type_id is None:
+            canonical = self._find(data_type)
+            type_id = self._ids.get(canonical)
+            if type_id is None:
+                type_id = self._num_of_ids
+                self._num_of_ids += 1
+                self._ids[canonical] = type_id
+            self._ids[data_type] = type_id
+        return type_id
+
+    def get_type_mask(self, data_types) -> int:
+        """Get the bitmask of the canonical ids of data types
+
+        Args:
+            data_types: the data types
+
+        Returns:
+            int: bit i is set if a data type has the id i
+        """
+        mask = 0
+        for data_type in data_types:
+            mask |= 1 << self.get_type_id(data_type)
+        return mask
+
+    def get_num_of_type_ids(self) -> int:
+        """Get number of canonical ids given so far
+
+        Returns:
+            int: number of ids
+        """
+        return self._num_of_ids
+
+
+def num_of_unshared_types(type_mask1: int, type_mask2: int) -> int:
+    """Number of data types of one transition which the other has not
+
+    Args:
+        type_mask1 (int): bitmask of the data types of the first transition
+        type_mask2 (int): bitmask of the data types of the second transition
+
+    Returns:
+        int: size of the symmetric difference of the canonical data types
+    """
+    return bin(type_mask1 ^ type_mask2).count("1")
+
+
+def get_num_of_words(type_masks: list) -> int:
+    """Get number of uint64 words holding the largest of some bitmasks
+
+    Args:
+        type_masks (list): bitmasks of canonical data type ids
+
+    Returns:
+        int: number of words, at least 1
+    """
+    bit_length = max((type_mask.bit_length() for type_mask in type_masks), default=0)
+    return max(1, -(-bit_length // 64))
+
+
+def pack_type_masks(type_masks: list, num_of_words: int = None) -> np.ndarray:
+    """Pack bitmasks into uint64 words
+
+    Args:
+        type_masks (list): bitmasks of canonical data type ids
+        num_of_words (int, optional): number of words per bitmask. Defaults
+                                      to None, enough words for the largest.
+
+    Returns:
+        np.ndarray: (bitmasks, words) array, word w holds the bits 64w to 64w + 63
+    """
+    if num_of_words is None:
+        num_of_words = get_num_of_words(type_masks)
+    word_mask = (1 << 64) - 1
+    return np.array([[(type_mask >> (64*word)) & word_mask for word in range(num_of_words)]
+                     for type_mask in type_masks], dtype=np.uint64).reshape(len(type_masks), num_of_words)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Number of bits set in every uint64 word
+
+    Args:
+        words (np.ndarray): uint64 array
+
+    Returns:
+        np.ndarray: number of bits of every word, same shape
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).astype(np.int64)
+
+    # sum of the bits of every 2, 4 and 8 bits, then of the 8 bytes
+    words = words - ((words >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((words * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def num_of_unshared_types_array(type_masks1: np.ndarray, type_masks2: np.ndarray) -> np.ndarray:
+    """Number of unshared data types of packed bitmasks, element by element
+
+    The leading axes are broadcast, e.g. (n1, 1, words) and (1, n2, words)
+    give the (n1, n2) block of every pair.
+
+    Args:
+        type_masks1 (np.ndarray): (..., words1) packed bitmasks
+        type_masks2 (np.ndarray): (..., words2) packed bitmasks
+
+    Returns:
+        np.ndarray: number of unshared data types, the broadcast leading shape
+    """
+    num_of_words = max(type_masks1.shape[-1], type_masks2.shape[-1])
+    padding = [(0, 0)]*(type_masks1.ndim - 1)
+    type_masks1 = np.pad(type_masks1, padding + [(0, num_of_words - type_masks1.shape[-1])])
+    padding = [(0, 0)]*(type_masks2.ndim - 1)
+    type_masks2 = np.pad(type_masks2, padding + [(0, num_of_words - type_masks2.shape[-1])])
+    return popcount(type_masks1 ^ type_masks2).sum(axis=-1)
+
+
+def load_data_type_table(input_path: str) -> DataTypeTable:
+    """Load a data type table from a json file
+
+    Args:
+        input_path (str): path to the json file, an object of data type ->
+                          equivalent data type(s)
+
+    Raises:
+        Exception: the file is not a json object
+
+    Returns:
+        DataTypeTable: the table
+    """
+    with open(input_path, "r") as read_json_file:
+        equivalences = json.load(read_json_file)
+    if type(equivalences) != dict:
+        raise Exception("data type table must be a json object")
+
+    logger.debug("load %s data type equivalences from %s", len(equivalences), input_path)
+    return DataTypeTable(equivalences)
+
+
+# table of the graphs created without a table, every data type is different
+DEFAULT_DATA_TYPE_TABLE = DataTypeTable()
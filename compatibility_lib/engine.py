@@ -0,0 +1,698 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Vectorized calculation engine.
+
+The graphs are compiled once into integer-indexed arrays: every state gets an
+index, every outgoing emission/reception gets an index, and the label
+compatibility between all the (emission, reception) pairs sharing the same name
+is computed up front. An iteration of the compatibility flooding is then a
+handful of whole-array NumPy operations on a |S2|x|S1| matrix, which has the
+same layout as the pandas DataFrame of compatibility_calculation.py (rows are
+the states of graph2, columns the states of graph1).
+"""
+
+from .graph import *
+from .label import LabelCompatibilityTable, BLOCK_SIZE
+from .assignment import best_assignment_sums
+from .tau import TauClosure
+import numpy as np
+import pandas as pd
+import logging
+
+# create logger
+logger = logging.getLogger("ENGINE")
+
+logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.INFO)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+# number of decimals kept after each iteration, same as the python calculation
+DECIMALS = 3
+
+
+class CompiledGraph():
+    def __init__(self, graph: Graph) -> None:
+        """Integer-indexed view of a graph
+
+        Args:
+            graph (Graph): graph to be compiled
+        """
+        states = graph.get_states_list()
+        self.arrays = GraphArrays(graph)
+
+        self.names = self.arrays.names
+        self.index = self.arrays.index
+        self.types = [state._type for state in states]
+        self.final = self.arrays.state_type == StateType.FINAL.value
+        self.num_of_outgoing = np.bincount(self.arrays.transition_source, minlength=len(states))
+        self.num_of_incoming = np.array([state.get_num_of_incoming_transistions() for state in states],
+                                        dtype=np.int64)
+
+        # tau transitions, None if the graph has none
+        self.tau = None
+        if (self.arrays.transition_type == TransitionType.TAU.value).any():
+            self.tau = TauClosure(graph)
+
+        # outgoing emissions and receptions, ordered by source state then by
+        # their position in the state, like get_outgoing_emission_list()
+        is_emission = np.flatnonzero(self.arrays.transition_type == TransitionType.EMISSION.value)
+        is_reception = np.flatnonzero(self.arrays.transition_type == TransitionType.RECEPTION.value)
+        self.emissions = [self.arrays.transitions[i] for i in is_emission]
+        self.emission_source = self.arrays.transition_source[is_emission]
+        self.emission_target = self.arrays.transition_target[is_emission]
+        self.receptions = [self.arrays.transitions[i] for i in is_reception]
+        self.reception_source = self.arrays.transition_source[is_reception]
+        self.reception_target = self.arrays.transition_target[is_reception]
+        self.num_of_emissions = np.bincount(self.emission_source, minlength=len(states))
+
+    def get_num_of_states(self) -> int:
+        """Get number of states
+
+        Returns:
+            int: number of states
+        """
+        return len(self.names)
+
+
+def compile_pairs(emitter: CompiledGraph,
+                  receiver: CompiledGraph,
+                  emitter_is_graph1: bool,
+                  shape: tuple,
+                  lab_comp_table: LabelCompatibilityTable) -> dict:
+    """Build the flat list of (emission, reception) pairs with a non zero label compatibility
+
+    The pairs are sorted by (emission, state of the reception), each such
+    group is one inner max of calculate_best_sum_compatibility.
+
+    Args:
+        emitter (CompiledGraph): graph owning the emissions
+        receiver (CompiledGraph): graph owning the receptions
+        emitter_is_graph1 (bool): True if emitter is graph1
+        shape (tuple): shape of the matrix, (states of graph2, states of graph1)
+        lab_comp_table (LabelCompatibilityTable): label compatibility of the
+                                                  two graphs
+
+    Returns:
+        dict: arrays describing the pairs and their groups
+    """
+    emission_signatures = np.array([lab_comp_table.get_signature_id(emission) for emission in emitter.emissions],
+                                   dtype=np.int64)
+    reception_signatures = np.array([lab_comp_table.get_signature_id(reception) for reception in receiver.receptions],
+                                    dtype=np.int64)
+    signature_names = lab_comp_table.get_signature_arrays()["name"]
+
+    # every emission with the receptions of the same name, the pairs are
+    # ordered by emission then by reception like the nested loops
+    reception_names = signature_names[reception_signatures]
+    by_name = np.argsort(reception_names, kind="stable")
+    emission_names = signature_names[emission_signatures]
+    first = np.searchsorted(reception_names[by_name], emission_names, side="left")
+    counts = np.searchsorted(reception_names[by_name], emission_names, side="right") - first
+
+    # a chunk of the emissions at a time
+    emission_ids = [np.zeros(0, dtype=np.int64)]
+    reception_ids = [np.zeros(0, dtype=np.int64)]
+    lab_comps = [np.zeros(0, dtype=np.float64)]
+    cumulative = np.cumsum(counts)
+    bounds = np.searchsorted(cumulative, np.arange(BLOCK_SIZE, cumulative[-1] if len(counts) else 0, BLOCK_SIZE))
+    for start, end in zip(np.concatenate(([0], bounds)).tolist(), np.concatenate((bounds, [len(counts)])).tolist()):
+        chunk_counts = counts[start:end]
+        pair_emissions = np.repeat(np.arange(start, end, dtype=np.int64), chunk_counts)
+        offsets = np.arange(len(pair_emissions)) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        pair_receptions = by_name[np.repeat(first[start:end], chunk_counts) + offsets]
+        values = lab_comp_table.get_by_ids(emission_signatures[pair_emissions], reception_signatures[pair_receptions])
+        compatible = values > 0
+        emission_ids.append(pair_emissions[compatible])
+        reception_ids.append(pair_receptions[compatible])
+        lab_comps.append(values[compatible])
+
+    emission_ids = np.concatenate(emission_ids)
+    reception_ids = np.concatenate(reception_ids)
+    lab_comps = np.concatenate(lab_comps)
+
+    reception_states = receiver.reception_source[reception_ids]
+    order = np.lexsort((reception_states, emission_ids))
+    emission_ids = emission_ids[order]
+    reception_ids = reception_ids[order]
+    reception_states = reception_states[order]
+    lab_comps = lab_comps[order]
+
+    emission_states = emitter.emission_source[emission_ids]
+    emission_targets = emitter.emission_target[emission_ids]
+    reception_targets = receiver.reception_target[reception_ids]
+
+    # the matrix is indexed [state of graph2, state of graph1]
+    if emitter_is_graph1:
+        read_index = (reception_targets, emission_targets)
+        cells = (reception_states, emission_states)
+    else:
+        read_index = (emission_targets, reception_targets)
+        cells = (emission_states, reception_states)
+
+    if len(order) > 0:
+        new_group = np.ones(len(order), dtype=bool)
+        new_group[1:] = (emission_ids[1:] != emission_ids[:-1]) | (reception_states[1:] != reception_states[:-1])
+        group_start = np.flatnonzero(new_group)
+    else:
+        group_start = np.zeros(0, dtype=np.int64)
+
+    group_cell = np.ravel_multi_index((cells[0][group_start], cells[1][group_start]), shape)
+
+    logger.debug("%s label compatible pairs in %s groups", len(order), len(group_start))
+
+    return {
+        "lab_comp": lab_comps,
+        "reception_id": reception_ids,
+        "read_index": read_index,
+        "group_start": group_start,
+        "group_cell": group_cell,
+    }
+
+
+def tau_distance(neighbor_values: list, degree: np.ndarray, observable: np.ndarray, obs: np.ndarray) -> np.ndarray:
+    """d(si, sj) of state pairs, from the propagation of the pairs reached by
+    the tau transitions of si
+
+    Args:
+        neighbor_values (list): propagation of the k-th neighbor of every pair,
+                                for k = 0, 1, ... the maximum degree
+        degree (np.ndarray): number of tau transitions of si
+        observable (np.ndarray): si has a transition which is not tau
+        obs (np.ndarray): obs_comp of the pairs
+
+    Returns:
+        np.ndarray: d(si, sj), obs_comp if si has no tau transition
+    """
+    # summed in the order of the tau transitions, like the python calculation
+    total = np.zeros(len(obs))
+    for k, values in enumerate(neighbor_values):
+        total += np.where(k < degree, values, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distance = np.where(observable, (total + obs)/(degree + 1), total/degree)
+    return np.where(degree > 0, distance, obs)
+
+
+def _dense_rank(matrix_id: np.ndarray, keys: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """Rank of sorted keys among the distinct keys of their matrix
+
+    Args:
+        matrix_id (np.ndarray): sorted matrix of every key
+        keys (np.ndarray): keys, sorted within each matrix
+        first (np.ndarray): position of the first key of every matrix
+
+    Returns:
+        np.ndarray: 0 for the smallest key of a matrix, 1 for the next one...
+    """
+    new_key = np.ones(len(keys), dtype=bool)
+    new_key[1:] = (keys[1:] != keys[:-1]) | (matrix_id[1:] != matrix_id[:-1])
+    count = np.cumsum(new_key) - 1
+    return count - count[first][matrix_id]
+
+
+class CompatibilityEngine():
+    def __init__(self,
+                 graph1: Graph,
+                 graph2: Graph,
+                 lab_comp_table: LabelCompatibilityTable = None,
+                 one_to_one: bool = False) -> None:
+        """Compile two graphs for the vectorized calculation
+
+        Args:
+            graph1 (Graph): first graph, columns of the matrix
+            graph2 (Graph): second graph, rows of the matrix
+            lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the two graphs. Defaults to None, i.e. built here
+            one_to_one (bool, optional): a reception is taken by at most one
+                                emission in the best sums. Defaults to False.
+        """
+        if lab_comp_table is None:
+            lab_comp_table = LabelCompatibilityTable(graph1, graph2)
+        self.lab_comp_table = lab_comp_table
+
+        self.graph1 = CompiledGraph(graph1)
+        self.graph2 = CompiledGraph(graph2)
+        self.shape = (self.graph2.get_num_of_states(), self.graph1.get_num_of_states())
+
+        logger.info("matrix has the size = %sx%s", self.shape[0], self.shape[1])
+
+        # emissions of graph1 against receptions of graph2, then emissions of
+        # graph2 against receptions of graph1. They are kept apart so the two
+        # best sums are accumulated in the same order as the python calculation
+        self._pairs = (compile_pairs(self.graph1, self.graph2, True, self.shape, lab_comp_table),
+                       compile_pairs(self.graph2, self.graph1, False, self.shape, lab_comp_table))
+
+        # per cell constants of the state compatibility
+        g1, g2 = self.graph1, self.graph2
+        self._num_of_emissions = g2.num_of_emissions[:, None] + g1.num_of_emissions[None, :]
+        self._both_final = g2.final[:, None] & g1.final[None, :]
+        self._w1 = g2.num_of_outgoing[:, None] + g1.num_of_outgoing[None, :]
+        self._w2 = g2.num_of_incoming[:, None] + g1.num_of_incoming[None, :]
+        self._w3 = 1
+
+        # forward and backward tau propagations, the pairs of each sum of
+        # levels are calculated together, after the pairs they read
+        self._tau = None
+        if g1.tau is not None or g2.tau is not None:
+            closure1 = g1.tau if g1.tau is not None else TauClosure(graph1)
+            closure2 = g2.tau if g2.tau is not None else TauClosure(graph2)
+            self._any_tau = closure2.has_tau[:, None] | closure1.has_tau[None, :]
+            self._tau = []
+            for backward in (False, True):
+                arrays1 = closure1.to_arrays(backward)
+                arrays2 = closure2.to_arrays(backward)
+                levels = (arrays2["level"][:, None] + arrays1["level"][None, :]).ravel()
+                cells = np.flatnonzero(levels > 0)
+                cells = cells[np.argsort(levels[cells], kind="stable")]
+                bounds = np.flatnonzero(np.diff(levels[cells])) + 1
+                self._tau.append({
+                    "graph1": arrays1,
+                    "graph2": arrays2,
+                    "pairs": [np.unravel_index(group, self.shape) for group in np.split(cells, bounds)
+                              if len(group) > 0],
+                })
+        self._nature = np.array([[1 if type1 == type2 else 0 for type1 in g1.types] for type2 in g2.types],
+                                dtype=np.int64)
+
+        self.one_to_one = one_to_one
+        if one_to_one:
+            for pairs in self._pairs:
+                num_of_pairs = len(pairs["lab_comp"])
+                group_lengths = np.diff(np.append(pairs["group_start"], num_of_pairs))
+                pairs["group_id"] = np.repeat(np.arange(len(pairs["group_start"])), group_lengths)
+                # pairs of each cell, by emission then by reception
+                pair_cell = pairs["group_cell"][pairs["group_id"]]
+                pairs["cell_order"] = np.lexsort((pairs["reception_id"], pairs["group_id"], pair_cell))
+                pairs["cell_start"] = np.searchsorted(pair_cell[pairs["cell_order"]],
+                                                      np.arange(self.shape[0]*self.shape[1] + 1))
+                pairs["num_of_receptions"] = int(pairs["reception_id"].max()) + 1 if num_of_pairs > 0 else 1
+
+    def _assign(self, pairs: dict, values: np.ndarray, best: np.ndarray, sums: np.ndarray):
+        """Replace the greedy best sums by the one-to-one sums
+
+        A cell needs a matching only when a reception is the best one of
+        several of its emissions; the greedy sum of the other cells is
+        already the best one-to-one sum.
+
+        Args:
+            pairs (dict): compiled pairs of one direction
+            values (np.ndarray): score of every pair
+            best (np.ndarray): greedy maximum of every group
+            sums (np.ndarray): flat greedy sums, updated in place
+        """
+        group_id = pairs["group_id"]
+        claimed = np.flatnonzero((values == best[group_id]) & (values > 0))
+        base = pairs["num_of_receptions"]
+        keys = pairs["group_cell"][group_id[claimed]]*base + pairs["reception_id"][claimed]
+        keys, counts = np.unique(keys, return_counts=True)
+        cells = np.unique(keys[counts > 1]//base)
+        if len(cells) == 0:
+            return
+
+        # pairs of the cells, ordered by cell, emission and reception
+        starts = pairs["cell_start"][cells]
+        lengths = pairs["cell_start"][cells + 1] - starts
+        first = np.cumsum(lengths) - lengths
+        matrix_id = np.repeat(np.arange(len(cells)), lengths)
+        selected = pairs["cell_order"][np.repeat(starts - first, lengths) + np.arange(lengths.sum())]
+
+        # row of the emission and column of the reception in the score matrix of the cell
+        rows = _dense_rank(matrix_id, group_id[selected], first)
+        reception_id = pairs["reception_id"][selected]
+        order = np.lexsort((reception_id, matrix_id))
+        columns = np.empty(len(selected), dtype=np.int64)
+        columns[order] = _dense_rank(matrix_id[order], reception_id[order], first)
+
+        num_of_rows = np.maximum.reduceat(rows, first) + 1
+        num_of_columns = np.maximum.reduceat(columns, first) + 1
+        shapes = np.stack((num_of_rows, num_of_columns), axis=1)
+        for shape in np.unique(shapes, axis=0).tolist():
+            matrices = np.flatnonzero((shapes == shape).all(axis=1))
+            position = np.full(len(cells), -1)
+            position[matrices] = np.arange(len(matrices))
+            in_shape = np.flatnonzero(position[matrix_id] >= 0)
+            scores = np.zeros((len(matrices), shape[0], shape[1]))
+            scores[position[matrix_id[in_shape]], rows[in_shape], columns[in_shape]] = values[selected[in_shape]]
+            sums[cells[matrices]] = best_assignment_sums(scores)
+
+        logger.debug("%s cells with a reception shared by several emissions", len(cells))
+
+    def _best_sum(self, pairs: dict, matrix: np.ndarray) -> np.ndarray:
+        """Best sum compatibility of every state pair in one direction
+
+        Args:
+            pairs (dict): compiled pairs of one direction
+            matrix (np.ndarray): matrix of the last iteration
+
+        Returns:
+            np.ndarray: sum matrix
+        """
+        size = self.shape[0] * self.shape[1]
+        if len(pairs["group_start"]) == 0:
+            return np.zeros(self.shape)
+
+        values = pairs["lab_comp"] * matrix[pairs["read_index"]]
+        best = np.maximum.reduceat(values, pairs["group_start"])
+        sums = np.bincount(pairs["group_cell"], weights=best, minlength=size)
+        if self.one_to_one:
+            self._assign(pairs, values, best, sums)
+        return sums.reshape(self.shape)
+
+    def initial_matrix(self) -> np.ndarray:
+        """Matrix of the iteration 0, every state pair is compatible
+
+        Returns:
+            np.ndarray: matrix filled with 1
+        """
+        return np.ones(self.shape)
+
+    def obs_comp(self, matrix: np.ndarray) -> np.ndarray:
+        """Observational compatibility of every state pair
+
+        Args:
+            matrix (np.ndarray): matrix of the last iteration
+
+        Returns:
+            np.ndarray: obs_comp matrix
+        """
+        sum1 = self._best_sum(self._pairs[0], matrix)
+        sum2 = self._best_sum(self._pairs[1], matrix)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            obs_comp = (sum1 + sum2)/self._num_of_emissions
+
+        return np.where(self._num_of_emissions > 0, obs_comp, np.where(self._both_final, 1.0, 0.0))
+
+    def propagation(self, obs_comp: np.ndarray, backward: bool = False) -> np.ndarray:
+        """Forward (backward) propagation of every state pair
+
+        Args:
+            obs_comp (np.ndarray): obs_comp matrix
+            backward (bool, optional): follow the incoming tau transitions.
+                                       Defaults to False.
+
+        Returns:
+            np.ndarray: propagation matrix, obs_comp without tau
+        """
+        if self._tau is None:
+            return obs_comp
+
+        tau = self._tau[1 if backward else 0]
+        propagation = obs_comp.copy()
+        for rows, columns in tau["pairs"]:
+            obs = obs_comp[rows, columns]
+            # d(s1, s2) follows the tau transitions of graph1, d(s2, s1) those of graph2
+            d1 = tau_distance([propagation[rows, neighbors] for neighbors in tau["graph1"]["neighbors"][columns].T],
+                              tau["graph1"]["degree"][columns], tau["graph1"]["observable"][columns], obs)
+            d2 = tau_distance([propagation[neighbors, columns] for neighbors in tau["graph2"]["neighbors"][rows].T],
+                              tau["graph2"]["degree"][rows], tau["graph2"]["observable"][rows], obs)
+            propagation[rows, columns] = (d1 + d2)/2
+        return propagation
+
+    def step(self, matrix: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Calculate the next iteration
+
+        Args:
+            matrix (np.ndarray): matrix of the last iteration
+            out (np.ndarray, optional): buffer receiving the next iteration, must
+                                        not be matrix. Defaults to None, i.e.
+                                        a new matrix is allocated
+
+        Returns:
+            np.ndarray: matrix of the next iteration
+        """
+        obs_comp = self.obs_comp(matrix)
+
+        fw_propagation = self.propagation(obs_comp)
+        bw_propagation = self.propagation(obs_comp, backward=True)
+
+        w3 = self._w3
+        if self._tau is not None:
+            w3 = np.where(self._any_tau & (fw_propagation == 1) & (bw_propagation == 1), 0, 1)
+
+        state_comp = ((self._w1*fw_propagation + self._w2*bw_propagation + w3*self._nature)
+                      /(self._w1 + self._w2 + w3))
+        compatibility = (matrix + state_comp)/2
+
+        # the python calculation rounds numpy scalars, i.e. with np.round
+        return np.round(compatibility, DECIMALS, out=out)
+
+    def run(self, iterate: int) -> np.ndarray:
+        """Run the calculation from the iteration 0
+
+        Args:
+            iterate (int): number of iterations
+
+        Returns:
+            np.ndarray: matrix of the last iteration
+        """
+        matrix = self.initial_matrix()
+        buffer = np.empty(self.shape)
+        for _ in range(iterate):
+            matrix, buffer = self.step(matrix, out=buffer), matrix
+        return matrix
+
+    def to_dataframe(self, matrix: np.ndarray) -> pd.DataFrame:
+        """Label a matrix with the state names
+
+        Args:
+            matrix (np.ndarray): matrix of the engine
+
+        Returns:
+            pd.DataFrame: matrix with the states of graph1 as columns and
+                          the states of graph2 as rows
+        """
+        return pd.DataFrame(matrix, index=self.graph2.names, columns=self.graph1.names)
+
+    def to_array(self, comp_matrix: pd.DataFrame) -> np.ndarray:
+        """Convert a labelled matrix to the layout of the engine
+
+        Args:
+            comp_matrix (pd.DataFrame): labelled matrix
+
+        Returns:
+            np.ndarray: matrix of the engine
+        """
+        return comp_matrix.loc[self.graph2.names, self.graph1.names].to_numpy(dtype=np.float64)
+
+
+class WorklistSolver():
+    def __init__(self, engine: CompatibilityEngine, tolerance: float = 0.0) -> None:
+        """Worklist solver on top of a compiled engine
+
+        A round only calculates the active cells. A cell whose value moved by
+        more than the tolerance activates itself and the cells reading it
+        through a pair of next states for the next round. With a tolerance of
+        0, every round gives the same matrix as a step of the engine, the
+        solver only skips the cells whose inputs did not change.
+
+        Args:
+            engine (CompatibilityEngine): compiled engine of the two graphs
+            tolerance (float, optional): smallest change which activates the
+                                         readers of a cell. Defaults to 0.0.
+
+        Raises:
+            Exception: the engine has the one-to-one assignment or tau transitions
+        """
+        if engine.one_to_one:
+            raise Exception("one-to-one assignment is not supported by the worklist solver")
+        if engine._tau is not None:
+            raise Exception("tau calculation is not supported by the worklist solver")
+
+        self.engine = engine
+        self.tolerance = tolerance
+        self.shape = engine.shape
+        size = self.shape[0] * self.shape[1]
+
+        # the pairs of both directions, with the flat index of the cell they
+        # belong to and of the cell they read
+        self._directions = []
+        for pairs in engine._pairs:
+            num_of_pairs = len(pairs["lab_comp"])
+            group_lengths = np.diff(np.append(pairs["group_start"], num_of_pairs))
+            group_id = np.repeat(np.arange(len(pairs["group_start"])), group_lengths)
+            if num_of_pairs > 0:
+                read_cell = np.ravel_multi_index(pairs["read_index"], self.shape)
+            else:
+                read_cell = np.zeros(0, dtype=np.int64)
+
+            self._directions.append({
+                "lab_comp": pairs["lab_comp"],
+                "group_id": group_id,
+                "pair_cell": pairs["group_cell"][group_id],
+                "read_cell": read_cell,
+            })
+
+        self._reader = np.concatenate([direction["pair_cell"] for direction in self._directions])
+        self._read = np.concatenate([direction["read_cell"] for direction in self._directions])
+
+        self._num_of_emissions = engine._num_of_emissions.ravel()
+        self._both_final = engine._both_final.ravel()
+        self._w1 = engine._w1.ravel()
+        self._w2 = engine._w2.ravel()
+        self._w3 = engine._w3
+        self._nature = engine._nature.ravel()
+
+        # every cell is calculated in the first round
+        self._active = np.ones(size, dtype=bool)
+        self.num_of_calculated_cells = 0
+
+        logger.debug("%s dependencies between cells", len(self._reader))
+
+    def get_num_of_active_cells(self) -> int:
+        """Get number of cells calculated by the next round
+
+        Returns:
+            int: number of active cells
+        """
+        return int(np.count_nonzero(self._active))
+
+    def is_converged(self) -> bool:
+        """Check if no cell is active anymore
+
+        Returns:
+            bool: True when the next round would not change the matrix
+        """
+        return not self._active.any()
+
+    def _best_sum(self, direction: dict, values: np.ndarray, cells: np.ndarray) -> np.ndarray:
+        """Best sum compatibility of the active cells in one direction
+
+        Args:
+            direction (dict): pairs of one direction
+            values (np.ndarray): flat matrix of the last round
+            cells (np.ndarray): sorted flat indexes of the active cells
+
+        Returns:
+            np.ndarray: best sum of each active cell
+        """
+        selected = self._active[direction["pair_cell"]]
+        if not selected.any():
+            return np.zeros(len(cells))
+
+        group_id = direction["group_id"][selected]
+        pair_values = direction["lab_comp"][selected] * values[direction["read_cell"][selected]]
+
+        new_group = np.ones(len(group_id), dtype=bool)
+        new_group[1:] = group_id[1:] != group_id[:-1]
+        group_start = np.flatnonzero(new_group)
+
+        best = np.maximum.reduceat(pair_values, group_start)
+        positions = np.searchsorted(cells, direction["pair_cell"][selected][group_start])
+        return np.bincount(positions, weights=best, minlength=len(cells))
+
+    def step(self, matrix: np.ndarray, in_place: bool = False) -> np.ndarray:
+        """Calculate the active cells and find the active cells of the next round
+
+        Args:
+            matrix (np.ndarray): matrix of the last round
+            in_place (bool, optional): write the new values into matrix.
+                                       Defaults to False.
+
+        Returns:
+            np.ndarray: matrix of the next round
+        """
+        next_matrix = matrix if in_place else matrix.copy()
+        cells = np.flatnonzero(self._active)
+        if len(cells) == 0:
+            return next_matrix
+
+        values = matrix.ravel()
+        sum1 = self._best_sum(self._directions[0], values, cells)
+        sum2 = self._best_sum(self._directions[1], values, cells)
+
+        num_of_emissions = self._num_of_emissions[cells]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            obs_comp = (sum1 + sum2)/num_of_emissions
+        obs_comp = np.where(num_of_emissions > 0, obs_comp, np.where(self._both_final[cells], 1.0, 0.0))
+
+        # same operations as CompatibilityEngine.step, restricted to the cells
+        w1 = self._w1[cells]
+        w2 = self._w2[cells]
+        state_comp = (w1*obs_comp + w2*obs_comp + self._w3*self._nature[cells])/(w1 + w2 + self._w3)
+        last_values = values[cells]
+        new_values = np.round((last_values + state_comp)/2, DECIMALS)
+
+        moved = np.zeros(len(self._active), dtype=bool)
+        moved[cells[np.abs(new_values - last_values) > self.tolerance]] = True
+
+        self._active = moved.copy()
+        self._active[self._reader[moved[self._read]]] = True
+        self.num_of_calculated_cells += len(cells)
+
+        next_matrix.ravel()[cells] = new_values
+        return next_matrix
+
+    def solve(self, matrix: np.ndarray = None, max_rounds: int = 1000) -> tuple:
+        """Run rounds until no cell is active
+
+        Args:
+            matrix (np.ndarray, optional): starting matrix. Defaults to None,
+                                           i.e. the iteration 0.
+            max_rounds (int, optional): maximum number of rounds. Defaults to 1000.
+
+        Returns:
+            tuple: (last matrix, number of rounds)
+        """
+        if matrix is None:
+            matrix = self.engine.initial_matrix()
+        else:
+            matrix = matrix.copy()
+
+        rounds = 0
+        while not self.is_converged() and rounds < max_rounds:
+            matrix = self.step(matrix, in_place=True)
+            rounds += 1
+
+        logger.info("%s rounds, %s cells calculated", rounds, self.num_of_calculated_cells)
+        return (matrix, rounds)
+
+
+def calculate_compatibility_vectorized(graph1: Graph,
+                                       graph2: Graph,
+                                       last_comp_matrix: pd.DataFrame = None,
+                                       engine: CompatibilityEngine = None) -> pd.DataFrame:
+    """Drop-in replacement of calculate_compatibility using the engine
+
+    Args:
+        graph1 (Graph): first graph
+        graph2 (Graph): second graph
+        last_comp_matrix (pd.DataFrame, optional): matrix of the last iteration.
+                                                   Defaults to None, i.e. the iteration 0
+        engine (CompatibilityEngine, optional): already compiled engine of the
+                                                two graphs. Defaults to None
+
+    Returns:
+        pd.DataFrame: matrix of the next iteration
+    """
+    if engine is None:
+        engine = CompatibilityEngine(graph1, graph2)
+
+    if last_comp_matrix is None:
+        return engine.to_dataframe(engine.initial_matrix())
+
+    return engine.to_dataframe(engine.step(engine.to_array(last_comp_matrix)))
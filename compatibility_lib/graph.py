@@ -15,7 +15,12 @@ states, and transitions based on this module.
 """
 
 from enum import Enum, auto
+from contextlib import contextmanager
+from .data_types import DataTypeTable, DEFAULT_DATA_TYPE_TABLE
+import numpy as np
 import logging
+import sys
+import gc
 
 # create logger
 logger = logging.getLogger("GRAPH")
@@ -39,6 +44,22 @@ ch.setFormatter(formatter)
 # add ch to logger
 logger.addHandler(ch)
 
+@contextmanager
+def gc_paused():
+    """Pause the garbage collector while many objects are created
+
+    The states and transitions of a large graph are only allocated, so the
+    collections triggered by these allocations find nothing to free but walk
+    every object created so far.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 class TransitionType(Enum):
     TAU = auto()
     EMISSION = auto()
@@ -49,30 +70,98 @@ class StateType(Enum):
     FINAL = auto()
     NORMAL = auto()
 
+def split_param(param: str) -> tuple:
+    """Split a parameter "name:data_type"
+
+    Args:
+        param (str): the parameter
+
+    Returns:
+        tuple: (name, data type), the data type is None without ":"
+    """
+    fields = param.split(":")
+    return (sys.intern(fields[0]), sys.intern(fields[1]) if len(fields) > 1 else None)
+
+class Params(tuple):
+    """Immutable parameters "name:data_type" of a transition, parsed once
+
+    Attributes:
+        pairs (tuple): (name, data type) of every parameter
+        data_types (tuple): data types without duplicate, in order of appearance
+        data_type_set (frozenset): data types
+        data_type_table (DataTypeTable): table of the canonical data type ids
+        type_mask (int): bitmask of the canonical ids of the data types
+    """
+    def __new__(cls, params: tuple = (), data_type_table: DataTypeTable = None):
+        self = super().__new__(cls, params)
+        self.pairs = tuple(split_param(param) for param in self)
+        self.data_types = tuple(dict.fromkeys(data_type for name, data_type in self.pairs))
+        self.data_type_set = frozenset(self.data_types)
+        self.data_type_table = DEFAULT_DATA_TYPE_TABLE if data_type_table is None else data_type_table
+        self.type_mask = self.data_type_table.get_type_mask(self.data_types)
+        return self
+
+    def __reduce__(self):
+        # parsed again by the process loading the pickle, with its own default
+        # table, the ids of a table are only compared within that process
+        data_type_table = None if self.data_type_table is DEFAULT_DATA_TYPE_TABLE else self.data_type_table
+        return (parse_params, (tuple(self), data_type_table))
+
+def parse_params(params, data_type_table: DataTypeTable = None) -> Params:
+    """Get the parsed parameters of a transition
+
+    Args:
+        params: parameters "name:data_type"
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types. Defaults to None,
+                                                   every data type is different.
+
+    Returns:
+        Params: the parameters, the same object for the same parameters
+    """
+    if data_type_table is None:
+        data_type_table = DEFAULT_DATA_TYPE_TABLE
+    if type(params) == Params and params.data_type_table is data_type_table:
+        return params
+    params = tuple(params)
+    # kept by the table, so they are freed together with the table
+    parsed = data_type_table.parsed_params.get(params)
+    if parsed is None:
+        parsed = Params(params, data_type_table)
+        data_type_table.parsed_params[params] = parsed
+    return parsed
+
 class Transition():
+    __slots__ = ("name", "type", "next_state", "params")
+    
     def __init__(self, name: str,
                  type: TransitionType,
                  next_state: str,
-                 params: list = []) -> None:
+                 params: tuple = (),
+                 data_type_table: DataTypeTable = None) -> None:
         """__init__ constructore for Transition class
 
         Args:
             name (str): name of the transition
             type (TransitionType): type of the transition
             next_state (str): name of the next state, where the transition going to
-            params (list, optional): parameter list of the transiotion.
-                                    Defaults to []. For TAU transition, this argument
-                                    must be []
+            params (tuple, optional): parameter list of the transiotion.
+                                    Defaults to (). For TAU transition, this argument
+                                    must be empty. It is stored as an immutable
+                                    Params tuple.
+            data_type_table (DataTypeTable, optional): equivalence of the data
+                                    types of the parameters. Defaults to None,
+                                    every data type is different.
 
         Raises:
             Exception: Tau transition has list of parameters, i.e., params is
                         not empty
         """
           
-        self.name = name
+        self.name = sys.intern(name)
         self.type = type
-        self.next_state = next_state
-        self.params = params
+        self.next_state = sys.intern(next_state)
+        self.params = parse_params(params, data_type_table)
         
         if self.type == TransitionType.TAU and params:
             raise Exception("Illegal transition. tau has no parameters list")
@@ -87,12 +176,12 @@ class Transition():
             str: data type or None
         """
         data_type = None
-        logger.debug("get data type of [parameter = {}]".format(param_name))
+        logger.debug("get data type of [parameter = %s]", param_name)
         
         if self.params:
-            for param in self.params:
+            for param, (name, param_type) in zip(self.params, self.params.pairs):
                 if param_name in param:
-                    data_type = param.split(":")[1]
+                    data_type = param_type
         else:
             logger.warning("parameters list is empty")
             
@@ -104,18 +193,15 @@ class Transition():
         Returns:
             list: list of data type or None
         """
-        data_types = []
-        if self.params:
-            for param in self.params:
-                # Only get this type if it is not duplicated
-                if param.split(":")[1] not in data_types:
-                    data_types.append(param.split(":")[1])        
-        else:
+        if not self.params:
             logger.warning("parameters list is empty")
         
-        return data_types
+        return list(self.params.data_types)
 
 class State():
+    __slots__ = ("_name", "_type", "_incoming", "_outgoing",
+                 "_incoming_by_name", "_outgoing_by_name", "_incoming_by_type", "_outgoing_by_type")
+    
     def __init__(self, name: str,
                  type: StateType,
                  incoming: list = None,
@@ -131,7 +217,7 @@ class State():
             Exception: Initial state does not have incoming transition
             Exception: Final state does not have outgoing transition
         """
-        self._name = name
+        self._name = sys.intern(name)
         self._type = type
         
         if incoming == None:
@@ -148,8 +234,63 @@ class State():
             raise Exception("Initial state does not have incoming transition")
     
         if (self._type == StateType.FINAL) and (self._outgoing != []):
-            logger.debug("outgoing transition = {}".format(self._outgoing))
+            logger.debug("outgoing transition = %s", self._outgoing)
             raise Exception("Final state does not have outgoing transition")
+        
+        # indexes by name and by type, built from the transitions at the first
+        # lookup and then kept up to date by add_*_transition
+        self._incoming_by_name = None
+        self._outgoing_by_name = None
+        self._incoming_by_type = {}
+        self._outgoing_by_type = {}
+
+    @staticmethod
+    def _index_transition(transition: Transition, by_name: dict, by_type: dict):
+        """Add a transition to the indexes which are already built
+
+        Args:
+            transition (Transition): transition to be indexed
+            by_name (dict): index by name, the first transition of a name is kept
+            by_type (dict): index by type
+        """
+        if by_name is not None and transition.name not in by_name:
+            by_name[transition.name] = transition
+        same_type = by_type.get(transition.type)
+        if same_type is not None:
+            same_type.append(transition)
+
+    @staticmethod
+    def _build_by_name(transitions: list) -> dict:
+        """Build the index by name of a list of transitions
+
+        Args:
+            transitions (list): the transitions
+
+        Returns:
+            dict: index by name, the first transition of a name is kept
+        """
+        by_name = {}
+        for transition in transitions:
+            by_name.setdefault(transition.name, transition)
+        return by_name
+
+    @staticmethod
+    def _get_by_type(transitions: list, by_type: dict, transition_type: TransitionType) -> list:
+        """Get the transitions of a type, the list is built at the first call
+
+        Args:
+            transitions (list): the transitions
+            by_type (dict): index by type
+            transition_type (TransitionType): the type
+
+        Returns:
+            list: transitions of the type
+        """
+        same_type = by_type.get(transition_type)
+        if same_type is None:
+            same_type = [transition for transition in transitions if transition.type == transition_type]
+            by_type[transition_type] = same_type
+        return same_type
 
     def add_incoming_transition(self, transition: Transition):
         """Add an incoming transition
@@ -164,7 +305,8 @@ class State():
             return
         
         self._incoming.append(transition)
-        logger.debug("add new incoming transition [name = {}]".format(transition.name))
+        self._index_transition(transition, self._incoming_by_name, self._incoming_by_type)
+        logger.debug("add new incoming transition [name = %s]", transition.name)
         
     
     def add_outgoing_transition(self, transition: Transition):
@@ -179,11 +321,12 @@ class State():
         if transition is None:
             return
         
-        logger.debug("add new outgoing transition [name = {}]".format(transition.name))
+        logger.debug("add new outgoing transition [name = %s]", transition.name)
         if self._type == StateType.FINAL:
             raise Exception("Final state does not have outgoing transition")
         else:
             self._outgoing.append(transition)
+            self._index_transition(transition, self._outgoing_by_name, self._outgoing_by_type)
     
     def get_incoming_transtition(self, name: str) -> Transition:
         """Get an incoming transition
@@ -194,15 +337,15 @@ class State():
         Returns:
             Transition: incoming transition
         """
-        logger.debug("get incoming transition [name = {}]".format(name))
+        logger.debug("get incoming transition [name = %s]", name)
         ret_transition = None
         
         if self._type != StateType.INIT:
-            for transition in self._incoming:
-                if name == transition.name:
-                    ret_transition = transition
-                    logger.debug("transition found")
-                    break
+            if self._incoming_by_name is None:
+                self._incoming_by_name = self._build_by_name(self._incoming)
+            ret_transition = self._incoming_by_name.get(name)
+            if ret_transition is not None:
+                logger.debug("transition found")
         else:
             logger.warning("Initial state has no incoming transitions")
         return ret_transition
@@ -216,15 +359,15 @@ class State():
         Returns:
             Transition: outgoing transition
         """
-        logger.debug("get outgoing transition [name = {}]".format(name))
+        logger.debug("get outgoing transition [name = %s]", name)
         ret_transition = None
         
         if self._type != StateType.FINAL:
-            for transition in self._outgoing:
-                if name == transition.name:
-                    ret_transition = transition
-                    logger.debug("transition found")
-                    break
+            if self._outgoing_by_name is None:
+                self._outgoing_by_name = self._build_by_name(self._outgoing)
+            ret_transition = self._outgoing_by_name.get(name)
+            if ret_transition is not None:
+                logger.debug("transition found")
         else:
             logger.warning("Final state has no outgoing transitions")
                     
@@ -250,61 +393,49 @@ class State():
     def get_outgoing_emission_list(self) -> list:
         """Return the list of outgoing emission transition
 
+        The list is kept up to date by add_outgoing_transition and is shared
+        between the calls, it must not be modified.
+
         Returns:
             list: emission transition
         """
-        emission = []
-        
-        for transition in self._outgoing:
-            if transition.type == TransitionType.EMISSION:
-                emission.append(transition)
-
-        return emission
+        return self._get_by_type(self._outgoing, self._outgoing_by_type, TransitionType.EMISSION)
     
     
     def get_outgoing_reception_list(self) -> list:
         """Return the list of outgoing reception transition
 
+        The list is kept up to date by add_outgoing_transition and is shared
+        between the calls, it must not be modified.
+
         Returns:
             list: reception transition
         """
-        reception = []
-        
-        for transition in self._outgoing:
-            if transition.type == TransitionType.RECEPTION:
-                reception.append(transition)
-
-        return reception
+        return self._get_by_type(self._outgoing, self._outgoing_by_type, TransitionType.RECEPTION)
     
     
     def get_outgoing_tau_list(self):
         """Return the list of outgoing tau transition
 
+        The list is kept up to date by add_outgoing_transition and is shared
+        between the calls, it must not be modified.
+
         Returns:
             list: tau transition
         """
-        tau = []
-        
-        for transition in self._outgoing:
-            if transition.type == TransitionType.TAU:
-                tau.append(transition)
-
-        return tau
+        return self._get_by_type(self._outgoing, self._outgoing_by_type, TransitionType.TAU)
     
     
     def get_imcoming_tau_list(self):
         """Return the list of incoming tau transition
 
+        The list is kept up to date by add_incoming_transition and is shared
+        between the calls, it must not be modified.
+
         Returns:
             list: tau transition
         """
-        tau = []
-        
-        for transition in self._incoming:
-            if transition.type == TransitionType.TAU:
-                tau.append(transition)
-
-        return tau
+        return self._get_by_type(self._incoming, self._incoming_by_type, TransitionType.TAU)
 
     
     def get_num_of_incoming_transistions(self) -> int:
@@ -332,10 +463,10 @@ class State():
             bool: True if final state
         """
         if self._type == StateType.FINAL:
-            logger.debug("[state = {}] is FINAL state".format(self._name))
+            logger.debug("[state = %s] is FINAL state", self._name)
             return True
         else:
-            logger.debug("[state = {}] is NOT FINAL state".format(self._name))
+            logger.debug("[state = %s] is NOT FINAL state", self._name)
             return False
     
     def is_initial_state(self) -> bool:
@@ -345,10 +476,10 @@ class State():
             bool: True if initial state
         """
         if self._type == StateType.INIT:
-            logger.debug("[state = {}] is INIT state".format(self._name))
+            logger.debug("[state = %s] is INIT state", self._name)
             return True
         else:
-            logger.debug("[state = {}] is NOT INIT state".format(self._name))
+            logger.debug("[state = %s] is NOT INIT state", self._name)
             return False
         
     def get_name(self) -> str:
@@ -387,6 +518,8 @@ class State():
             
             
 class Graph():
+    __slots__ = ("_name", "_states", "_states_by_name")
+    
     def __init__(self, name: str, states: list = None) -> None:
 
         """Constructor of Graph class
@@ -402,6 +535,11 @@ class Graph():
         else:
             self._states = states
         
+        # index by name, the first state of a name is kept
+        self._states_by_name = {}
+        for state in self._states:
+            self._states_by_name.setdefault(state.get_name(), state)
+        
     def add_state(self, state: State):
         """Add new state to the graph
 
@@ -409,8 +547,9 @@ class Graph():
             state (State): new state
         """
         if state != None:
-            logger.debug("add [state = {}] to graph".format(state.get_name()))
+            logger.debug("add [state = %s] to graph", state.get_name())
             self._states.append(state)
+            self._states_by_name.setdefault(state.get_name(), state)
         
     def get_state(self, state_name: str) ->State:
         """Get a state
@@ -421,18 +560,12 @@ class Graph():
         Returns:
             State: state or None
         """
-        logger.debug("looking for [state = {}]".format(state_name))
-        ret_state = None
-    
-        for state in self._states:
-            if state_name == state.get_name():
-                ret_state = state
-                logger.debug("state found")
-                break
-            else:
-                pass
+        logger.debug("looking for [state = %s]", state_name)
+        ret_state = self._states_by_name.get(state_name)
         
-        if ret_state == None:
+        if ret_state != None:
+            logger.debug("state found")
+        else:
             logger.warning("state not found")
         return ret_state
     
@@ -459,6 +592,66 @@ class Graph():
         print("####################################################################################")
         print()
 
+
+
+
+class GraphArrays():
+    def __init__(self, graph: Graph) -> None:
+        """Columnar view of a graph with integer ids
+
+        The states are numbered in the order of the graph and the outgoing
+        transitions of all the states in the order of the states, then of
+        their position in the state. The names of the transitions and the data
+        types of the parameters are numbered in order of appearance.
+
+        Args:
+            graph (Graph): the graph
+        """
+        states = graph.get_states_list()
+
+        self.names = [state.get_name() for state in states]
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, i)
+        self.state_type = np.array([state._type.value for state in states], dtype=np.int8)
+
+        self.transitions = [transition for state in states for transition in state.get_outgoing_transitions_list()]
+        self.transition_source = np.repeat(np.arange(len(states), dtype=np.int64),
+                                           [state.get_num_of_outgoing_transitions() for state in states])
+        self.transition_target = np.array([self.index[transition.next_state] for transition in self.transitions],
+                                          dtype=np.int64)
+        self.transition_type = np.array([transition.type.value for transition in self.transitions], dtype=np.int8)
+
+        transition_name_ids = {}
+        self.transition_name = np.array([transition_name_ids.setdefault(transition.name, len(transition_name_ids))
+                                         for transition in self.transitions], dtype=np.int64)
+        self.transition_names = list(transition_name_ids)
+
+        # data types of the parameters of transition i are
+        # param_type[param_offsets[i]:param_offsets[i + 1]]
+        data_type_ids = {}
+        self.param_type = np.array([data_type_ids.setdefault(data_type, len(data_type_ids))
+                                    for transition in self.transitions
+                                    for name, data_type in transition.params.pairs], dtype=np.int64)
+        self.param_offsets = np.cumsum([0] + [len(transition.params) for transition in self.transitions],
+                                       dtype=np.int64)
+        self.data_types = list(data_type_ids)
+
+    def get_num_of_states(self) -> int:
+        """Get number of states
+
+        Returns:
+            int: number of states
+        """
+        return len(self.names)
+
+    def get_num_of_transitions(self) -> int:
+        """Get number of transitions
+
+        Returns:
+            int: number of transitions
+        """
+        return len(self.transitions)
         
     
 if __name__ == '__main__':
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Precomputed label compatibility.
+
+The label compatibility of two transitions only depends on their names, their
+types and the multiset of the data types of their parameters. This module gives
+every transition of a graph pair such a signature and computes the label
+compatibility once per pair of signatures, so the calculation can do an indexed
+lookup instead of splitting the parameters again for every state pair.
+
+The unshared data types of two signatures are counted on the bitmasks of the
+canonical data type ids of the parameters, so the equivalent data types of
+the data type table of the graphs count as shared. The label compatibility of
+a whole block of emissions x receptions is calculated at once on the packed
+bitmasks, see lab_comp_block.
+"""
+
+from .graph import *
+from .data_types import num_of_unshared_types, num_of_unshared_types_array, pack_type_masks
+import numpy as np
+import logging
+
+# create logger
+logger = logging.getLogger("LABEL")
+
+logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.INFO)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+# largest number of label compatibilities calculated at once
+BLOCK_SIZE = 1 << 20
+
+
+def transition_signature(transition: Transition) -> tuple:
+    """Get the signature of a transition
+
+    Args:
+        transition (Transition): the transition
+
+    Returns:
+        tuple: (name, type, sorted data types of the parameters)
+    """
+    return (transition.name,
+            transition.type,
+            tuple(sorted(data_type for name, data_type in transition.params.pairs)))
+
+
+def signature_lab_comp(signature1: tuple, signature2: tuple,
+                       type_mask1: int = None, type_mask2: int = None) -> float:
+    """Label compatibility of two signatures, same formula as calculate_lab_comp
+
+    Args:
+        signature1 (tuple): signature of the first transition
+        signature2 (tuple): signature of the second transition
+        type_mask1 (int, optional): canonical data types of the first
+                                    transition. Defaults to None, the data
+                                    types of the signature are compared.
+        type_mask2 (int, optional): canonical data types of the second
+                                    transition. Defaults to None.
+
+    Returns:
+        float: label compatibility between 0 and 1
+    """
+    name1, type1, data_types1 = signature1
+    name2, type2, data_types2 = signature2
+
+    if name1 != name2 or type1 == type2:
+        return 0
+
+    num_of_params = len(data_types1) + len(data_types2)
+    if num_of_params == 0:
+        return 1
+
+    if type_mask1 is None or type_mask2 is None:
+        num_of_unshare_type = len(set(data_types1).symmetric_difference(set(data_types2)))
+    else:
+        num_of_unshare_type = num_of_unshared_types(type_mask1, type_mask2)
+    return 1 - (num_of_unshare_type/(6*num_of_params))
+
+
+def transition_arrays(transitions: list, name_ids: dict) -> dict:
+    """Columnar view of the labels of transitions for lab_comp_block
+
+    Args:
+        transitions (list): the transitions
+        name_ids (dict): ids of the transition names, shared by the blocks
+                         compared with each other. New names are added.
+
+    Returns:
+        dict: name id, type, number of parameters and packed type bitmask
+              of every transition
+    """
+    return {
+        "name": np.array([name_ids.setdefault(transition.name, len(name_ids)) for transition in transitions],
+                         dtype=np.int64),
+        "type": np.array([transition.type.value for transition in transitions], dtype=np.int8),
+        "num_of_params": np.array([len(transition.params) for transition in transitions], dtype=np.int64),
+        "type_masks": pack_type_masks([transition.params.type_mask for transition in transitions]),
+    }
+
+
+def lab_comp_array(arrays1: dict, arrays2: dict) -> np.ndarray:
+    """Label compatibility of transitions, element by element
+
+    The leading axes of the arrays are broadcast like in
+    num_of_unshared_types_array.
+
+    Args:
+        arrays1 (dict): transition_arrays of the first transitions
+        arrays2 (dict): transition_arrays of the second transitions
+
+    Returns:
+        np.ndarray: label compatibility, same values as calculate_lab_comp
+    """
+    compatible = (arrays1["name"] == arrays2["name"]) & (arrays1["type"] != arrays2["type"])
+    num_of_params = arrays1["num_of_params"] + arrays2["num_of_params"]
+    num_of_unshare_type = num_of_unshared_types_array(arrays1["type_masks"], arrays2["type_masks"])
+
+    lab_comp = np.where(num_of_params > 0, 1 - (num_of_unshare_type/(6*np.maximum(num_of_params, 1))), 1.0)
+    return np.where(compatible, lab_comp, 0.0)
+
+
+def lab_comp_block(arrays1: dict, arrays2: dict) -> np.ndarray:
+    """Label compatibility of every pair of two lists of transitions at once
+
+    Args:
+        arrays1 (dict): transition_arrays of the first transitions, e.g. emissions
+        arrays2 (dict): transition_arrays of the second transitions, e.g. receptions
+
+    Returns:
+        np.ndarray: (first transitions, second transitions) label
+                    compatibility, same values as calculate_lab_comp
+    """
+    return lab_comp_array({key: array[:, None] for key, array in arrays1.items()},
+                          {key: array[None, :] for key, array in arrays2.items()})
+
+
+class LabelCompatibilityTable():
+    def __init__(self, graph1: Graph = None, graph2: Graph = None) -> None:
+        """Label compatibility of all the transitions of a graph pair
+
+        The table is filled once for all the outgoing transitions of the two
+        graphs. Transitions which are not part of the graphs are added the
+        first time they are looked up. The type masks are only comparable
+        when all the transitions use the same data type table.
+
+        Args:
+            graph1 (Graph, optional): first graph. Defaults to None.
+            graph2 (Graph, optional): second graph. Defaults to None.
+
+        Raises:
+            Exception: the transitions do not use the same data type table
+        """
+        self.data_type_table = None
+        self._signatures = []
+        self._type_masks = []
+        self._signature_ids = {}
+        self._transition_ids = {}
+        self._ids_by_name = {}
+        self._values = {}
+        # transition_arrays of the signatures, built again when signatures are added
+        self._arrays = None
+        self._name_ids = {}
+
+        for graph in (graph1, graph2):
+            if graph is None:
+                continue
+            for state in graph.get_states_list():
+                for transition in state.get_outgoing_transitions_list():
+                    self.get_signature_id(transition)
+
+        logger.debug("%s transitions share %s signatures, %s compatible signature pairs",
+                     len(self._transition_ids), len(self._signatures), len(self._values))
+
+    def get_signature_id(self, transition: Transition) -> int:
+        """Get the index of the signature of a transition
+
+        Args:
+            transition (Transition): the transition
+
+        Raises:
+            Exception: the transition does not use the data type table of the
+                       other transitions
+
+        Returns:
+            int: index of the signature
+        """
+        signature_id = self._transition_ids.get(transition)
+        if signature_id is not None:
+            return signature_id
+
+        if self.data_type_table is None:
+            self.data_type_table = transition.params.data_type_table
+        elif transition.params.data_type_table is not self.data_type_table:
+            raise Exception("transition = {} does not use the data type table of the other transitions, "
+                            "the graphs must be created with the same table".format(transition.name))
+
+        signature = transition_signature(transition)
+        signature_id = self._signature_ids.get(signature)
+        if signature_id is None:
+            signature_id = self._add_signature(signature, transition.params.type_mask)
+
+        self._transition_ids[transition] = signature_id
+        return signature_id
+
+    def _add_signature(self, signature: tuple, type_mask: int) -> int:
+        """Add a new signature and compute its label compatibility with the
+        known signatures of the same name
+
+        Args:
+            signature (tuple): new signature
+            type_mask (int): canonical data types of the signature
+
+        Returns:
+            int: index of the signature
+        """
+        signature_id = len(self._signatures)
+        self._signatures.append(signature)
+        self._type_masks.append(type_mask)
+        self._signature_ids[signature] = signature_id
+
+        same_name = self._ids_by_name.setdefault(signature[0], [])
+        for other_id in same_name:
+            lab_comp = signature_lab_comp(signature, self._signatures[other_id],
+                                          type_mask, self._type_masks[other_id])
+            if lab_comp != 0:
+                self._values[(signature_id, other_id)] = lab_comp
+                self._values[(other_id, signature_id)] = lab_comp
+        same_name.append(signature_id)
+
+        return signature_id
+
+    def get_signature(self, signature_id: int) -> tuple:
+        """Get a signature from its index
+
+        Args:
+            signature_id (int): index of the signature
+
+        Returns:
+            tuple: the signature
+        """
+        return self._signatures[signature_id]
+
+    def get_by_id(self, signature_id1: int, signature_id2: int) -> float:
+        """Get the label compatibility of two signatures
+
+        Args:
+            signature_id1 (int): index of the first signature
+            signature_id2 (int): index of the second signature
+
+        Returns:
+            float: label compatibility
+        """
+        return self._values.get((signature_id1, signature_id2), 0)
+
+    def get(self, transition1: Transition, transition2: Transition) -> float:
+        """Get the label compatibility of two transitions
+
+        Args:
+            transition1 (Transition): first transition
+            transition2 (Transition): second transition
+
+        Returns:
+            float: label compatibility
+        """
+        return self._values.get((self.get_signature_id(transition1), self.get_signature_id(transition2)), 0)
+
+    def get_signature_arrays(self) -> dict:
+        """Get the transition_arrays of the signatures
+
+        Returns:
+            dict: name id, type, number of parameters and packed type bitmask
+                  of every signature
+        """
+        if self._arrays is None or len(self._arrays["name"]) != len(self._signatures):
+            self._arrays = {
+                "name": np.array([self._name_ids.setdefault(name, len(self._name_ids))
+                                  for name, transition_type, data_types in self._signatures], dtype=np.int64),
+                "type": np.array([transition_type.value for name, transition_type, data_types in self._signatures],
+                                 dtype=np.int8),
+                "num_of_params": np.array([len(data_types) for name, transition_type, data_types in self._signatures],
+                                          dtype=np.int64),
+                "type_masks": pack_type_masks(self._type_masks),
+            }
+        return self._arrays
+
+    def get_block_by_id(self, signature_ids1: np.ndarray, signature_ids2: np.ndarray) -> np.ndarray:
+        """Get the label compatibility of every pair of two lists of signatures
+
+        Each distinct signature is compared once with lab_comp_block.
+
+        Args:
+            signature_ids1 (np.ndarray): indexes of the first signatures
+            signature_ids2 (np.ndarray): indexes of the second signatures
+
+        Returns:
+            np.ndarray: (first signatures, second signatures) label compatibility
+        """
+        arrays = self.get_signature_arrays()
+        unique1, inverse1 = np.unique(signature_ids1, return_inverse=True)
+        unique2, inverse2 = np.unique(signature_ids2, return_inverse=True)
+        block = lab_comp_block({key: array[unique1] for key, array in arrays.items()},
+                               {key: array[unique2] for key, array in arrays.items()})
+        return block[inverse1[:, None], inverse2[None, :]]
+
+    def get_by_ids(self, signature_ids1: np.ndarray, signature_ids2: np.ndarray) -> np.ndarray:
+        """Get the label compatibility of pairs of signatures
+
+        Args:
+            signature_ids1 (np.ndarray): index of the first signature of every pair
+            signature_ids2 (np.ndarray): index of the second signature of every pair
+
+        Returns:
+            np.ndarray: label compatibility of every pair
+        """
+        arrays = self.get_signature_arrays()
+        return lab_comp_array({key: array[signature_ids1] for key, array in arrays.items()},
+                              {key: array[signature_ids2] for key, array in arrays.items()})
+
+    def get_block(self, transitions1: list, transitions2: list) -> np.ndarray:
+        """Get the label compatibility of every pair of two lists of transitions
+
+        Args:
+            transitions1 (list): first transitions, e.g. emissions
+            transitions2 (list): second transitions, e.g. receptions
+
+        Returns:
+            np.ndarray: (first transitions, second transitions) label compatibility
+        """
+        signature_ids1 = np.array([self.get_signature_id(transition) for transition in transitions1], dtype=np.int64)
+        signature_ids2 = np.array([self.get_signature_id(transition) for transition in transitions2], dtype=np.int64)
+        return self.get_block_by_id(signature_ids1, signature_ids2)
+
+    def get_num_of_signatures(self) -> int:
+        """Get number of signatures
+
+        Returns:
+            int: number of signatures
+        """
+        return len(self._signatures)
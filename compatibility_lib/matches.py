@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Best matching states of a compatibility matrix.
+
+For every state of one graph, the k states of the other graph with the
+highest compatibility are selected with a partial selection (argpartition)
+instead of sorting the whole row. The ties are taken in the order of the
+states, so the result is the first k states of a stable sort by decreasing
+compatibility.
+
+When the matrix is produced a block of columns at a time, e.g. by the sparse
+engine, TopKAccumulator only keeps the k best candidates seen so far for
+every row, so the matrix is never held in memory.
+"""
+
+import numpy as np
+import pandas as pd
+import logging
+
+# create logger
+logger = logging.getLogger("MATCHES")
+
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+# number of values selected at once
+CHUNK_SIZE = 1 << 20
+
+TOP_K_OF = ("graph1", "graph2")
+
+
+def top_k_indexes(values: np.ndarray, k: int) -> tuple:
+    """Select the k largest values of every row
+
+    Args:
+        values (np.ndarray): (rows, candidates) values
+        k (int): number of values per row
+
+    Returns:
+        tuple: (rows, min(k, candidates)) indexes and values of the selected
+               candidates, highest value first, then lowest index
+    """
+    num_of_rows, num_of_candidates = values.shape
+    k = min(k, num_of_candidates)
+    indexes = np.zeros((num_of_rows, k), dtype=np.int64)
+    chunk = max(1, CHUNK_SIZE // max(1, num_of_candidates))
+
+    for start in range(0, num_of_rows if k > 0 else 0, chunk):
+        block = values[start:start + chunk]
+        if k == num_of_candidates:
+            indexes[start:start + chunk] = np.arange(num_of_candidates)
+            continue
+        best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        threshold = np.take_along_axis(block, best, axis=1).min(axis=1)[:, None]
+        # argpartition takes any of the values equal to the kth value, the
+        # first ones in the row are taken instead
+        above = block > threshold
+        tied = block == threshold
+        missing = k - above.sum(axis=1)
+        selected = above | (tied & (np.cumsum(tied, axis=1) <= missing[:, None]))
+        indexes[start:start + chunk] = np.nonzero(selected)[1].reshape(len(block), k)
+
+    scores = np.take_along_axis(values, indexes, axis=1)
+    order = np.lexsort((indexes, -scores), axis=1)
+    return (np.take_along_axis(indexes, order, axis=1), np.take_along_axis(scores, order, axis=1))
+
+
+class TopKAccumulator():
+    def __init__(self, num_of_rows: int, k: int) -> None:
+        """Best k candidates of every row of a matrix given a block of columns
+        at a time
+
+        Args:
+            num_of_rows (int): number of rows
+            k (int): number of candidates kept per row
+        """
+        self.k = k
+        self.indexes = np.zeros((num_of_rows, 0), dtype=np.int64)
+        self.scores = np.zeros((num_of_rows, 0), dtype=np.float64)
+
+    def add(self, values: np.ndarray, first_candidate: int):
+        """Add the values of a block of candidates
+
+        The blocks must be added in the order of the candidates, so the ties
+        keep the lowest indexes.
+
+        Args:
+            values (np.ndarray): (rows, candidates of the block) values
+            first_candidate (int): index of the first candidate of the block
+        """
+        candidates = np.arange(first_candidate, first_candidate + values.shape[1], dtype=np.int64)
+        indexes = np.concatenate((self.indexes, np.broadcast_to(candidates, values.shape)), axis=1)
+        best, self.scores = top_k_indexes(np.concatenate((self.scores, values), axis=1), self.k)
+        self.indexes = np.take_along_axis(indexes, best, axis=1)
+
+    def get(self) -> tuple:
+        """Get the best candidates
+
+        Returns:
+            tuple: (rows, k) indexes and values, highest value first
+        """
+        return (self.indexes, self.scores)
+
+
+def get_top_k_columns(of: str) -> list:
+    """Get the columns of a top-k table
+
+    Args:
+        of (str): "graph1" for the best states of graph2 of every state of
+                  graph1, "graph2" for the other direction
+
+    Raises:
+        Exception: of is not graph1 or graph2
+
+    Returns:
+        list: column names
+    """
+    if of not in TOP_K_OF:
+        raise Exception("top-k must be of graph1 or graph2, not {}".format(of))
+    if of == "graph1":
+        return ["state1", "rank", "state2", "compatibility"]
+    return ["state2", "rank", "state1", "compatibility"]
+
+
+def check_top_k(k: int, of: str = "graph1"):
+    """Check the arguments of a top-k table
+
+    Args:
+        k (int): number of states per state
+        of (str, optional): graph of the states. Defaults to "graph1".
+
+    Raises:
+        Exception: k is less than 1
+        Exception: of is not graph1 or graph2
+    """
+    if k < 1:
+        raise Exception("top-k needs at least 1 state per state, not {}".format(k))
+    get_top_k_columns(of)
+
+
+def top_k_table(names: list, candidate_names: list, indexes: np.ndarray, scores: np.ndarray,
+                of: str = "graph1") -> pd.DataFrame:
+    """Build the table of the best candidates of every state
+
+    Args:
+        names (list): names of the states, one per row of indexes
+        candidate_names (list): names of the candidate states
+        indexes (np.ndarray): (states, k) indexes of the best candidates
+        scores (np.ndarray): (states, k) their compatibility
+        of (str, optional): graph of the states, graph1 or graph2.
+                            Defaults to "graph1".
+
+    Returns:
+        pd.DataFrame: state, rank, candidate state and compatibility
+    """
+    num_of_states, k = indexes.shape
+    columns = get_top_k_columns(of)
+    logger.debug("%s best states of %s states of %s", k, num_of_states, of)
+    return pd.DataFrame({
+        columns[0]: np.repeat(np.array(names, dtype=object), k),
+        columns[1]: np.tile(np.arange(1, k + 1), num_of_states),
+        columns[2]: np.array(candidate_names, dtype=object)[indexes.ravel()],
+        columns[3]: scores.ravel(),
+    }, columns=columns)
+
+
+def top_k_matches(matrix: np.ndarray, names1: list, names2: list, k: int, of: str = "graph1") -> pd.DataFrame:
+    """Get the k most compatible states of the other graph for every state
+
+    Args:
+        matrix (np.ndarray): compatibility matrix, the states of graph2 as
+                             rows and the states of graph1 as columns
+        names1 (list): names of the states of graph1
+        names2 (list): names of the states of graph2
+        k (int): number of states per state
+        of (str, optional): "graph1" for the best states of graph2 of every
+                            state of graph1, "graph2" for the best states of
+                            graph1 of every state of graph2. Defaults to "graph1".
+
+    Returns:
+        pd.DataFrame: state, rank, best state of the other graph and compatibility
+    """
+    check_top_k(k, of)
+    if of == "graph1":
+        indexes, scores = top_k_indexes(np.asarray(matrix, dtype=np.float64).T, k)
+        return top_k_table(names1, names2, indexes, scores, of)
+
+    indexes, scores = top_k_indexes(np.asarray(matrix, dtype=np.float64), k)
+    return top_k_table(names2, names1, indexes, scores, of)
@@ -53,6 +53,11 @@ import logging
 import os.path
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 GRAPH_NAME_KEY = "graph_name"
 STATES_KEY = "states"
 
@@ -65,6 +70,9 @@ TRANSITION_TYPE_KEY = "transition_type"
 TRANSITION_PARAM_KEY = "params"
 TRANSITION_NEXT_STATE_KEY = "next_state"
 
+STATE_TYPES = {"initial": StateType.INIT, "final": StateType.FINAL, "normal": StateType.NORMAL}
+TRANSITION_TYPES = {"reception": TransitionType.RECEPTION, "emission": TransitionType.EMISSION, "tau": TransitionType.TAU}
+
 # create logger
 
 logger = logging.getLogger("PARSER")
@@ -91,197 +99,410 @@ logger.addHandler(ch)
 
 
 def is_transaction_valid(transaction_dict: dict) -> bool:
-    valid = False
-    
-    if TRANSITION_NAME_KEY in transaction_dict and transaction_dict[TRANSITION_NAME_KEY] != "":
-        valid = True
-    else:
+    if TRANSITION_NAME_KEY not in transaction_dict or transaction_dict[TRANSITION_NAME_KEY] == "":
         logger.error("transition_name property invalid")
         return False
     
-    logger.info("processing transition = {}...".format(transaction_dict[TRANSITION_NAME_KEY]))
+    log_info = logger.isEnabledFor(logging.INFO)
+    if log_info:
+        logger.info("processing transition = {}...".format(transaction_dict[TRANSITION_NAME_KEY]))
     
     if TRANSITION_TYPE_KEY in transaction_dict:
-        if transaction_dict[TRANSITION_TYPE_KEY] == "reception" or transaction_dict[TRANSITION_TYPE_KEY] == "emission":
-            valid = True
-        else:
+        if transaction_dict[TRANSITION_TYPE_KEY] not in TRANSITION_TYPES:
             logger.error("transition_type has wrong value, get = {}".format(transaction_dict[TRANSITION_TYPE_KEY]))
             return False
     else:
         logger.error("transition_type property invalid")
         return False
     
-    if TRANSITION_PARAM_KEY in transaction_dict and type(transaction_dict[TRANSITION_PARAM_KEY]) == list:
-        valid = True
-    else:
+    if TRANSITION_PARAM_KEY not in transaction_dict or type(transaction_dict[TRANSITION_PARAM_KEY]) != list:
         logger.error("params has wrong property invalid")
         return False
     
-    if TRANSITION_NEXT_STATE_KEY in transaction_dict and transaction_dict[TRANSITION_NEXT_STATE_KEY] != "":
-        valid = True
-    else:
+    if (TRANSITION_TYPES[transaction_dict[TRANSITION_TYPE_KEY]] == TransitionType.TAU
+            and len(transaction_dict[TRANSITION_PARAM_KEY]) > 0):
+        logger.error("tau transition must not have params")
+        return False
+    
+    if TRANSITION_NEXT_STATE_KEY not in transaction_dict or transaction_dict[TRANSITION_NEXT_STATE_KEY] == "":
         logger.error("next_state has wrong property invalid")
         return False
     
-    if(valid):
+    if log_info:
         logger.info("transition = {} is valid".format(transaction_dict[TRANSITION_NAME_KEY]))
         logger.info("   type = {}".format(transaction_dict[TRANSITION_TYPE_KEY]))
         logger.info("   num of param = {}".format(len(transaction_dict[TRANSITION_PARAM_KEY])))
         logger.info("   next_state = {}".format(transaction_dict[TRANSITION_NEXT_STATE_KEY]))
     
-    return valid
+    return True
 
 
-def is_state_format_valid(states: list) -> bool:
-    Succes = False
+def is_state_valid(state: dict) -> bool:
+    """Check the properties of one state, its transitions are not checked
+
+    Args:
+        state (dict): state of the json file
+
+    Returns:
+        bool: True if the state is valid
+    """
+    if STATE_NAME_KEY not in state or state[STATE_NAME_KEY] == "":
+        logger.error("state_name properties error")
+        return False
     
-    for state in states:
-        if STATE_NAME_KEY in state and state[STATE_NAME_KEY] != "":
-            Succes = True
-        else:
-            logger.error("state_name properties error")
-            Succes = False
-        
+    log_info = logger.isEnabledFor(logging.INFO)
+    if log_info:
         logger.info("processing [state = {}]...".format(state[STATE_NAME_KEY]))
-        
-        if Succes == True and STATE_TYPE_KEY in state and state[STATE_TYPE_KEY] != "":
-            if state[STATE_TYPE_KEY] == "initial" or state[STATE_TYPE_KEY] == "final" or state[STATE_TYPE_KEY] == "normal":
-                Succes = True
-            else:
-                logger.error("state_type property error")
-                Succes = False
-        else:
-            logger.error("state_type properties error")
-            Succes = False
-            
-        if Succes == True and STATE_TRANSITION_KEY in state and type(state[STATE_TRANSITION_KEY]) == list:
-            Succes = True
-        else:
-            logger.error("transition property error")
-            Succes = False
-        
-        if Succes == True:
-            logger.info("state = {} OK".format(state[STATE_NAME_KEY]))
-            logger.info("   [type = {}]".format(state[STATE_TYPE_KEY]))
-            logger.info("   [num_of_outgoing_transition = {}]".format(len(state[STATE_TRANSITION_KEY])))
-        else:
-            break
-        
-    return Succes
-
-def create_transition(transtition_dict: dict) -> Transition:
-    transition_type = None
     
-    if transtition_dict[TRANSITION_TYPE_KEY] == "reception":
-        transition_type = TransitionType.RECEPTION
-    elif transtition_dict[TRANSITION_TYPE_KEY] == "emission":
-        transition_type = TransitionType.EMISSION
+    if STATE_TYPE_KEY in state and state[STATE_TYPE_KEY] != "":
+        if state[STATE_TYPE_KEY] not in STATE_TYPES:
+            logger.error("state_type property error")
+            return False
     else:
-        #must not be here
-        logger.error("unknown transition type")
+        logger.error("state_type properties error")
+        return False
+    
+    if STATE_TRANSITION_KEY not in state or type(state[STATE_TRANSITION_KEY]) != list:
+        logger.error("transition property error")
+        return False
+    
+    if log_info:
+        logger.info("state = {} OK".format(state[STATE_NAME_KEY]))
+        logger.info("   [type = {}]".format(state[STATE_TYPE_KEY]))
+        logger.info("   [num_of_outgoing_transition = {}]".format(len(state[STATE_TRANSITION_KEY])))
     
+    return True
+
+
+def is_state_format_valid(states: list) -> bool:
+    for state in states:
+        if is_state_valid(state) == False:
+            return False
+        
+    return True
+
+def create_transition(transtition_dict: dict, data_type_table: DataTypeTable = None) -> Transition:
     return Transition(name=transtition_dict[TRANSITION_NAME_KEY],
                         next_state= transtition_dict[TRANSITION_NEXT_STATE_KEY],
-                        type= transition_type,
-                        params=transtition_dict[TRANSITION_PARAM_KEY])
+                        type= TRANSITION_TYPES[transtition_dict[TRANSITION_TYPE_KEY]],
+                        params=transtition_dict[TRANSITION_PARAM_KEY],
+                        data_type_table=data_type_table)
 
 
 def add_incoming_transitions_to_states(states: list):
+    states_by_name = {}
+    for state in states:
+        states_by_name.setdefault(state.get_name(), state)
+    
+    log_debug = logger.isEnabledFor(logging.DEBUG)
+    log_info = logger.isEnabledFor(logging.INFO)
     for state in states:
         #get transition in state
-        logger.debug("state = {}".format(state.get_name()))
+        if log_debug:
+            logger.debug("state = {}".format(state.get_name()))
         for transition in state.get_outgoing_transitions_list():
-            logger.debug("adding transition = {}".format(transition.name))
-            found_next_state = False
-            for next_state in states:
-                if transition.next_state == next_state.get_name():
-                    next_state.add_incoming_transition(transition)
-                    found_next_state = True
-                    break
-                
-            if found_next_state == True:
+            if log_debug:
+                logger.debug("adding transition = {}".format(transition.name))
+            next_state = states_by_name.get(transition.next_state)
+            if next_state == None:
+                raise Exception("unknown next state = {}".format(transition.next_state))
+            
+            next_state.add_incoming_transition(transition)
+            if log_info:
                 logger.info("add transition = {} type = {} to incoming transitsion of state = {}".format(
                     transition.name, transition.type, transition.next_state
                 ))
-            else:
-                raise Exception("unknown next state = {}".format(transition.next_state))
             
 
-def create_states(states: list) -> list:
+def create_states(states: list, data_type_table: DataTypeTable = None) -> list:
+    """Validate and create the states and their outgoing transitions in a
+    single pass over the json states
+
+    Args:
+        states (list): states of the json file
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types. Defaults to None.
+
+    Returns:
+        list: the states, without their incoming transitions
+    """
     output_states =[]
+    log_info = logger.isEnabledFor(logging.INFO)
     for state in states:
-        logger.debug("creating [state = {}]...".format(state[STATE_NAME_KEY]))
-        state_type = StateType.NORMAL
-        if state[STATE_TYPE_KEY] == "initial":
-            state_type = StateType.INIT
-        elif state[STATE_TYPE_KEY] == "final":
-            state_type = StateType.FINAL
-        elif state[STATE_TYPE_KEY] == "normal":
-            state_type = StateType.NORMAL
-        else:
-            logger.error("unknow state, must not be here")
-            raise Exception("unknown state")
-
-        new_state = State(name=state[STATE_NAME_KEY], type=state_type)
+        if is_state_valid(state) == False:
+            raise Exception("states are not valid")
+        
+        new_state = State(name=state[STATE_NAME_KEY], type=STATE_TYPES[state[STATE_TYPE_KEY]])
         
         for transition in state[STATE_TRANSITION_KEY]:
             if is_transaction_valid(transition) == False:
                 raise Exception("Transition has wrong format")
-            else:
-                transition = create_transition(transition)
-                if transition != None:
-                    new_state.add_outgoing_transition(transition)
-            
-        logger.info("create [state = {}] success".format(state[STATE_NAME_KEY]))
+            new_state.add_outgoing_transition(create_transition(transition, data_type_table))
+        
+        if log_info:
+            logger.info("create [state = {}] success".format(state[STATE_NAME_KEY]))
         output_states.append(new_state)
             
     return output_states
 
 
-def create_graph(input_path: str) -> Graph:
-    ret_graph = None  
-    if os.path.isfile(input_path) == False:
-        logger.error("file does not exist")
-        return
+def load_graph_dict(read_json_file) -> dict:
+    """Load the content of an opened json file, with orjson if it is
+    installed
 
-    with open(input_path, "r") as read_json_file:
-        logger.debug("open [file = {}]".format(input_path))
-        graph_dict = json.load(read_json_file)
+    Args:
+        read_json_file: opened json file
+
+    Returns:
+        dict: content of the file
+    """
+    if orjson is not None:
+        return orjson.loads(read_json_file.read())
+    return json.load(read_json_file)
+
+
+def create_graph_from_dict(graph_dict: dict, data_type_table: DataTypeTable = None) -> Graph:
+    """Create a graph from the content of a json file
+
+    Args:
+        graph_dict (dict): content of the json file
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types, compiled into the
+                                                   parameters of the
+                                                   transitions. Defaults to
+                                                   None, every data type is
+                                                   different.
+
+    Returns:
+        Graph: the graph
+    """
+    ret_graph = None
+    
+    logger.debug("[type = {}]".format(type(graph_dict)))
+    if logger.level == logging.DEBUG:
+        logger.debug("here is your json file")
+        print(json.dumps(graph_dict, indent=4))
         
-        logger.debug("[type = {}]".format(type(graph_dict)))
-        if logger.level == logging.DEBUG:
-            logger.debug("here is your json file")
-            print(json.dumps(graph_dict, indent=4))
+    if GRAPH_NAME_KEY in graph_dict and STATES_KEY in graph_dict:
+        if graph_dict[GRAPH_NAME_KEY] != "":
+            logger.debug("[graph name = {}]".format(graph_dict[GRAPH_NAME_KEY]))
             
-        if GRAPH_NAME_KEY in graph_dict and STATES_KEY in graph_dict:
-            if graph_dict[GRAPH_NAME_KEY] != "":
-                logger.debug("[graph name = {}]".format(graph_dict[GRAPH_NAME_KEY]))
-                
-                if type(graph_dict[STATES_KEY]) == list and len(graph_dict[STATES_KEY]) > 1:
-                    logger.debug("graph has [num of states = {}]".format(len(graph_dict[STATES_KEY])))
-                    ret_graph = Graph(name=graph_dict[GRAPH_NAME_KEY])
-                else:
-                    raise Exception("graph does not have enough number of state")  
+            if type(graph_dict[STATES_KEY]) == list and len(graph_dict[STATES_KEY]) > 1:
+                logger.debug("graph has [num of states = {}]".format(len(graph_dict[STATES_KEY])))
+                ret_graph = Graph(name=graph_dict[GRAPH_NAME_KEY])
             else:
-                raise Exception("graph name is empty")
+                raise Exception("graph does not have enough number of state")  
         else:
-            raise Exception("graph missing properties")
-        
-        if ret_graph != None:
-            if is_state_format_valid(graph_dict[STATES_KEY]) == False:
-                raise Exception("states are not valid")
-            else:
-                pass
-            
-            states = create_states(graph_dict[STATES_KEY])
+            raise Exception("graph name is empty")
+    else:
+        raise Exception("graph missing properties")
+    
+    if ret_graph != None:
+        with gc_paused():
+            states = create_states(graph_dict[STATES_KEY], data_type_table)
             add_incoming_transitions_to_states(states)
-            
-            for state in states:
-                ret_graph.add_state(state)
+        
+        for state in states:
+            ret_graph.add_state(state)
     
     logger.info("create graph = {} success".format(ret_graph._name))
     return ret_graph
 
 
+def create_graph(input_path: str, data_type_table: DataTypeTable = None) -> Graph:
+    if os.path.isfile(input_path) == False:
+        logger.error("file does not exist")
+        return
+
+    with open(input_path, "r") as read_json_file:
+        logger.debug("open [file = {}]".format(input_path))
+        graph_dict = load_graph_dict(read_json_file)
+    
+    return create_graph_from_dict(graph_dict, data_type_table)
+
+
+
+class JsonStreamReader():
+    def __init__(self, read_json_file, chunk_size: int = 1 << 20) -> None:
+        """Read the values of a json document one at a time, only a chunk of
+        the file is kept in memory
+
+        Args:
+            read_json_file: opened json file
+            chunk_size (int, optional): number of characters read at once.
+                                        Defaults to 1 MiB.
+        """
+        self._file = read_json_file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _read_chunk(self) -> bool:
+        """Append the next chunk of the file to the buffer, the consumed part
+        of the buffer is dropped
+
+        Returns:
+            bool: False at the end of the file
+        """
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if chunk == "":
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip the whitespaces and get the next character
+
+        Returns:
+            str: next character or "" at the end of the file
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\n\r":
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._read_chunk() == False:
+                break
+        return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, char: str):
+        """Consume the next character
+
+        Args:
+            char (str): expected character
+
+        Raises:
+            Exception: the next character is another one
+        """
+        if self.peek() != char:
+            raise Exception("invalid json, expected '{}' at '{}'".format(char, self._buffer[self._pos:self._pos + 20]))
+        self._pos += 1
+
+    def decode(self):
+        """Decode the next value
+
+        A value at the end of the buffer may be truncated, e.g. a number, so
+        more of the file is read until the value is followed by a delimiter.
+
+        Returns:
+            value of the json document
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in " \t\n\r,:]}"):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read_chunk()
+
+    def iterate_object(self):
+        """Iterate over the keys of an object, the value of each key must be
+        consumed before the next key
+
+        Yields:
+            str: key
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def iterate_array(self):
+        """Iterate over the values of an array
+
+        Yields:
+            value of the array
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.peek() == ",":
+                self._pos += 1
+            else:
+                self.expect("]")
+                return
+
+
+def create_graph_streaming(input_path: str, chunk_size: int = 1 << 20,
+                           data_type_table: DataTypeTable = None) -> Graph:
+    """Create a graph from a json file without loading the whole document
+
+    The states are read one by one and immediately converted to State and
+    Transition objects. The next states of the transitions are resolved once
+    every state is read, since a transition may go to a later state.
+
+    Args:
+        input_path (str): path to the json file
+        chunk_size (int, optional): number of characters read at once.
+                                    Defaults to 1 MiB.
+        data_type_table (DataTypeTable, optional): equivalence of the data
+                                                   types. Defaults to None.
+
+    Returns:
+        Graph: the graph
+    """
+    if os.path.isfile(input_path) == False:
+        logger.error("file does not exist")
+        return
+
+    graph_name = None
+    states = None
+    with open(input_path, "r") as read_json_file:
+        logger.debug("open [file = {}]".format(input_path))
+        reader = JsonStreamReader(read_json_file, chunk_size)
+        with gc_paused():
+            for key in reader.iterate_object():
+                if key == STATES_KEY and reader.peek() == "[":
+                    states = []
+                    for state in reader.iterate_array():
+                        if type(state) != dict:
+                            raise Exception("states are not valid")
+                        states.extend(create_states([state], data_type_table))
+                elif key == GRAPH_NAME_KEY:
+                    graph_name = reader.decode()
+                else:
+                    value = reader.decode()
+                    if key == STATES_KEY:
+                        states = value
+
+    if graph_name is None or states is None:
+        raise Exception("graph missing properties")
+    if graph_name == "":
+        raise Exception("graph name is empty")
+    if type(states) != list or len(states) <= 1:
+        raise Exception("graph does not have enough number of state")
+    logger.debug("[graph name = {}]".format(graph_name))
+    logger.debug("graph has [num of states = {}]".format(len(states)))
+
+    with gc_paused():
+        add_incoming_transitions_to_states(states)
+
+    ret_graph = Graph(name=graph_name)
+    for state in states:
+        ret_graph.add_state(state)
+
+    logger.info("create graph = {} success".format(ret_graph._name))
+    return ret_graph
+
 if __name__ == '__main__':
     create_graph("test_data/test.json")
\ No newline at end of file
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Per-phase timing of a calculation.
+
+A phase is a function whose wall time, CPU time and number of calls are
+accumulated. The functions are wrapped only while the profiler is active, so
+the calculation has no overhead when it is not profiled. The time of a phase
+includes the time of the phases it calls. The phases are also accumulated per
+iteration of the calculation.
+"""
+
+from contextlib import contextmanager
+import functools
+import pandas as pd
+import time
+
+
+class Profiler():
+    def __init__(self) -> None:
+        """Accumulate the time of the phases of a calculation
+        """
+        # phase -> [calls, wall time, cpu time]
+        self._phases = {}
+        self._patches = []
+        self._iterations = []
+        self._iteration_start = None
+        self._start = (time.perf_counter(), time.process_time())
+
+    def _add(self, name: str, wall: float, cpu: float):
+        stats = self._phases.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += wall
+        stats[2] += cpu
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a block of code as a phase
+
+        Args:
+            name (str): name of the phase
+        """
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - start_wall, time.process_time() - start_cpu)
+
+    def wrap(self, name: str, function):
+        """Get a function which times every call of a function as a phase
+
+        Args:
+            name (str): name of the phase
+            function: function to be timed
+
+        Returns:
+            function: timed function
+        """
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start_wall = time.perf_counter()
+            start_cpu = time.process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._add(name, time.perf_counter() - start_wall, time.process_time() - start_cpu)
+
+        return timed_function
+
+    def instrument(self, owner, attribute: str, name: str = None):
+        """Replace a function of a module or a method of a class by its timed
+        version until restore() is called
+
+        Args:
+            owner: module or class
+            attribute (str): name of the function
+            name (str, optional): name of the phase. Defaults to None, i.e.
+                                  the name of the function.
+        """
+        function = getattr(owner, attribute)
+        self._patches.append((owner, attribute, function))
+        setattr(owner, attribute, self.wrap(name or attribute, function))
+
+    def restore(self):
+        """Put back the original functions
+        """
+        for owner, attribute, function in reversed(self._patches):
+            setattr(owner, attribute, function)
+        self._patches = []
+
+    def start_iteration(self):
+        """Mark the start of an iteration
+        """
+        snapshot = {name: list(stats) for name, stats in self._phases.items()}
+        self._iteration_start = (time.perf_counter(), time.process_time(), snapshot)
+
+    def end_iteration(self, iteration: int):
+        """Mark the end of an iteration and keep its phases
+
+        Args:
+            iteration (int): number of the iteration
+        """
+        if self._iteration_start is None:
+            return
+
+        start_wall, start_cpu, snapshot = self._iteration_start
+        self._iterations.append((iteration, "iteration", 1,
+                                 time.perf_counter() - start_wall, time.process_time() - start_cpu))
+
+        for name, stats in self._phases.items():
+            calls, wall, cpu = snapshot.get(name, [0, 0.0, 0.0])
+            if stats[0] > calls:
+                self._iterations.append((iteration, name, stats[0] - calls, stats[1] - wall, stats[2] - cpu))
+        self._iteration_start = None
+
+    def get_phase_table(self) -> pd.DataFrame:
+        """Get the accumulated time of every phase
+
+        Returns:
+            pd.DataFrame: calls, wall and cpu time of the phases
+        """
+        total_wall = time.perf_counter() - self._start[0]
+        total_cpu = time.process_time() - self._start[1]
+
+        rows = [(name, calls, wall, cpu) for name, (calls, wall, cpu) in self._phases.items()]
+        rows.append(("total", 1, total_wall, total_cpu))
+
+        table = pd.DataFrame(rows, columns=["phase", "calls", "wall", "cpu"]).set_index("phase")
+        table["wall/call"] = table["wall"]/table["calls"]
+        table["% wall"] = 100*table["wall"]/total_wall if total_wall > 0 else 0
+        return table
+
+    def get_iteration_table(self) -> pd.DataFrame:
+        """Get the time of the phases of every iteration
+
+        Returns:
+            pd.DataFrame: calls, wall and cpu time per iteration and phase
+        """
+        return pd.DataFrame(self._iterations,
+                            columns=["iteration", "phase", "calls", "wall", "cpu"]).set_index(["iteration", "phase"])
+
+    def report(self) -> str:
+        """Get the summary of the phases and of the iterations
+
+        Returns:
+            str: printable report
+        """
+        return "\n".join(["Phases (time in s, including the called phases):",
+                          self.get_phase_table().to_string(float_format="{:.6f}".format),
+                          "",
+                          "Iterations:",
+                          self.get_iteration_table().to_string(float_format="{:.6f}".format)])
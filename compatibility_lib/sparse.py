@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Sparse compatibility matrix.
+
+A cell without any (emission, reception) pair of non zero label compatibility
+has a best sum of 0, so its state compatibility is a constant. This constant
+only depends on a few properties of the two states: number of outgoing,
+incoming and emission transitions, type and final state. The states of each
+graph are grouped into classes with the same properties, and such a trivial
+cell has the value of a small |classes2|x|classes1| table, which follows the
+recurrence of the calculation with its constant. Only the other cells are
+stored and calculated. Every value is the same as with the dense engines.
+"""
+
+from .graph import *
+from .label import LabelCompatibilityTable
+from .engine import CompiledGraph, compile_pairs, DECIMALS
+from .matches import TopKAccumulator, top_k_indexes, top_k_table, check_top_k, CHUNK_SIZE
+import numpy as np
+import pandas as pd
+import logging
+
+# create logger
+logger = logging.getLogger("SPARSE")
+
+logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.INFO)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+
+def classify_states(graph: CompiledGraph) -> tuple:
+    """Group the states having the same properties for a trivial cell
+
+    Args:
+        graph (CompiledGraph): compiled graph
+
+    Returns:
+        tuple: (class of every state, properties of every class as columns
+               outgoing, incoming, emissions, type, final)
+    """
+    types = np.array([state_type.value for state_type in graph.types], dtype=np.int64)
+    properties = np.stack([graph.num_of_outgoing,
+                           graph.num_of_incoming,
+                           graph.num_of_emissions,
+                           types,
+                           graph.final.astype(np.int64)], axis=1)
+
+    classes, state_class = np.unique(properties, axis=0, return_inverse=True)
+    return (state_class.reshape(-1), classes)
+
+
+class SparseCompatibility():
+    def __init__(self, graph1: Graph, graph2: Graph, lab_comp_table: LabelCompatibilityTable = None) -> None:
+        """Compatibility matrix storing only the cells with a label compatible pair
+
+        Args:
+            graph1 (Graph): first graph, columns of the matrix
+            graph2 (Graph): second graph, rows of the matrix
+            lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the two graphs. Defaults to None, i.e. built here
+
+        Raises:
+            Exception: a graph contains a tau transition
+        """
+        if lab_comp_table is None:
+            lab_comp_table = LabelCompatibilityTable(graph1, graph2)
+
+        self.graph1 = CompiledGraph(graph1)
+        self.graph2 = CompiledGraph(graph2)
+        if self.graph1.tau is not None or self.graph2.tau is not None:
+            # the cells reached by a tau transition are not trivial
+            raise Exception("tau calculation is not supported by the sparse engine")
+        self.shape = (self.graph2.get_num_of_states(), self.graph1.get_num_of_states())
+        self.iteration = 0
+
+        pairs = (compile_pairs(self.graph1, self.graph2, True, self.shape, lab_comp_table),
+                 compile_pairs(self.graph2, self.graph1, False, self.shape, lab_comp_table))
+
+        # stored cells, as sorted flat indexes of the matrix
+        self.cells = np.unique(np.concatenate([direction["group_cell"] for direction in pairs]))
+        self.values = np.ones(len(self.cells))
+        self._rows, self._columns = np.unravel_index(self.cells, self.shape)
+        # stored cells grouped by column, for the column queries
+        self._column_order = np.argsort(self._columns, kind="stable")
+        self._column_start = np.searchsorted(self._columns[self._column_order], np.arange(self.shape[1] + 1))
+
+        # trivial cells, one value per (class of graph2, class of graph1)
+        self._class1, classes1 = classify_states(self.graph1)
+        self._class2, classes2 = classify_states(self.graph2)
+        self._trivial = np.ones((len(classes2), len(classes1)))
+        self._trivial_state_comp = self._state_comp(
+            classes2[:, None, 0] + classes1[None, :, 0],
+            classes2[:, None, 1] + classes1[None, :, 1],
+            classes2[:, None, 3] == classes1[None, :, 3],
+            classes2[:, None, 2] + classes1[None, :, 2],
+            (classes2[:, None, 4] == 1) & (classes1[None, :, 4] == 1),
+            np.zeros((len(classes2), len(classes1))),
+            np.zeros((len(classes2), len(classes1))))
+
+        # constants of the stored cells
+        g1, g2 = self.graph1, self.graph2
+        rows, columns = self._rows, self._columns
+        self._w1 = g2.num_of_outgoing[rows] + g1.num_of_outgoing[columns]
+        self._w2 = g2.num_of_incoming[rows] + g1.num_of_incoming[columns]
+        self._num_of_emissions = g2.num_of_emissions[rows] + g1.num_of_emissions[columns]
+        self._both_final = g2.final[rows] & g1.final[columns]
+        self._nature = np.array([g2.types[row] == g1.types[column] for row, column in zip(rows, columns)],
+                                dtype=bool)
+
+        # pairs with the position of their group in the stored cells, and
+        # where to read their next states, a stored cell or a trivial class
+        self._directions = []
+        for direction in pairs:
+            read_cell = np.ravel_multi_index(direction["read_index"], self.shape) \
+                if len(direction["lab_comp"]) > 0 else np.zeros(0, dtype=np.int64)
+            read_position = np.minimum(np.searchsorted(self.cells, read_cell), max(len(self.cells) - 1, 0))
+            read_is_stored = self.cells[read_position] == read_cell if len(self.cells) > 0 else read_cell < 0
+            read_rows, read_columns = direction["read_index"] if len(read_cell) > 0 else (read_cell, read_cell)
+
+            self._directions.append({
+                "lab_comp": direction["lab_comp"],
+                "group_start": direction["group_start"],
+                "group_position": np.searchsorted(self.cells, direction["group_cell"]),
+                "read_position": read_position,
+                "read_is_stored": read_is_stored,
+                "read_class": (self._class2[read_rows], self._class1[read_columns]),
+            })
+
+        logger.info("%s of %s cells stored, %sx%s trivial classes",
+                    len(self.cells), self.shape[0]*self.shape[1], len(classes2), len(classes1))
+
+    @staticmethod
+    def _state_comp(w1, w2, nature, num_of_emissions, both_final, sum1, sum2) -> np.ndarray:
+        """State compatibility, same operations as CompatibilityEngine.step
+
+        Returns:
+            np.ndarray: state compatibility
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            obs_comp = (sum1 + sum2)/num_of_emissions
+        obs_comp = np.where(num_of_emissions > 0, obs_comp, np.where(both_final, 1.0, 0.0))
+
+        nature = nature.astype(np.int64)
+        return (w1*obs_comp + w2*obs_comp + 1*nature)/(w1 + w2 + 1)
+
+    def _best_sum(self, direction: dict) -> np.ndarray:
+        """Best sum compatibility of the stored cells in one direction
+
+        Args:
+            direction (dict): pairs of one direction
+
+        Returns:
+            np.ndarray: best sum of every stored cell
+        """
+        if len(direction["group_start"]) == 0:
+            return np.zeros(len(self.cells))
+
+        read_values = np.where(direction["read_is_stored"],
+                               self.values[direction["read_position"]],
+                               self._trivial[direction["read_class"]])
+        best = np.maximum.reduceat(direction["lab_comp"]*read_values, direction["group_start"])
+        return np.bincount(direction["group_position"], weights=best, minlength=len(self.cells))
+
+    def step(self) -> float:
+        """Calculate the next iteration
+
+        Returns:
+            float: largest change of a cell
+        """
+        sum1 = self._best_sum(self._directions[0])
+        sum2 = self._best_sum(self._directions[1])
+        state_comp = self._state_comp(self._w1, self._w2, self._nature, self._num_of_emissions,
+                                      self._both_final, sum1, sum2)
+        values = np.round((self.values + state_comp)/2, DECIMALS)
+        trivial = np.round((self._trivial + self._trivial_state_comp)/2, DECIMALS)
+
+        delta = max(float(np.abs(values - self.values).max(initial=0)),
+                    float(np.abs(trivial - self._trivial).max(initial=0)))
+        self.values = values
+        self._trivial = trivial
+        self.iteration += 1
+        return delta
+
+    def get_column(self, column: int) -> np.ndarray:
+        """Get the compatibility of a state of graph1 with every state of graph2
+
+        Args:
+            column (int): index of the state of graph1
+
+        Returns:
+            np.ndarray: one value per state of graph2
+        """
+        values = self._trivial[self._class2, self._class1[column]]
+        stored = self._column_order[self._column_start[column]:self._column_start[column + 1]]
+        values[self._rows[stored]] = self.values[stored]
+        return values
+
+    def get_columns(self, start: int, end: int) -> np.ndarray:
+        """Get the compatibility of a range of states of graph1 with every
+        state of graph2
+
+        Args:
+            start (int): index of the first state of graph1
+            end (int): index after the last state of graph1, at most the
+                       number of states of graph1
+
+        Returns:
+            np.ndarray: (states of graph2, states of the range) values
+        """
+        end = min(end, self.shape[1])
+        values = self._trivial[self._class2[:, None], self._class1[None, start:end]]
+        stored = self._column_order[self._column_start[start]:self._column_start[end]]
+        values[self._rows[stored], self._columns[stored] - start] = self.values[stored]
+        return values
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Build the dense matrix, only for graphs small enough
+
+        Returns:
+            pd.DataFrame: matrix with the states of graph1 as columns and
+                          the states of graph2 as rows
+        """
+        matrix = self._trivial[self._class2[:, None], self._class1[None, :]]
+        matrix[self._rows, self._columns] = self.values
+        return pd.DataFrame(matrix, index=self.graph2.names, columns=self.graph1.names)
+
+    def to_sparse(self) -> pd.DataFrame:
+        """Get the stored cells, the others have the value of their trivial class
+
+        Returns:
+            pd.DataFrame: state1, state2 and compatibility of the stored cells
+        """
+        return pd.DataFrame({"state1": np.array(self.graph1.names, dtype=object)[self._columns],
+                             "state2": np.array(self.graph2.names, dtype=object)[self._rows],
+                             "compatibility": self.values})
+
+    def top_k(self, k: int, of: str = "graph1") -> pd.DataFrame:
+        """Get the k most compatible states of the other graph for every state
+
+        The columns are built a block at a time and only the k best states
+        of each state are kept, so the dense matrix is never allocated.
+
+        Args:
+            k (int): number of states of the other graph per state
+            of (str, optional): "graph1" for the best states of graph2 of
+                                every state of graph1, "graph2" for the best
+                                states of graph1 of every state of graph2.
+                                Defaults to "graph1".
+
+        Returns:
+            pd.DataFrame: state, rank, best state of the other graph and compatibility
+        """
+        check_top_k(k, of)
+        chunk = max(1, CHUNK_SIZE // max(1, self.shape[0]))
+        if of == "graph1":
+            indexes = []
+            scores = []
+            for start in range(0, self.shape[1], chunk):
+                block_indexes, block_scores = top_k_indexes(self.get_columns(start, start + chunk).T, k)
+                indexes.append(block_indexes)
+                scores.append(block_scores)
+            width = min(k, self.shape[0])
+            indexes = np.concatenate(indexes) if indexes else np.zeros((0, width), dtype=np.int64)
+            scores = np.concatenate(scores) if scores else np.zeros((0, width))
+            return top_k_table(self.graph1.names, self.graph2.names, indexes, scores, of)
+
+        best = TopKAccumulator(self.shape[0], k)
+        for start in range(0, self.shape[1], chunk):
+            best.add(self.get_columns(start, start + chunk), start)
+        indexes, scores = best.get()
+        return top_k_table(self.graph2.names, self.graph1.names, indexes, scores, of)
+
+    def get_num_of_stored_cells(self) -> int:
+        """Get number of stored cells
+
+        Returns:
+            int: number of cells calculated by the full recurrence
+        """
+        return len(self.cells)
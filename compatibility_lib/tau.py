@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Tau transitions of a graph, precomputed once for the propagations.
+
+The forward propagation of a state pair follows the outgoing tau transitions
+of its two states, the backward propagation their incoming tau transitions:
+
+    fw(s1, s2) = (d(s1, s2) + d(s2, s1))/2
+
+    d(si, sj) = sum(fw(si', sj))/|tau|              si has only tau transitions
+              = (sum(fw(si', sj)) + obs)/(|tau| + 1) si has tau transitions
+              = obs(si, sj)                         si has no tau transition
+
+where si' are the states reached by the tau transitions of si. The tau
+transitions of a graph are condensed into their strongly connected
+components: a tau transition inside a component (a tau cycle) leads back to a
+state the recursion already walks, it is not followed. The other tau
+transitions form a DAG, and the level of a state is the length of its longest
+tau path in this DAG. fw(s1, s2) only reads pairs with a lower sum of levels,
+so a whole iteration is calculated level by level without walking the tau
+chains again for every pair.
+"""
+
+from .graph import *
+import numpy as np
+import logging
+
+# create logger
+logger = logging.getLogger("TAU")
+
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+
+def has_tau_transition(graph: Graph) -> bool:
+    """Check if a graph has a tau transition
+
+    Args:
+        graph (Graph): the graph
+
+    Returns:
+        bool: True if a state has an outgoing tau transition
+    """
+    return any(state.get_outgoing_tau_list() for state in graph.get_states_list())
+
+
+def find_components(successors: list) -> list:
+    """Strongly connected components with the Tarjan algorithm, without recursion
+
+    Args:
+        successors (list): for the state at each index, the indexes of its successors
+
+    Returns:
+        list: component of every state. The components are numbered in reverse
+              topological order, i.e. a successor is in the same or a lower
+              component
+    """
+    num_of_states = len(successors)
+    component = [-1]*num_of_states
+    order = [-1]*num_of_states
+    low = [0]*num_of_states
+    stack = []
+    on_stack = [False]*num_of_states
+    counter = 0
+    num_of_components = 0
+
+    for root in range(num_of_states):
+        if order[root] >= 0:
+            continue
+        # (state, position of the next successor to visit)
+        path = [(root, 0)]
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while path:
+            state, position = path[-1]
+            if position < len(successors[state]):
+                path[-1] = (state, position + 1)
+                successor = successors[state][position]
+                if order[successor] < 0:
+                    order[successor] = low[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    path.append((successor, 0))
+                elif on_stack[successor]:
+                    low[state] = min(low[state], order[successor])
+                continue
+
+            path.pop()
+            if path:
+                parent = path[-1][0]
+                low[parent] = min(low[parent], low[state])
+            if low[state] == order[state]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = num_of_components
+                    if member == state:
+                        break
+                num_of_components += 1
+
+    return component
+
+
+class TauClosure():
+    def __init__(self, graph: Graph) -> None:
+        """Condensed tau transitions of a graph
+
+        Args:
+            graph (Graph): the graph
+        """
+        self.states = graph.get_states_list()
+        self.names = [state.get_name() for state in self.states]
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, i)
+        num_of_states = len(self.states)
+
+        targets = [[self.index[transition.next_state] for transition in state.get_outgoing_tau_list()]
+                   for state in self.states]
+        self.component = find_components(targets)
+
+        # tau transitions of the DAG, a transition in a tau cycle is not followed
+        self.successors = [[target for target in targets[i] if self.component[target] != self.component[i]]
+                           for i in range(num_of_states)]
+        self.predecessors = [[] for _ in range(num_of_states)]
+        for i in range(num_of_states):
+            for target in self.successors[i]:
+                self.predecessors[target].append(i)
+
+        self.has_tau = np.array([len(state.get_outgoing_tau_list()) > 0 or len(state.get_imcoming_tau_list()) > 0
+                                 for state in self.states], dtype=bool)
+        self.has_observable_outgoing = np.array([state.get_num_of_outgoing_transitions() > len(targets[i])
+                                                 for i, state in enumerate(self.states)], dtype=bool)
+        self.has_observable_incoming = np.array([state.get_num_of_incoming_transistions()
+                                                 > len(state.get_imcoming_tau_list())
+                                                 for state in self.states], dtype=bool)
+
+        # the successors of a component are in the lower components
+        by_component = sorted(range(num_of_states), key=lambda i: self.component[i])
+        self.forward_level = np.zeros(num_of_states, dtype=np.int64)
+        for i in by_component:
+            if self.successors[i]:
+                self.forward_level[i] = 1 + max(self.forward_level[j] for j in self.successors[i])
+        self.backward_level = np.zeros(num_of_states, dtype=np.int64)
+        for i in reversed(by_component):
+            if self.predecessors[i]:
+                self.backward_level[i] = 1 + max(self.backward_level[j] for j in self.predecessors[i])
+
+        logger.debug("graph = %s: %s states with tau, max level = %s",
+                     graph._name, int(self.has_tau.sum()), int(self.forward_level.max(initial=0)))
+
+    def get_neighbors(self, state: State, backward: bool = False) -> list:
+        """Get the states reached by the tau transitions of a state in the DAG
+
+        Args:
+            state (State): the state
+            backward (bool, optional): follow the incoming tau transitions.
+                                       Defaults to False.
+
+        Returns:
+            list: the states, once per tau transition
+        """
+        neighbors = self.predecessors if backward else self.successors
+        return [self.states[j] for j in neighbors[self.index[state.get_name()]]]
+
+    def has_observable(self, state: State, backward: bool = False) -> bool:
+        """Check if a state has an outgoing (incoming) transition which is not tau
+
+        Args:
+            state (State): the state
+            backward (bool, optional): check the incoming transitions.
+                                       Defaults to False.
+
+        Returns:
+            bool: True if the state has an emission or a reception
+        """
+        observable = self.has_observable_incoming if backward else self.has_observable_outgoing
+        return bool(observable[self.index[state.get_name()]])
+
+    def to_arrays(self, backward: bool = False) -> dict:
+        """Arrays of the forward (backward) propagation
+
+        Args:
+            backward (bool, optional): incoming tau transitions. Defaults to False.
+
+        Returns:
+            dict: neighbors of every state padded with 0, number of
+                  neighbors, observable transitions and level of every state
+        """
+        neighbors = self.predecessors if backward else self.successors
+        degree = np.array([len(states) for states in neighbors], dtype=np.int64)
+        padded = np.zeros((len(neighbors), int(degree.max(initial=0))), dtype=np.int64)
+        for i, states in enumerate(neighbors):
+            padded[i, :len(states)] = states
+
+        return {
+            "neighbors": padded,
+            "degree": degree,
+            "observable": self.has_observable_incoming if backward else self.has_observable_outgoing,
+            "level": self.backward_level if backward else self.forward_level,
+        }
@@ -0,0 +1,82 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for assignment.py module
+"""
+
+import pytest
+import numpy as np
+from itertools import permutations
+from . import assignment
+from .assignment import best_assignment_sum, best_assignment_sums, hungarian
+from .parser import create_graph_from_dict
+from .engine import CompatibilityEngine, WorklistSolver
+from compatibility_calculation import calculate_compatibility
+from benchmarks.generate_graph import generate_graph_pair
+
+
+def brute_force(scores: np.ndarray) -> float:
+    if scores.shape[0] > scores.shape[1]:
+        scores = scores.T
+    return max(sum(scores[row, column] for row, column in enumerate(columns))
+               for columns in permutations(range(scores.shape[1]), scores.shape[0]))
+
+
+def test_one_to_one_sum():
+    # both emissions prefer the first reception
+    scores = np.array([[0.9, 0.5],
+                       [0.8, 0.1]])
+
+    assert best_assignment_sum(scores) == pytest.approx(1.3)
+    assert best_assignment_sum(np.array([[0.9, 0.8]])) == pytest.approx(0.9)
+    assert best_assignment_sum(np.zeros((2, 3))) == 0
+    assert list(hungarian(scores)) == [1, 0]
+
+
+@pytest.mark.parametrize("enumeration_limit", [720, 0])
+def test_same_result_as_brute_force(monkeypatch, enumeration_limit):
+    monkeypatch.setattr(assignment, "ENUMERATION_LIMIT", enumeration_limit)
+    generator = np.random.default_rng(0)
+    matrices = []
+    for _ in range(200):
+        shape = tuple(generator.integers(1, 7, size=2))
+        scores = generator.random(shape)*(generator.random(shape) < 0.7)
+        matrices.append(np.round(scores, 1) if generator.random() < 0.3 else scores)
+
+    for scores in matrices:
+        assert best_assignment_sum(scores) == pytest.approx(brute_force(scores))
+
+    padded = np.zeros((len(matrices), 6, 6))
+    for i, scores in enumerate(matrices):
+        padded[i, :scores.shape[0], :scores.shape[1]] = scores
+    assert np.array_equal(best_assignment_sums(padded), [best_assignment_sum(scores) for scores in matrices])
+
+
+def test_engine_same_result_as_python_calculation():
+    # a few messages for many transitions, so the emissions of a state share
+    # their best reception
+    graph_dicts = generate_graph_pair(20, out_degree=6, num_of_messages=3, overlap=1.0, seed=1)
+    graph1, graph2 = [create_graph_from_dict(graph_dict) for graph_dict in graph_dicts]
+    engine = CompatibilityEngine(graph1, graph2, one_to_one=True)
+    greedy = CompatibilityEngine(graph1, graph2)
+
+    comp_matrix = calculate_compatibility(graph1, graph2, None)
+    matrix = engine.initial_matrix()
+    for _ in range(4):
+        comp_matrix = calculate_compatibility(graph1, graph2, comp_matrix, one_to_one=True)
+        matrix = engine.step(matrix)
+        assert np.array_equal(engine.to_array(comp_matrix), matrix)
+
+    # a reception taken by one emission only gives lower sums
+    greedy_matrix = greedy.run(4)
+    assert (matrix <= greedy_matrix).all()
+    assert (matrix < greedy_matrix).any()
+
+    with pytest.raises(Exception, match="not supported by the worklist solver"):
+        WorklistSolver(engine)
@@ -0,0 +1,98 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for batch_calculation.py module
+"""
+
+import os
+import shutil
+import logging
+import pytest
+import numpy as np
+import pandas as pd
+from .parser import create_graph
+from compatibility_calculation import calculate_final_compatibility
+from compatibility_calculation import calculate_global_compatibility, calculate_initial_compatibility
+from batch_calculation import SUMMARY_COLUMNS, find_candidates, init_worker, compare_candidate, compare_candidates
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+TAU = os.path.join(os.path.dirname(__file__), "test_data", "tau.json")
+
+
+@pytest.fixture
+def candidate_dir(tmp_path) -> str:
+    shutil.copy(TEST_DATA, os.path.join(tmp_path, "a_test.json"))
+    shutil.copy(TAU, os.path.join(tmp_path, "b_tau.json"))
+    with open(os.path.join(tmp_path, "c_broken.json"), "w") as file:
+        file.write("{\"graph_name\": ")
+    with open(os.path.join(tmp_path, "notes.txt"), "w") as file:
+        file.write("not a candidate")
+    os.mkdir(os.path.join(tmp_path, "d_directory.json"))
+    return str(tmp_path)
+
+
+def test_find_candidates(candidate_dir):
+    expected = [os.path.join(candidate_dir, name) for name in ("a_test.json", "b_tau.json", "c_broken.json")]
+
+    assert find_candidates(candidate_dir) == expected
+    assert find_candidates(os.path.join(candidate_dir, "*.json")) == expected
+    assert find_candidates(os.path.join(candidate_dir, "b_*.json")) == expected[1:2]
+    assert find_candidates(os.path.join(candidate_dir, "*.xml")) == []
+
+
+def test_global_and_initial_compatibility():
+    graph = create_graph(TEST_DATA)
+    names = [state.get_name() for state in graph.get_states_list()]
+    values = np.arange(len(names)**2, dtype=float).reshape(len(names), len(names))/len(names)**2
+    comp_matrix = pd.DataFrame(values, index=names, columns=names)
+
+    # average of the best value of every column
+    assert calculate_global_compatibility(comp_matrix) == pytest.approx(values[-1].mean())
+    # value of the initial states, the first state of test.json
+    assert names[0] == "b0_Idle"
+    assert calculate_initial_compatibility(graph, graph, comp_matrix) == values[0, 0]
+
+
+def test_compare_candidate():
+    reference_graph = create_graph(TEST_DATA)
+    init_worker(reference_graph, logging.CRITICAL)
+
+    summary, comp_matrix = compare_candidate(TAU, 3, "numpy")
+    expected, iterations = calculate_final_compatibility(reference_graph, create_graph(TAU), 3, "numpy")
+
+    assert comp_matrix.equals(expected)
+    assert summary[0] == TAU
+    assert summary[1] == create_graph(TAU)._name
+    assert summary[2] == len(create_graph(TAU).get_states_list())
+    assert summary[3] == iterations == 3
+    assert summary[4] == calculate_initial_compatibility(reference_graph, create_graph(TAU), expected)
+    assert summary[5] == round(calculate_global_compatibility(expected), 3)
+    assert summary[6] >= 0
+
+
+def test_compare_candidates(candidate_dir):
+    reference_graph = create_graph(TEST_DATA)
+    paths = find_candidates(candidate_dir)
+
+    summary_table, matrices = compare_candidates(reference_graph, paths, 2, "numpy", jobs=2)
+
+    assert list(summary_table.columns) == SUMMARY_COLUMNS
+    assert list(summary_table["candidate"]) == paths
+    assert sorted(matrices) == paths[:2]
+    for path in paths[:2]:
+        expected, iterations = calculate_final_compatibility(reference_graph, create_graph(path), 2, "numpy")
+        row = summary_table[summary_table["candidate"] == path].iloc[0]
+        assert matrices[path].equals(expected)
+        assert row["iterations"] == iterations
+        assert row["global_comp"] == round(calculate_global_compatibility(expected), 3)
+
+    # the broken candidate is reported without stopping the others
+    failed = summary_table[summary_table["candidate"] == paths[2]].iloc[0]
+    assert failed[SUMMARY_COLUMNS[1:]].isna().all()
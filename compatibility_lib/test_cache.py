@@ -0,0 +1,126 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for cache.py module
+"""
+
+import os
+import shutil
+import pytest
+from .parser import create_graph
+from .cache import create_graph_cached, get_cache_path, read_graph_cache
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+
+
+def graph_content(graph) -> list:
+    content = [graph._name]
+    for state in graph.get_states_list():
+        content.append((state.get_name(), state._type,
+                        [(transition.name, transition.type, transition.params, transition.next_state)
+                         for transition in state.get_outgoing_transitions_list()],
+                        [(transition.name, transition.type, transition.params, transition.next_state)
+                         for transition in state.get_incoming_transitions_list()]))
+    return content
+
+
+def test_cache_is_written_and_read(tmp_path):
+    cache_dir = os.path.join(tmp_path, "cache")
+    graph = create_graph_cached(TEST_DATA, cache_dir)
+    cache_path = get_cache_path(TEST_DATA, cache_dir)
+    assert os.path.isfile(cache_path)
+
+    cached_graph = read_graph_cache(cache_path)
+    assert graph_content(cached_graph) == graph_content(create_graph(TEST_DATA))
+    assert graph_content(create_graph_cached(TEST_DATA, cache_dir)) == graph_content(cached_graph)
+
+    state = cached_graph.get_states_list()[1]
+    transition = state.get_outgoing_transitions_list()[0]
+    incoming = cached_graph.get_state(transition.next_state).get_incoming_transitions_list()
+    assert any(incoming_transition is transition for incoming_transition in incoming)
+
+
+def test_changed_file_has_new_cache(tmp_path):
+    path = os.path.join(tmp_path, "test.json")
+    shutil.copy(TEST_DATA, path)
+    create_graph_cached(path)
+    cache_path = get_cache_path(path)
+    assert os.path.dirname(cache_path) == str(tmp_path)
+
+    with open(path, "a") as file:
+        file.write("\n")
+    assert get_cache_path(path) != cache_path
+
+    with open(cache_path, "wb") as file:
+        file.write(b"not a cache")
+    assert read_graph_cache(cache_path) is None
+
+
+@pytest.mark.parametrize("corruption", ["cut", "header", "prefix", "empty"])
+def test_corrupted_cache_is_replaced(tmp_path, corruption):
+    path = os.path.join(tmp_path, "test.json")
+    shutil.copy(TEST_DATA, path)
+    graph = create_graph_cached(path)
+    cache_path = get_cache_path(path)
+    with open(cache_path, "rb") as file:
+        content = file.read()
+
+    if corruption == "cut":
+        content = content[:len(content)//2]
+    elif corruption == "header":
+        content = content[:20] + b"\xff"*8 + content[28:]
+    elif corruption == "prefix":
+        content = content[:16]
+    else:
+        content = b""
+    with open(cache_path, "wb") as file:
+        file.write(content)
+
+    assert read_graph_cache(cache_path) is None
+    assert graph_content(create_graph_cached(path)) == graph_content(graph)
+    # the cache is written again
+    assert graph_content(read_graph_cache(cache_path)) == graph_content(graph)
+
+
+def test_old_caches_are_removed(tmp_path):
+    path = os.path.join(tmp_path, "test.json")
+    other_path = os.path.join(tmp_path, "test.json.json")
+    shutil.copy(TEST_DATA, path)
+    shutil.copy(TEST_DATA, other_path)
+    create_graph_cached(path)
+    create_graph_cached(other_path)
+    old_cache_path = get_cache_path(path)
+
+    with open(path, "a") as file:
+        file.write("\n")
+    create_graph_cached(path)
+
+    assert os.path.isfile(get_cache_path(path))
+    assert os.path.isfile(old_cache_path) == False
+    # the cache of another json file is kept
+    assert os.path.isfile(get_cache_path(other_path))
+
+
+def test_same_name_in_shared_cache_dir(tmp_path):
+    cache_dir = os.path.join(tmp_path, "cache")
+    paths = [os.path.join(tmp_path, directory, "x.json") for directory in ("a", "b")]
+    for path in paths:
+        os.mkdir(os.path.dirname(path))
+        shutil.copy(TEST_DATA, path)
+    with open(paths[1], "a") as file:
+        file.write("\n")
+
+    for path in paths:
+        create_graph_cached(path, cache_dir)
+
+    # the second file does not remove the cache of the first one
+    assert get_cache_path(paths[0], cache_dir) != get_cache_path(paths[1], cache_dir)
+    assert os.path.isfile(get_cache_path(paths[0], cache_dir))
+    assert os.path.isfile(get_cache_path(paths[1], cache_dir))
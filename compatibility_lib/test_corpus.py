@@ -0,0 +1,120 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for corpus_calculation.py module
+"""
+
+import os
+import json
+import shutil
+import pytest
+import numpy as np
+import pandas as pd
+from .parser import create_graph
+from compatibility_calculation import calculate_final_compatibility, calculate_global_compatibility
+from corpus_calculation import SCORES_COLUMNS, hash_file, read_done_pairs, calculate_corpus, create_score_table
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+TAU = os.path.join(os.path.dirname(__file__), "test_data", "tau.json")
+
+
+@pytest.fixture
+def corpus(tmp_path) -> list:
+    paths = [os.path.join(tmp_path, name) for name in ("a_test.json", "b_tau.json", "c_test.json")]
+    shutil.copy(TEST_DATA, paths[0])
+    shutil.copy(TAU, paths[1])
+    shutil.copy(TEST_DATA, paths[2])
+    return paths
+
+
+def test_read_done_pairs(tmp_path):
+    scores_path = os.path.join(tmp_path, "scores.csv")
+    assert read_done_pairs(scores_path) == set()
+
+    with open(scores_path, "w") as file:
+        file.write(",".join(SCORES_COLUMNS) + "\n")
+        file.write("a.json,b.json,1,2,3,0.5,0.6,0.7,0.1\n")
+        # no time, the pair was not finished
+        file.write("a.json,c.json,1,3,3,0.5,0.6,0.7,\n")
+        # cut by an interruption, even if the time looks complete
+        file.write("b.json,c.json,2,3,3,0.5,0.6,0.7,0.1")
+
+    assert read_done_pairs(scores_path) == {("a.json", "1", "b.json", "2")}
+
+
+def test_calculate_corpus(corpus, tmp_path):
+    scores_path = os.path.join(tmp_path, "scores.csv")
+
+    scores = calculate_corpus(corpus, scores_path, 2, "numpy", jobs=2)
+
+    assert list(scores.columns) == SCORES_COLUMNS
+    assert sorted(zip(scores["graph1"], scores["graph2"])) == [(corpus[0], corpus[1]), (corpus[0], corpus[2]),
+                                                                (corpus[1], corpus[2])]
+    for row in scores.itertuples():
+        graph1 = create_graph(row.graph1)
+        graph2 = create_graph(row.graph2)
+        comp_matrix, iterations = calculate_final_compatibility(graph1, graph2, 2, "numpy")
+        reverse_matrix, iterations = calculate_final_compatibility(graph2, graph1, 2, "numpy")
+        assert row.hash1 == hash_file(row.graph1)
+        assert row.iterations == iterations
+        # the matrix of (graph2, graph1) is the transpose
+        assert row.global_comp_1 == round(calculate_global_compatibility(comp_matrix), 3)
+        assert row.global_comp_2 == round(calculate_global_compatibility(reverse_matrix), 3)
+
+
+def test_resume_calculate_corpus(corpus, tmp_path):
+    scores_path = os.path.join(tmp_path, "scores.csv")
+    scores = calculate_corpus(corpus, scores_path, 2, "numpy", jobs=1)
+
+    # the finished pairs are not calculated again
+    assert calculate_corpus(corpus, scores_path, 2, "numpy", jobs=1).equals(scores)
+
+    # interrupted while the last row was written
+    with open(scores_path, "rb+") as file:
+        file.truncate(os.path.getsize(scores_path) - 3)
+    resumed = calculate_corpus(corpus, scores_path, 2, "numpy", jobs=1)
+
+    assert len(resumed) == 3
+    assert resumed.drop(columns="time").sort_values(["graph1", "graph2"]).reset_index(drop=True).equals(
+        scores.drop(columns="time").sort_values(["graph1", "graph2"]).reset_index(drop=True))
+    with open(scores_path, "r") as file:
+        assert file.read().endswith("\n")
+
+    # the pairs of an edited graph are calculated again
+    with open(corpus[1], "r") as file:
+        graph_dict = json.load(file)
+    with open(corpus[1], "w") as file:
+        json.dump(graph_dict, file)
+    edited = calculate_corpus(corpus, scores_path, 2, "numpy", jobs=1)
+
+    assert len(edited) == 5
+    assert set(edited["hash1"]).union(edited["hash2"]) >= {hash_file(path) for path in corpus}
+
+
+def test_create_score_table():
+    paths = ["a.json", "b.json", "c.json"]
+    scores = pd.DataFrame([["a.json", "b.json", 0.1, 0.2],
+                           ["a.json", "c.json", 0.3, 0.4],
+                           # calculated again after an edit, the last row is kept
+                           ["a.json", "b.json", 0.5, 0.6],
+                           # not in the corpus any more
+                           ["a.json", "d.json", 0.7, 0.8]],
+                          columns=["graph1", "graph2", "global_comp_1", "global_comp_2"])
+
+    table = create_score_table(scores, paths)
+
+    assert list(table.index) == paths
+    assert list(table.columns) == paths
+    assert table.loc["a.json", "b.json"] == 0.5
+    assert table.loc["b.json", "a.json"] == 0.6
+    assert table.loc["a.json", "c.json"] == 0.3
+    assert table.loc["c.json", "a.json"] == 0.4
+    assert np.isnan(table.loc["b.json", "c.json"])
+    assert np.isnan(np.diag(table.to_numpy(dtype=float))).all()
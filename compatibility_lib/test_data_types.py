@@ -0,0 +1,149 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for data_types.py module
+"""
+
+import os
+import gc
+import pickle
+import weakref
+import pytest
+import numpy as np
+from .graph import Transition, TransitionType
+from .parser import create_graph
+from .label import LabelCompatibilityTable
+from .engine import CompatibilityEngine
+from .data_types import DataTypeTable, load_data_type_table, num_of_unshared_types
+from .data_types import pack_type_masks, num_of_unshared_types_array
+from compatibility_calculation import calculate_compatibility, calculate_lab_comp
+
+
+DATA_TYPES = os.path.join(os.path.dirname(__file__), "..", "data_types.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+OCPP = os.path.join(os.path.dirname(__file__), "..", "ocpp.json")
+
+
+def test_canonical_type_ids():
+    table = DataTypeTable({"base64Binary": "string", "token": "normalizedString",
+                           "NCName": ["token", "normalizedString"]})
+
+    assert table.get_type_id("base64Binary") == table.get_type_id("string")
+    assert table.get_type_id("normalizedString") == table.get_type_id("token") == table.get_type_id("NCName")
+    assert table.get_type_id("normalizedString") != table.get_type_id("string")
+    assert table.get_type_id("integer") != table.get_type_id("string")
+    assert table.get_canonical_type("unknown") == "unknown"
+    assert table.get_num_of_type_ids() == 3
+
+    with pytest.raises(Exception, match="must be a string"):
+        DataTypeTable({"base64Binary": 1})
+    # two unrelated supertypes do not become equivalent
+    with pytest.raises(Exception, match="not equivalent to each other"):
+        DataTypeTable({"token": ["string", "normalizedString"]})
+    with pytest.raises(Exception, match="not equivalent to each other"):
+        DataTypeTable({"base64Binary": "string", "token": "normalizedString", "NCName": ["token", "string"]})
+
+
+def test_unshared_types():
+    table = DataTypeTable()
+    data_types = [set(), {"type1"}, {"type1", "type2"}, {"type2", "type3", None}]
+    for data_types1 in data_types:
+        for data_types2 in data_types:
+            assert num_of_unshared_types(table.get_type_mask(data_types1), table.get_type_mask(data_types2)) \
+                == len(data_types1.symmetric_difference(data_types2))
+
+
+@pytest.mark.parametrize("bitwise_count", [True, False])
+def test_packed_type_masks(monkeypatch, bitwise_count):
+    if not bitwise_count:
+        monkeypatch.delattr(np, "bitwise_count", raising=False)
+    # more data types than bits in a word
+    generator = np.random.default_rng(0)
+    type_masks = [int(generator.integers(0, 1 << 62))
+                  | (int(generator.integers(0, 1 << 62)) << 62)
+                  | (int(generator.integers(0, 4)) << 124) for _ in range(20)] + [0]
+    packed = pack_type_masks(type_masks)
+
+    assert packed.shape == (len(type_masks), 2)
+    assert packed.dtype == np.uint64
+    expected = np.array([[num_of_unshared_types(type_mask1, type_mask2) for type_mask2 in type_masks]
+                         for type_mask1 in type_masks])
+    assert np.array_equal(num_of_unshared_types_array(packed[:, None, :], packed[None, :, :]), expected)
+    # the narrower masks are padded with zeros
+    narrow = pack_type_masks([1, 2])
+    assert narrow.shape == (2, 1)
+    assert np.array_equal(num_of_unshared_types_array(packed[:, None, :], narrow[None, :, :]),
+                          [[num_of_unshared_types(type_mask, other) for other in (1, 2)] for type_mask in type_masks])
+
+
+def test_equivalent_types_are_shared():
+    table = load_data_type_table(DATA_TYPES)
+    params = {"emission": ["id:base64Binary", "count:integer"], "reception": ["id:string", "count:integer"]}
+    transitions = {}
+    for data_type_table in (None, table):
+        transitions[data_type_table] = [Transition(name="transition", next_state="next_state", type=transition_type,
+                                                   params=params[key], data_type_table=data_type_table)
+                                        for key, transition_type in (("emission", TransitionType.EMISSION),
+                                                                     ("reception", TransitionType.RECEPTION))]
+
+    assert calculate_lab_comp(*transitions[None]) == pytest.approx(1 - 2/24)
+    assert calculate_lab_comp(*transitions[table]) == 1
+    assert LabelCompatibilityTable().get(*transitions[table]) == 1
+
+
+def test_engine_same_result_as_python_calculation():
+    table = load_data_type_table(DATA_TYPES)
+    graph1 = create_graph(ISO_15118, table)
+    graph2 = create_graph(OCPP, table)
+    engine = CompatibilityEngine(graph1, graph2)
+
+    comp_matrix = calculate_compatibility(graph1, graph2, None)
+    matrix = engine.initial_matrix()
+    for _ in range(3):
+        comp_matrix = calculate_compatibility(graph1, graph2, comp_matrix)
+        matrix = engine.step(matrix)
+        assert np.array_equal(engine.to_array(comp_matrix), matrix)
+
+    # base64Binary and string are not shared without the table
+    default = CompatibilityEngine(create_graph(ISO_15118), create_graph(OCPP)).run(3)
+    assert not np.array_equal(default, matrix)
+
+
+def test_graphs_of_different_tables():
+    table = load_data_type_table(DATA_TYPES)
+    graph1 = create_graph(ISO_15118, table)
+    graph2 = create_graph(OCPP)
+
+    with pytest.raises(Exception, match="data type table"):
+        LabelCompatibilityTable(graph1, graph2)
+    with pytest.raises(Exception, match="data type table"):
+        CompatibilityEngine(graph1, graph2)
+
+    transitions = [Transition(name="transition", next_state="next_state", type=transition_type,
+                              params=["id:string"], data_type_table=data_type_table)
+                   for transition_type, data_type_table in ((TransitionType.EMISSION, table),
+                                                            (TransitionType.RECEPTION, None))]
+    with pytest.raises(Exception, match="data type table"):
+        calculate_lab_comp(*transitions)
+
+
+def test_parsed_params_freed_with_table():
+    table = load_data_type_table(DATA_TYPES)
+    params = create_graph(ISO_15118, table).get_states_list()[0].get_outgoing_transitions_list()[0].params
+    assert table.parsed_params[tuple(params)] is params
+
+    # the parsed parameters of a pickled table are parsed again
+    loaded_params = pickle.loads(pickle.dumps(params))
+    assert loaded_params == params
+    assert loaded_params.data_type_table.parsed_params == {tuple(params): loaded_params}
+
+    table_reference = weakref.ref(table)
+    del table, params, loaded_params
+    gc.collect()
+    assert table_reference() is None
@@ -0,0 +1,169 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for engine.py module
+"""
+
+import os
+import pytest
+import numpy as np
+from .graph import Transition, TransitionType
+from .graph import State, StateType
+from .graph import Graph
+from .parser import create_graph
+from .engine import CompatibilityEngine, WorklistSolver, calculate_compatibility_vectorized
+from compatibility_calculation import calculate_compatibility, ParallelCompatibility
+from compatibility_calculation import iterate_compatibility, calculate_final_compatibility, calculate_delta
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+@pytest.fixture
+def graphs() -> tuple:
+    return (create_graph(ISO_15118), create_graph(TEST_DATA))
+
+
+def test_initial_matrix(graphs):
+    graph1, graph2 = graphs
+    engine = CompatibilityEngine(graph1, graph2)
+    expected = calculate_compatibility(graph1, graph2, None)
+
+    matrix = engine.to_dataframe(engine.initial_matrix())
+
+    assert list(matrix.index) == list(expected.index)
+    assert list(matrix.columns) == list(expected.columns)
+    assert (matrix.values == 1).all()
+
+
+@pytest.mark.parametrize("swap", [False, True])
+def test_same_result_as_python_calculation(graphs, swap):
+    graph1, graph2 = graphs
+    if swap:
+        graph1, graph2 = graph2, graph1
+    engine = CompatibilityEngine(graph1, graph2)
+
+    expected = calculate_compatibility(graph1, graph2, None)
+    matrix = engine.initial_matrix()
+    for i in range(6):
+        expected = calculate_compatibility(graph1, graph2, expected)
+        matrix = engine.step(matrix)
+
+        assert np.array_equal(engine.to_dataframe(matrix).values, expected.values.astype(float))
+
+
+def test_drop_in_replacement(graphs):
+    graph1, graph2 = graphs
+    expected = calculate_compatibility(graph1, graph2, None)
+    expected = calculate_compatibility(graph1, graph2, expected)
+
+    matrix = calculate_compatibility_vectorized(graph1, graph2, None)
+    matrix = calculate_compatibility_vectorized(graph1, graph2, matrix)
+
+    assert np.array_equal(matrix.loc[expected.index, expected.columns].values,
+                          expected.values.astype(float))
+
+
+def test_worklist_tau_not_supported():
+    tau = Transition(name="timeout", next_state="s1", type=TransitionType.TAU)
+    states = [State(name="s0", type=StateType.INIT, outgoing=[tau]),
+              State(name="s1", type=StateType.FINAL)]
+    engine = CompatibilityEngine(Graph(name="tau", states=states), Graph(name="tau", states=states))
+
+    with pytest.raises(Exception):
+        WorklistSolver(engine)
+
+
+def test_double_buffer(graphs):
+    graph1, graph2 = graphs
+    engine = CompatibilityEngine(graph1, graph2)
+
+    matrix = engine.initial_matrix()
+    for i in range(5):
+        matrix = engine.step(matrix)
+
+    assert np.array_equal(engine.run(5), matrix)
+
+    buffer = np.empty(engine.shape)
+    assert engine.step(matrix, out=buffer) is buffer
+
+
+def test_parallel_python_calculation(graphs):
+    graph1, graph2 = graphs
+    expected = calculate_compatibility(graph1, graph2, None)
+    matrix = expected
+
+    with ParallelCompatibility(graph1, graph2, workers=2) as parallel:
+        for i in range(3):
+            expected = calculate_compatibility(graph1, graph2, expected)
+            matrix = parallel.step(matrix)
+
+            assert np.array_equal(matrix.values, expected.values.astype(float))
+
+
+@pytest.mark.parametrize("swap", [False, True])
+def test_worklist_same_result_as_engine(graphs, swap):
+    graph1, graph2 = graphs
+    if swap:
+        graph1, graph2 = graph2, graph1
+    engine = CompatibilityEngine(graph1, graph2)
+    solver = WorklistSolver(engine)
+
+    matrix = engine.initial_matrix()
+    worklist_matrix = engine.initial_matrix()
+    for i in range(40):
+        matrix = engine.step(matrix)
+        worklist_matrix = solver.step(worklist_matrix, in_place=(i % 2 == 0))
+
+        assert np.array_equal(worklist_matrix, matrix)
+
+    assert solver.is_converged()
+    assert solver.num_of_calculated_cells < 40 * matrix.size
+
+
+def test_worklist_solve(graphs):
+    engine = CompatibilityEngine(*graphs)
+
+    exact_matrix, rounds = WorklistSolver(engine).solve()
+    assert np.array_equal(engine.step(exact_matrix), exact_matrix)
+
+    solver = WorklistSolver(engine, tolerance=0.01)
+    matrix, tolerance_rounds = solver.solve()
+    assert solver.is_converged()
+    assert tolerance_rounds <= rounds
+    assert np.abs(matrix - exact_matrix).max() < 0.1
+
+
+@pytest.mark.parametrize("double_buffer", [False, True])
+def test_worklist_iterations_same_as_engine(graphs, double_buffer):
+    last_matrices = {}
+    deltas = {}
+    for engine in ("numpy", "worklist"):
+        iterations = iterate_compatibility(*graphs, engine, double_buffer=double_buffer)
+        deltas[engine] = []
+        last_matrix = next(iterations)
+        for i in range(1, 40):
+            comp_matrix = next(iterations)
+            deltas[engine].append(calculate_delta(comp_matrix, last_matrix))
+            last_matrix = comp_matrix
+        iterations.close()
+        last_matrices[engine] = last_matrix
+
+    assert deltas["worklist"] == deltas["numpy"]
+    assert last_matrices["worklist"].equals(last_matrices["numpy"])
+
+
+def test_worklist_convergence_same_as_engine(graphs):
+    matrix, iterations = calculate_final_compatibility(*graphs, 100, "numpy", 0.0005)
+    worklist_matrix, worklist_iterations = calculate_final_compatibility(*graphs, 100, "worklist", 0.0005)
+
+    assert iterations > 2
+    assert worklist_iterations == iterations
+    assert worklist_matrix.equals(matrix)
@@ -10,10 +10,20 @@ __status__ = "Development"
 """Unit test for graph class
 """
 
+import os
+import pickle
 import pytest
 from .graph import Transition, TransitionType
 from .graph import State, StateType
-from .graph import Graph
+from .graph import Graph, GraphArrays
+from .parser import create_graph
+from .data_types import load_data_type_table
+from .engine import CompatibilityEngine
+
+
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+OCPP = os.path.join(os.path.dirname(__file__), "..", "ocpp.json")
+DATA_TYPES = os.path.join(os.path.dirname(__file__), "..", "data_types.json")
 
 
 @pytest.fixture
@@ -99,4 +109,63 @@ def test_create_graph(init_state, normal_state, final_state, transitions):
     assert len(graph.get_states_list()) == 4
     
     
-    
\ No newline at end of file
+    
+
+def test_get_state_after_add(init_state, transitions):
+    graph = Graph(name="graph", states=[init_state])
+    assert graph.get_state("new_state") == None
+    
+    new_state = State(name="new_state",
+                  type=StateType.NORMAL,
+                  outgoing= [transitions[2], transitions[3]]
+                  )
+    graph.add_state(new_state)
+    
+    assert graph.get_state("new_state") == new_state
+    assert graph.get_state(init_state.get_name()) == init_state
+
+
+def test_graph_arrays():
+    emission = Transition(name="message", next_state="s1", type=TransitionType.EMISSION,
+                          params=["id:integer", "name:string"])
+    reception = Transition(name="reply", next_state="s0", type=TransitionType.RECEPTION,
+                           params=["id:integer"])
+    loop = Transition(name="message", next_state="s1", type=TransitionType.RECEPTION)
+    graph = Graph(name="graph",
+                  states=[State(name="s0", type=StateType.NORMAL, outgoing=[emission]),
+                          State(name="s1", type=StateType.FINAL),
+                          State(name="s2", type=StateType.NORMAL, outgoing=[reception, loop])])
+
+    arrays = GraphArrays(graph)
+    assert arrays.get_num_of_states() == 3
+    assert arrays.get_num_of_transitions() == 3
+    assert arrays.transitions == [emission, reception, loop]
+    assert list(arrays.state_type) == [StateType.NORMAL.value, StateType.FINAL.value, StateType.NORMAL.value]
+    assert list(arrays.transition_source) == [0, 2, 2]
+    assert list(arrays.transition_target) == [1, 0, 1]
+    assert [arrays.transition_names[i] for i in arrays.transition_name] == ["message", "reply", "message"]
+    assert list(arrays.param_offsets) == [0, 2, 3, 3]
+    assert [arrays.data_types[i] for i in arrays.param_type] == ["integer", "string", "integer"]
+
+
+@pytest.mark.parametrize("with_table", [False, True])
+def test_pickle_graphs(with_table):
+    data_type_table = load_data_type_table(DATA_TYPES) if with_table else None
+    graphs = (create_graph(ISO_15118, data_type_table), create_graph(OCPP, data_type_table))
+
+    # the graphs are sent to the worker processes together
+    loaded_graphs = pickle.loads(pickle.dumps(graphs))
+
+    for graph, loaded_graph in zip(graphs, loaded_graphs):
+        transitions = [transition for state in graph.get_states_list()
+                       for transition in state.get_outgoing_transitions_list()]
+        loaded_transitions = [transition for state in loaded_graph.get_states_list()
+                              for transition in state.get_outgoing_transitions_list()]
+        assert [(transition.name, transition.type, transition.next_state, transition.params.pairs)
+                for transition in loaded_transitions] == \
+               [(transition.name, transition.type, transition.next_state, transition.params.pairs)
+                for transition in transitions]
+    loaded_tables = set(transition.params.data_type_table for graph in loaded_graphs
+                        for state in graph.get_states_list() for transition in state.get_outgoing_transitions_list())
+    assert len(loaded_tables) == 1
+    assert CompatibilityEngine(*loaded_graphs).run(3).tolist() == CompatibilityEngine(*graphs).run(3).tolist()
@@ -0,0 +1,136 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for incremental_calculation.py module
+"""
+
+import os
+import json
+import copy
+import pytest
+import numpy as np
+from .parser import create_graph, create_graph_from_dict
+from compatibility_calculation import calculate_compatibility, save_state, load_state
+from incremental_calculation import find_edited_states, iterate_incremental_compatibility
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+def calculate_matrices(graph1, graph2, iterate, one_to_one=False) -> list:
+    comp_matrices = [calculate_compatibility(graph1, graph2, None)]
+    for i in range(iterate):
+        comp_matrices.append(calculate_compatibility(graph1, graph2, comp_matrices[-1], one_to_one=one_to_one))
+    return comp_matrices
+
+
+def create_state(name, state_type, transitions=()) -> dict:
+    return {"state_name": name, "state_type": state_type,
+            "transitions": [{"transition_name": transition_name, "transition_type": transition_type,
+                             "params": params, "next_state": next_state}
+                            for transition_name, transition_type, params, next_state in transitions]}
+
+
+@pytest.fixture
+def test_dict() -> dict:
+    with open(TEST_DATA, "r") as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def edited_dict(test_dict) -> dict:
+    edited_dict = copy.deepcopy(test_dict)
+    edited_dict["states"][1]["transitions"][0]["params"] = ["ExiRequest:integer"]
+    edited_dict["states"][4]["transitions"][0]["next_state"] = "b1_CertWait"
+    return edited_dict
+
+
+def test_find_edited_states(test_dict, edited_dict):
+    graph = create_graph_from_dict(test_dict)
+    edited_graph = create_graph_from_dict(edited_dict)
+    old_next_state = test_dict["states"][4]["transitions"][0]["next_state"]
+
+    assert find_edited_states(graph, graph) == []
+    assert sorted(find_edited_states(graph, edited_graph)) == sorted(set([
+        "b1_CertWait",       # edited parameters, new incoming transition
+        "b4_Charging",       # edited next state
+        old_next_state,      # one incoming transition less
+        edited_dict["states"][1]["transitions"][0]["next_state"]]))
+
+
+@pytest.mark.parametrize("swap", [False, True])
+def test_same_result_as_full_calculation(test_dict, edited_dict, swap):
+    iso_graph = create_graph(ISO_15118)
+    old_graphs = (iso_graph, create_graph_from_dict(test_dict))
+    new_graphs = (iso_graph, create_graph_from_dict(edited_dict))
+    if swap:
+        old_graphs = old_graphs[::-1]
+        new_graphs = new_graphs[::-1]
+
+    old_matrices = calculate_matrices(*old_graphs, 4)
+    expected = calculate_matrices(*new_graphs, 6)
+
+    iterations = iterate_incremental_compatibility(*old_graphs, old_matrices, *new_graphs)
+    for i in range(7):
+        comp_matrix = next(iterations)
+        assert np.array_equal(comp_matrix.values.astype(float), expected[i].values.astype(float))
+
+
+def test_save_and_load_state(tmp_path):
+    path = os.path.join(tmp_path, "state.npz")
+    texts = []
+    for json_path in (ISO_15118, TEST_DATA):
+        with open(json_path, "r") as file:
+            texts.append(file.read())
+    graph1 = create_graph(ISO_15118)
+    graph2 = create_graph(TEST_DATA)
+    comp_matrices = calculate_matrices(graph1, graph2, 2)
+
+    save_state(path, texts, comp_matrices)
+    loaded_graph1, loaded_graph2, loaded_matrices, one_to_one = load_state(path)
+
+    assert loaded_graph1._name == graph1._name
+    assert len(loaded_graph2.get_states_list()) == len(graph2.get_states_list())
+    assert len(loaded_matrices) == 3
+    for loaded_matrix, comp_matrix in zip(loaded_matrices, comp_matrices):
+        assert list(loaded_matrix.index) == list(comp_matrix.index)
+        assert list(loaded_matrix.columns) == list(comp_matrix.columns)
+        assert np.array_equal(loaded_matrix.values, comp_matrix.values.astype(float))
+    assert one_to_one == False
+
+
+def test_one_to_one_state(tmp_path):
+    path = os.path.join(tmp_path, "state.npz")
+    # both emissions of a0 take the only reception of b0 in the plain best sum
+    dict1 = {"graph_name": "graph1",
+             "states": [create_state("a0", "initial", [("req", "emission", ["Id:string"], "a1"),
+                                                       ("req", "emission", ["Id:string", "Code:integer"], "a2")]),
+                        create_state("a1", "final"),
+                        create_state("a2", "final")]}
+    dict2 = {"graph_name": "graph2",
+             "states": [create_state("b0", "initial", [("req", "reception", ["Id:string"], "b1")]),
+                        create_state("b1", "final")]}
+    edited_dict2 = copy.deepcopy(dict2)
+    edited_dict2["states"].append(create_state("b2", "final"))
+    graph1 = create_graph_from_dict(dict1)
+    graph2 = create_graph_from_dict(dict2)
+    edited_graph2 = create_graph_from_dict(edited_dict2)
+
+    save_state(path, (json.dumps(dict1), json.dumps(dict2)), calculate_matrices(graph1, graph2, 2, True), True)
+    old_graph1, old_graph2, old_matrices, one_to_one = load_state(path)
+    expected = calculate_matrices(graph1, edited_graph2, 4, True)
+
+    assert one_to_one == True
+    assert not expected[-1].equals(calculate_matrices(graph1, edited_graph2, 4)[-1])
+    iterations = iterate_incremental_compatibility(old_graph1, old_graph2, old_matrices, graph1, edited_graph2,
+                                                   one_to_one=one_to_one)
+    for i in range(5):
+        comp_matrix = next(iterations)
+        assert np.array_equal(comp_matrix.values.astype(float), expected[i].values.astype(float))
@@ -0,0 +1,102 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for label.py module
+"""
+
+import os
+import pytest
+import numpy as np
+from .graph import Transition, TransitionType
+from .parser import create_graph
+from .label import LabelCompatibilityTable, transition_signature, transition_arrays, lab_comp_block
+from compatibility_calculation import calculate_lab_comp
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+@pytest.fixture
+def transitions() -> tuple:
+    emission = Transition(name="transition",
+                          next_state="next_state_1",
+                          type=TransitionType.EMISSION,
+                          params=["param1:type1", "param2:type2", "param3:type2"])
+    reception = Transition(name="transition",
+                           next_state="next_state_2",
+                           type=TransitionType.RECEPTION,
+                           params=["param1:type1", "param4:type3"])
+    same_signature = Transition(name="transition",
+                                next_state="next_state_3",
+                                type=TransitionType.RECEPTION,
+                                params=["other1:type3", "other2:type1"])
+    other_name = Transition(name="other_transition",
+                            next_state="next_state_4",
+                            type=TransitionType.RECEPTION,
+                            params=["param1:type1", "param4:type3"])
+    return (emission, reception, same_signature, other_name)
+
+
+def test_signature(transitions):
+    emission, reception, same_signature, other_name = transitions
+
+    assert transition_signature(emission) == ("transition", TransitionType.EMISSION, ("type1", "type2", "type2"))
+    assert transition_signature(reception) == transition_signature(same_signature)
+    assert transition_signature(reception) != transition_signature(other_name)
+
+
+def test_lookup(transitions):
+    emission, reception, same_signature, other_name = transitions
+    table = LabelCompatibilityTable()
+
+    assert table.get(emission, reception) == calculate_lab_comp(emission, reception)
+    assert table.get(reception, emission) == calculate_lab_comp(reception, emission)
+    assert table.get(emission, other_name) == 0
+    assert table.get(reception, same_signature) == 0
+    assert table.get(emission, emission) == 0
+
+    assert table.get_signature_id(reception) == table.get_signature_id(same_signature)
+    assert table.get_num_of_signatures() == 3
+
+
+def test_same_values_as_calculate_lab_comp():
+    graph1 = create_graph(ISO_15118)
+    graph2 = create_graph(TEST_DATA)
+    table = LabelCompatibilityTable(graph1, graph2)
+
+    transitions = []
+    for graph in (graph1, graph2):
+        for state in graph.get_states_list():
+            transitions += state.get_outgoing_transitions_list()
+
+    for transition1 in transitions:
+        for transition2 in transitions:
+            assert table.get(transition1, transition2) == calculate_lab_comp(transition1, transition2)
+
+
+def test_block_same_values_as_calculate_lab_comp(transitions):
+    graph1 = create_graph(ISO_15118)
+    graph2 = create_graph(TEST_DATA)
+    table = LabelCompatibilityTable(graph1, graph2)
+
+    emissions = list(transitions)
+    receptions = list(transitions)
+    for graph in (graph1, graph2):
+        for state in graph.get_states_list():
+            emissions += state.get_outgoing_emission_list()
+            receptions += state.get_outgoing_reception_list()
+    expected = np.array([[calculate_lab_comp(emission, reception) for reception in receptions]
+                         for emission in emissions])
+
+    name_ids = {}
+    assert np.array_equal(lab_comp_block(transition_arrays(emissions, name_ids),
+                                         transition_arrays(receptions, name_ids)), expected)
+    assert np.array_equal(table.get_block(emissions, receptions), expected)
+    assert table.get_block([], receptions).shape == (0, len(receptions))
@@ -0,0 +1,98 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for matches.py module
+"""
+
+import os
+import pytest
+import numpy as np
+from click.testing import CliRunner
+from . import matches
+from .matches import TopKAccumulator, top_k_indexes, top_k_matches
+from .parser import create_graph
+from .sparse import SparseCompatibility
+from compatibility_calculation import calculate_top_k, calculate_final_compatibility, get_top_k
+from compatibility_calculation import compatibility_calculation
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+def stable_top_k(values: np.ndarray, k: int) -> np.ndarray:
+    return np.array([np.argsort(-row, kind="stable")[:k] for row in values]).reshape(len(values), -1)
+
+
+@pytest.mark.parametrize("chunk_size", [1 << 20, 7])
+def test_same_result_as_sort(monkeypatch, chunk_size):
+    monkeypatch.setattr(matches, "CHUNK_SIZE", chunk_size)
+    generator = np.random.default_rng(0)
+    # few distinct values, so many ties
+    values = np.round(generator.random((30, 12)), 1)
+
+    for k in (0, 1, 3, 12, 20):
+        indexes, scores = top_k_indexes(values, k)
+        assert np.array_equal(indexes, stable_top_k(values, k))
+        assert np.array_equal(scores, np.take_along_axis(values, indexes, axis=1))
+
+        best = TopKAccumulator(len(values), k)
+        for start in range(0, values.shape[1], 5):
+            best.add(values[:, start:start + 5], start)
+        assert np.array_equal(best.get()[0], indexes)
+        assert np.array_equal(best.get()[1], scores)
+
+
+def test_top_k_of_both_graphs():
+    graph1 = create_graph(ISO_15118)
+    graph2 = create_graph(TEST_DATA)
+    comp_matrix, i = calculate_final_compatibility(graph1, graph2, 5)
+    sparse = SparseCompatibility(graph1, graph2)
+    for _ in range(5):
+        sparse.step()
+
+    table = calculate_top_k(graph1, graph2, 2, 5)
+    assert list(table.columns) == ["state1", "rank", "state2", "compatibility"]
+    assert len(table) == 2*len(comp_matrix.columns)
+    for state1, rows in table.groupby("state1"):
+        assert list(rows["rank"]) == [1, 2]
+        assert list(rows["compatibility"]) == sorted(comp_matrix[state1], reverse=True)[:2]
+    assert table.equals(sparse.top_k(2))
+
+    table = get_top_k(comp_matrix, 3, "graph2")
+    assert list(table.columns) == ["state2", "rank", "state1", "compatibility"]
+    for state2, rows in table.groupby("state2"):
+        assert list(rows["compatibility"]) == sorted(comp_matrix.loc[state2], reverse=True)[:3]
+        assert rows["compatibility"].iloc[0] == comp_matrix.loc[state2, rows["state1"].iloc[0]]
+    assert table.equals(sparse.top_k(3, "graph2"))
+    assert table.equals(calculate_top_k(graph1, graph2, 3, 5, engine="numpy", of="graph2"))
+
+    with pytest.raises(Exception, match="must be of graph1 or graph2"):
+        top_k_matches(comp_matrix.to_numpy(), list(comp_matrix.columns), list(comp_matrix.index), 2, "graph3")
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_invalid_k(tmp_path, k):
+    graphs = (create_graph(ISO_15118), create_graph(TEST_DATA))
+    matrix = np.zeros((3, 2))
+
+    with pytest.raises(Exception, match="at least 1"):
+        top_k_matches(matrix, ["a", "b"], ["c", "d", "e"], k)
+    with pytest.raises(Exception, match="at least 1"):
+        SparseCompatibility(*graphs).top_k(k)
+    with pytest.raises(Exception, match="at least 1"):
+        calculate_top_k(*graphs, k, 1, "numpy")
+    with pytest.raises(Exception, match="graph1 or graph2"):
+        calculate_top_k(*graphs, 1, 1, "numpy", of="graph3")
+
+    result = CliRunner().invoke(compatibility_calculation,
+                                ["--graph", ISO_15118, TEST_DATA, "--top-k", str(k),
+                                 "--output", os.path.join(tmp_path, "result.txt")])
+    assert result.exit_code == 2
+    assert "--top-k" in result.output
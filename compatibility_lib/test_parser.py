@@ -0,0 +1,102 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for parser.py module
+"""
+
+import os
+import json
+import copy
+import pytest
+import logging
+from . import parser
+from .parser import create_graph, create_graph_from_dict, create_graph_streaming
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+
+
+@pytest.fixture
+def test_dict() -> dict:
+    with open(TEST_DATA, "r") as file:
+        return json.load(file)
+
+
+def graph_content(graph) -> list:
+    content = [graph._name]
+    for state in graph.get_states_list():
+        content.append((state.get_name(), state._type,
+                        [(transition.name, transition.type, transition.params, transition.next_state)
+                         for transition in state.get_outgoing_transitions_list()],
+                        [(transition.name, transition.type, transition.params, transition.next_state)
+                         for transition in state.get_incoming_transitions_list()]))
+    return content
+
+
+def test_json_backends(monkeypatch):
+    graph = create_graph(TEST_DATA)
+    monkeypatch.setattr(parser, "orjson", None)
+    json_graph = create_graph(TEST_DATA)
+
+    assert [state.get_name() for state in graph.get_states_list()] == \
+           [state.get_name() for state in json_graph.get_states_list()]
+    for state, json_state in zip(graph.get_states_list(), json_graph.get_states_list()):
+        assert state._type == json_state._type
+        assert [(transition.name, transition.type, transition.params, transition.next_state)
+                for transition in state.get_incoming_transitions_list()] == \
+               [(transition.name, transition.type, transition.params, transition.next_state)
+                for transition in json_state.get_incoming_transitions_list()]
+
+
+@pytest.mark.parametrize("field, value, exception, message", [
+    ("state_type", "unknown", "states are not valid", "state_type property error"),
+    ("state_name", "", "states are not valid", "state_name properties error"),
+    ("transition_type", "unknown", "Transition has wrong format", "transition_type has wrong value, get = unknown"),
+    ("params", "integer", "Transition has wrong format", "params has wrong property invalid"),
+    ("transition_type", "tau", "Transition has wrong format", "tau transition must not have params"),
+    ("next_state", "unknown", "unknown next state = unknown", None),
+])
+def test_error_messages(test_dict, caplog, field, value, exception, message):
+    graph_dict = copy.deepcopy(test_dict)
+    if field.startswith("state"):
+        graph_dict["states"][2][field] = value
+    else:
+        graph_dict["states"][2]["transitions"][0][field] = value
+
+    caplog.set_level(logging.ERROR, logger="PARSER")
+    with pytest.raises(Exception, match=exception):
+        create_graph_from_dict(graph_dict)
+    if message is not None:
+        assert message in caplog.text
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_streaming_parser(tmp_path, test_dict, chunk_size):
+    assert graph_content(create_graph_streaming(TEST_DATA, chunk_size)) == graph_content(create_graph(TEST_DATA))
+
+    # graph name after the states, unknown key
+    path = os.path.join(tmp_path, "test.json")
+    with open(path, "w") as file:
+        json.dump({"states": test_dict["states"], "version": 1.25, "graph_name": test_dict["graph_name"]}, file)
+    assert graph_content(create_graph_streaming(path, chunk_size)) == graph_content(create_graph(TEST_DATA))
+
+
+@pytest.mark.parametrize("graph_dict, exception", [
+    ({"states": []}, "graph missing properties"),
+    ({"graph_name": "", "states": []}, "graph name is empty"),
+    ({"graph_name": "graph", "states": {}}, "graph does not have enough number of state"),
+    ({"graph_name": "graph", "states": [1, 2]}, "states are not valid"),
+])
+def test_streaming_parser_errors(tmp_path, graph_dict, exception):
+    path = os.path.join(tmp_path, "test.json")
+    with open(path, "w") as file:
+        json.dump(graph_dict, file)
+
+    with pytest.raises(Exception, match=exception):
+        create_graph_streaming(path)
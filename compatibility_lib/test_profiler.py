@@ -0,0 +1,105 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for profiler.py module
+"""
+
+import os
+import pytest
+from click.testing import CliRunner
+from .parser import create_graph
+from .profiler import Profiler
+import compatibility_calculation
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+class Calculation():
+    def add(self, value1, value2):
+        return value1 + value2
+
+
+def test_instrument_and_restore():
+    profiler = Profiler()
+    original = Calculation.add
+
+    profiler.instrument(Calculation, "add", "addition")
+    assert Calculation.add is not original
+    assert Calculation().add(1, 2) == 3
+    assert Calculation().add(value1=3, value2=4) == 7
+
+    profiler.restore()
+    assert Calculation.add is original
+    Calculation().add(1, 2)
+
+    table = profiler.get_phase_table()
+    assert table.loc["addition", "calls"] == 2
+    assert table.loc["total", "calls"] == 1
+
+
+def test_phase_with_exception():
+    profiler = Profiler()
+
+    with pytest.raises(ValueError):
+        with profiler.phase("failing"):
+            raise ValueError("error")
+
+    assert profiler.get_phase_table().loc["failing", "calls"] == 1
+
+
+def test_iterations():
+    profiler = Profiler()
+    add = profiler.wrap("addition", Calculation().add)
+
+    for i in range(3):
+        profiler.start_iteration()
+        for j in range(i):
+            add(i, j)
+        profiler.end_iteration(i)
+
+    table = profiler.get_iteration_table()
+    assert list(table.loc[0].index) == ["iteration"]
+    assert table.loc[(2, "addition"), "calls"] == 2
+    assert table.loc[(1, "addition"), "calls"] == 1
+    assert "Iterations:" in profiler.report()
+
+
+def test_sparse_iterations():
+    profiler = Profiler()
+
+    compatibility_calculation.calculate_sparse_compatibility(create_graph(TEST_DATA), create_graph(ISO_15118), 3,
+                                                             profiler=profiler)
+
+    table = profiler.get_iteration_table()
+    assert sorted(set(table.index.get_level_values("iteration"))) == [0, 1, 2, 3]
+
+
+def test_profile_sparse_engine(tmp_path):
+    output = os.path.join(tmp_path, "result.txt")
+    result = CliRunner().invoke(compatibility_calculation.compatibility_calculation,
+                                ["--graph", TEST_DATA, ISO_15118, "--iterate", "2", "--engine", "sparse", "--profile",
+                                 "--output", output])
+
+    assert result.exit_code == 0
+    iterations = result.output.split("Iterations:")[1]
+    assert "sparse: compile" in iterations
+    assert "sparse: step" in iterations
+
+
+def test_restore_after_exception(tmp_path):
+    original = compatibility_calculation.calculate_obs_comp
+    missing = os.path.join(tmp_path, "missing.json")
+    result = CliRunner().invoke(compatibility_calculation.compatibility_calculation,
+                                ["--graph", missing, missing, "--profile",
+                                 "--output", os.path.join(tmp_path, "result.txt")])
+
+    assert result.exit_code != 0
+    assert compatibility_calculation.calculate_obs_comp is original
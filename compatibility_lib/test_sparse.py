@@ -0,0 +1,68 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for sparse.py module
+"""
+
+import os
+import pytest
+import numpy as np
+from click.testing import CliRunner
+from .parser import create_graph
+from .engine import CompatibilityEngine
+from .sparse import SparseCompatibility
+from compatibility_calculation import compatibility_calculation
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+@pytest.mark.parametrize("swap", [False, True])
+def test_same_result_as_dense_engine(swap):
+    graphs = (create_graph(ISO_15118), create_graph(TEST_DATA))
+    if swap:
+        graphs = graphs[::-1]
+
+    engine = CompatibilityEngine(*graphs)
+    sparse = SparseCompatibility(*graphs)
+    assert sparse.get_num_of_stored_cells() < engine.shape[0]*engine.shape[1]
+
+    matrix = engine.initial_matrix()
+    for i in range(10):
+        matrix = engine.step(matrix)
+        delta = sparse.step()
+        assert np.array_equal(sparse.to_dataframe().values, matrix)
+        assert np.array_equal(sparse.get_column(1), matrix[:, 1])
+    assert delta > 0
+
+
+def test_top_k():
+    sparse = SparseCompatibility(create_graph(ISO_15118), create_graph(TEST_DATA))
+    for i in range(5):
+        sparse.step()
+    matrix = sparse.to_dataframe()
+
+    table = sparse.top_k(2)
+    assert len(table) == 2*len(matrix.columns)
+    for state1, rows in table.groupby("state1"):
+        assert list(rows["rank"]) == [1, 2]
+        assert list(rows["compatibility"]) == sorted(matrix[state1], reverse=True)[:2]
+        assert rows["compatibility"].iloc[0] == matrix.loc[rows["state2"].iloc[0], state1]
+
+
+@pytest.mark.parametrize("options", [["--stream"], ["--workers", "2"], ["--save-state", "state.npz"],
+                                     ["--one-to-one"]])
+def test_unsupported_options(tmp_path, options):
+    result = CliRunner().invoke(compatibility_calculation,
+                                ["--graph", ISO_15118, TEST_DATA, "--engine", "sparse",
+                                 "--output", os.path.join(tmp_path, "result.txt")] + options)
+
+    assert result.exit_code == 2
+    assert "{} is not supported by the sparse engine".format(options[0]) in result.output
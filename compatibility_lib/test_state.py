@@ -186,4 +186,32 @@ def test_add_outgoing_transition_to_final_state(final_state, transitions):
                             params=["param1:type1", "param2:type2"])
     
     with pytest.raises(Exception):
-        final_state.add_outgoing_transition(new_transition)
\ No newline at end of file
+        final_state.add_outgoing_transition(new_transition)
+
+def test_get_transition_by_type_after_add(normal_state:State, transitions):
+    new_emission = Transition(name="new_emission",
+                            next_state="new_transition_next",
+                            type=TransitionType.EMISSION,
+                            params=["param1:type1"])
+    
+    normal_state.add_outgoing_transition(new_emission)
+    
+    assert normal_state.get_outgoing_emission_list() == [transitions[2], new_emission]
+    assert normal_state.get_outgoing_reception_list() == [transitions[3]]
+    assert normal_state.get_outgoing_transtition("new_emission") == new_emission
+    assert normal_state.get_outgoing_transtition("unknown") == None
+
+
+def test_partitions_are_cached(normal_state:State, transitions):
+    emissions = normal_state.get_outgoing_emission_list()
+    assert emissions is normal_state.get_outgoing_emission_list()
+    
+    new_emission = Transition(name="new_emission",
+                            next_state="new_transition_next",
+                            type=TransitionType.EMISSION,
+                            params=["param1:type1"])
+    normal_state.add_outgoing_transition(new_emission)
+    
+    assert normal_state.get_outgoing_emission_list() == [transitions[2], new_emission]
+    assert normal_state.get_outgoing_tau_list() == []
+    assert normal_state.get_imcoming_tau_list() == []
@@ -0,0 +1,101 @@
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Development"
+
+"""Unit test for tau.py module
+"""
+
+import os
+import pytest
+import numpy as np
+from .graph import TransitionType
+from .parser import create_graph
+from .engine import CompatibilityEngine
+from .tau import TauClosure, find_components, has_tau_transition
+import compatibility_calculation
+from compatibility_calculation import calculate_compatibility, ParallelCompatibility
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "test_data", "test.json")
+TAU_DATA = os.path.join(os.path.dirname(__file__), "test_data", "tau.json")
+ISO_15118 = os.path.join(os.path.dirname(__file__), "..", "iso_15118.json")
+
+
+def test_find_components():
+    # 0 -> 1 <-> 2 -> 3, 3 -> 3
+    component = find_components([[1], [2], [1, 3], [3]])
+
+    assert component[1] == component[2]
+    assert len(set(component)) == 3
+    # reverse topological order
+    assert component[3] < component[1] < component[0]
+
+
+def test_tau_closure():
+    graph = create_graph(TAU_DATA)
+    closure = TauClosure(graph)
+    names = lambda states: [state.get_name() for state in states]
+    state = lambda name: graph.get_states_list()[closure.index[name]]
+
+    assert has_tau_transition(graph)
+    assert not has_tau_transition(create_graph(TEST_DATA))
+    assert graph.get_states_list()[1].get_outgoing_transitions_list()[-1].type == TransitionType.TAU
+
+    # the tau cycles b4 -> b4 and b3 <-> b7 are not followed
+    assert names(closure.get_neighbors(state("b4_Charging"))) == []
+    assert names(closure.get_neighbors(state("b3_ChargeScheduleWait"))) == []
+    assert names(closure.get_neighbors(state("b2_AuthorizeWait"))) == ["b6_Timeout"]
+    assert names(closure.get_neighbors(state("b6_Timeout"))) == ["b0_Idle", "b5_Final"]
+    assert names(closure.get_neighbors(state("b0_Idle"), backward=True)) == ["b1_CertWait", "b6_Timeout"]
+    assert not closure.has_observable(state("b6_Timeout"))
+    assert closure.has_observable(state("b2_AuthorizeWait"))
+    assert closure.forward_level[closure.index["b2_AuthorizeWait"]] == 2
+    assert closure.backward_level[closure.index["b0_Idle"]] == 2
+
+
+@pytest.mark.parametrize("swap", [False, True])
+def test_engine_same_result_as_python_calculation(swap):
+    graphs = (create_graph(TAU_DATA), create_graph(ISO_15118))
+    if swap:
+        graphs = graphs[::-1]
+    engine = CompatibilityEngine(*graphs)
+
+    comp_matrix = calculate_compatibility(*graphs, None)
+    matrix = engine.initial_matrix()
+    with ParallelCompatibility(*graphs, 2) as parallel:
+        parallel_matrix = comp_matrix
+        for _ in range(5):
+            comp_matrix = calculate_compatibility(*graphs, comp_matrix)
+            parallel_matrix = parallel.step(parallel_matrix)
+            matrix = engine.step(matrix)
+            assert np.array_equal(engine.to_array(comp_matrix), matrix)
+            assert np.array_equal(engine.to_array(parallel_matrix), matrix)
+
+    # the tau transitions change the compatibility of the states of test.json
+    graphs_without_tau = [create_graph(TEST_DATA) if graph._name == "ocpp_timeouts" else graph for graph in graphs]
+    engine_without_tau = CompatibilityEngine(*graphs_without_tau)
+    without_tau = engine_without_tau.to_dataframe(engine_without_tau.run(5))
+    with_tau = engine.to_dataframe(matrix).loc[without_tau.index, without_tau.columns]
+    assert not np.array_equal(with_tau.values, without_tau.values)
+
+
+@pytest.mark.parametrize("path", [TEST_DATA, TAU_DATA])
+def test_tau_detected_once_per_iteration(monkeypatch, path):
+    graph1 = create_graph(path)
+    graph2 = create_graph(ISO_15118)
+    expected = calculate_compatibility(graph1, graph2, calculate_compatibility(graph1, graph2, None))
+
+    calls = []
+    def counted_has_tau_transition(graph):
+        calls.append(graph)
+        return has_tau_transition(graph)
+    monkeypatch.setattr(compatibility_calculation, "has_tau_transition", counted_has_tau_transition)
+    comp_matrix = calculate_compatibility(graph1, graph2, calculate_compatibility(graph1, graph2, None))
+
+    assert len(calls) <= 2
+    assert comp_matrix.equals(expected)
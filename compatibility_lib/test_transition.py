@@ -49,6 +49,21 @@ def test_get_type_no_diplicate_normal_transition(normal_transition:Transition):
     assert len(types) == len(set(types))
 
 
+def test_params_are_split_once(normal_transition:Transition):
+    assert normal_transition.params == ("param1:type1", "param2:type2", "param3:type3")
+    assert normal_transition.params.pairs == (("param1", "type1"), ("param2", "type2"), ("param3", "type3"))
+    assert normal_transition.params.data_type_set == frozenset(["type1", "type2", "type3"])
+    
+    other_transition = Transition(name="other_transition",
+                                  next_state="next_state",
+                                  type=TransitionType.RECEPTION,
+                                  params=["param1:type1", "param2:type2", "param3:type3"])
+    assert other_transition.params is normal_transition.params
+    
+    with pytest.raises(AttributeError):
+        normal_transition.unknown_attribute = None
+
+
 def test_create_tau_transition_with_no_empty_params():
     with pytest.raises(Exception):
         tau_transition = Transition(name="test_transition",
@@ -61,4 +76,20 @@ def test_create_tau_transition_with_empty_params():
     tau_transition = Transition(name="test_transition",
                                 next_state="next_state",
                                 type=TransitionType.TAU)
-    assert tau_transition.params == []
\ No newline at end of file
+    assert tau_transition.params == ()
+
+
+def test_default_params_are_immutable():
+    tau_transition = Transition(name="test_transition",
+                                next_state="next_state",
+                                type=TransitionType.TAU)
+    with pytest.raises(AttributeError):
+        tau_transition.params.append("param1:type1")
+    
+    params = ["param1:type1"]
+    transition = Transition(name="test_transition",
+                            next_state="next_state",
+                            type=TransitionType.EMISSION,
+                            params=params)
+    params.append("param2:type2")
+    assert transition.params == ("param1:type1",)
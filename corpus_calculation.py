@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Prototype"
+
+""" Calculate the compatibility between every pair of graphs of a corpus
+
+The compatibility matrix of (graph2, graph1) is the transpose of the matrix of
+(graph1, graph2), so only the N(N-1)/2 unordered pairs are calculated and the
+global compatibility is reported in both directions. Every finished pair is
+appended to the scores file right away, together with a hash of the two json
+files, so an interrupted run can be resumed without calculating the same
+pairs again.
+"""
+
+from compatibility_lib import create_graph
+from compatibility_calculation import calculate_final_compatibility
+from compatibility_calculation import calculate_initial_compatibility
+from batch_calculation import find_candidates
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import hashlib
+import logging
+import click
+import time
+import csv
+import io
+import os
+
+
+# create logger
+logger = logging.getLogger("CORPUS")
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+SCORES_COLUMNS = ["graph1", "graph2", "hash1", "hash2", "iterations",
+                  "initial_comp", "global_comp_1", "global_comp_2", "time"]
+
+# graphs of the corpus in a worker process, set once by init_worker
+_graphs = None
+
+
+def hash_file(path:str) -> str:
+    """Hash the content of a file
+
+    Args:
+        path (str): path to the file
+
+    Returns:
+        str: short sha256 of the content
+    """
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+
+def read_done_pairs(scores_path:str) -> set:
+    """Read the pairs already stored in a scores file
+
+    Args:
+        scores_path (str): path to the scores file
+
+    Returns:
+        set: (graph1, hash1, graph2, hash2) of the finished pairs
+    """
+    done = set()
+    if os.path.isfile(scores_path) == False:
+        return done
+
+    with open(scores_path, "r", newline="") as file:
+        content = file.read()
+    # a row cut by an interruption has no line end, it is calculated again
+    if content.endswith("\n") == False:
+        content = content[:content.rfind("\n") + 1]
+
+    for row in csv.DictReader(io.StringIO(content, newline="")):
+        if row.get("time") not in (None, ""):
+            done.add((row["graph1"], row["hash1"], row["graph2"], row["hash2"]))
+
+    return done
+
+
+def remove_cut_row(scores_path:str):
+    """Remove the last row of a scores file if it was cut by an interruption,
+    so the next row is appended on a new line
+
+    Args:
+        scores_path (str): path to the scores file
+    """
+    if os.path.isfile(scores_path) == False:
+        return
+
+    with open(scores_path, "rb+") as file:
+        content = file.read()
+        if len(content) > 0 and content.endswith(b"\n") == False:
+            logger.warning("remove the cut row at the end of %s", scores_path)
+            file.truncate(content.rfind(b"\n") + 1)
+
+
+def init_worker(graphs:dict, log_level:int):
+    """Initialize a worker process, the graphs are sent only once per worker
+
+    Args:
+        graphs (dict): path -> parsed graph
+        log_level (int): level of the COMPATIBILITY logger
+    """
+    global _graphs
+    _graphs = graphs
+    logging.getLogger("COMPATIBILITY").setLevel(log_level)
+
+
+def compare_pair(path1:str, path2:str, iterate:int, engine:str, tolerance:float = None) -> dict:
+    """Calculate the compatibility of one pair of the corpus
+
+    Args:
+        path1 (str): path to the first graph
+        path2 (str): path to the second graph
+        iterate (int): (maximum) number of iteration
+        engine (str): "python", "numpy" or "worklist"
+        tolerance (float, optional): early stopping tolerance. Defaults to None.
+
+    Returns:
+        dict: scores of the pair
+    """
+    start_time = time.perf_counter()
+    graph1 = _graphs[path1]
+    graph2 = _graphs[path2]
+
+    comp_matrix, iterations = calculate_final_compatibility(graph1, graph2, iterate, engine, tolerance)
+    values = comp_matrix.to_numpy(dtype=float)
+
+    return {
+        "iterations": iterations,
+        "initial_comp": calculate_initial_compatibility(graph1, graph2, comp_matrix),
+        # best match of every state of graph1 in graph2, and the other way round
+        "global_comp_1": round(float(values.max(axis=0).mean()), 3),
+        "global_comp_2": round(float(values.max(axis=1).mean()), 3),
+        "time": round(time.perf_counter() - start_time, 3),
+    }
+
+
+def calculate_corpus(paths:list,
+                     scores_path:str,
+                     iterate:int,
+                     engine:str = "python",
+                     tolerance:float = None,
+                     jobs:int = None,
+                     log_level:int = logging.CRITICAL) -> pd.DataFrame:
+    """Calculate all the missing pairs of a corpus and append them to the scores file
+
+    Args:
+        paths (list): paths to the json files of the corpus
+        scores_path (str): path to the scores file
+        iterate (int): (maximum) number of iteration
+        engine (str, optional): "python", "numpy" or "worklist". Defaults to "python".
+        tolerance (float, optional): early stopping tolerance. Defaults to None.
+        jobs (int, optional): number of worker processes. Defaults to None,
+                              i.e. number of cores.
+        log_level (int, optional): level of the COMPATIBILITY logger in the
+                                   workers. Defaults to logging.CRITICAL.
+
+    Returns:
+        pd.DataFrame: every score of the scores file
+    """
+    hashes = {path: hash_file(path) for path in paths}
+    remove_cut_row(scores_path)
+    done = read_done_pairs(scores_path)
+
+    pairs = []
+    for i, path1 in enumerate(paths):
+        for path2 in paths[i + 1:]:
+            if (path1, hashes[path1], path2, hashes[path2]) not in done:
+                pairs.append((path1, path2))
+
+    num_of_pairs = len(paths)*(len(paths) - 1)//2
+    logger.info("%d pairs, %d already done, %d to calculate", num_of_pairs, num_of_pairs - len(pairs), len(pairs))
+
+    if len(pairs) > 0:
+        # every graph is parsed only once
+        needed = set(path for pair in pairs for path in pair)
+        graphs = {path: create_graph(path) for path in paths if path in needed}
+
+        new_file = os.path.isfile(scores_path) == False or os.path.getsize(scores_path) == 0
+        with open(scores_path, "a", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=SCORES_COLUMNS)
+            if new_file:
+                writer.writeheader()
+
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     initializer=init_worker,
+                                     initargs=(graphs, log_level)) as executor:
+                futures = {executor.submit(compare_pair, path1, path2, iterate, engine, tolerance): (path1, path2)
+                           for path1, path2 in pairs}
+
+                for future in as_completed(futures):
+                    path1, path2 = futures[future]
+                    try:
+                        scores = future.result()
+                    except Exception as error:
+                        logger.error("pair = (%s, %s) failed: %s", path1, path2, error)
+                        continue
+
+                    scores.update({"graph1": path1, "graph2": path2,
+                                   "hash1": hashes[path1], "hash2": hashes[path2]})
+                    writer.writerow(scores)
+                    file.flush()
+                    logger.info("pair = (%s, %s) done", path1, path2)
+
+    return pd.read_csv(scores_path)
+
+
+def create_score_table(scores:pd.DataFrame, paths:list) -> pd.DataFrame:
+    """Arrange the global compatibilities in a NxN table
+
+    Args:
+        scores (pd.DataFrame): content of the scores file
+        paths (list): paths to the json files of the corpus
+
+    Returns:
+        pd.DataFrame: global compatibility of the row graph with the column graph
+    """
+    table = pd.DataFrame(index=paths, columns=paths, dtype=float)
+    scores = scores.drop_duplicates(subset=["graph1", "graph2"], keep="last")
+
+    for row in scores.itertuples():
+        if row.graph1 in table.index and row.graph2 in table.index:
+            table.loc[row.graph1, row.graph2] = row.global_comp_1
+            table.loc[row.graph2, row.graph1] = row.global_comp_2
+
+    return table
+
+
+@click.command()
+@click.option("--corpus", required=True, help="directory or glob pattern of the json files of the corpus")
+@click.option("--iterate", help="number of iteration", default = 1)
+@click.option("--tolerance", help="stop a comparison early when the max change of an iteration is below this value",
+              type=float, default = None)
+@click.option("--engine", help="calculation engine: python, numpy or worklist", default = "python",
+              type=click.Choice(["python", "numpy", "worklist"]))
+@click.option("--jobs", help="number of worker processes, default is the number of cores", type=int, default = None)
+@click.option("--output", help="csv file aggregating the scores, finished pairs are not calculated again",
+              default = "corpus_scores.csv")
+@click.option("--log_level", help="logging level: info, debug, or none", default = "none")
+def corpus_calculation(corpus, iterate, tolerance, engine, jobs, output, log_level):
+    if log_level == "info":
+        worker_log_level = logging.INFO
+    elif log_level == "debug":
+        worker_log_level = logging.DEBUG
+    else:
+        worker_log_level = logging.CRITICAL
+
+    paths = find_candidates(corpus)
+    if len(paths) < 2:
+        logger.error("the corpus %s must contain at least 2 graphs", corpus)
+        return
+
+    scores = calculate_corpus(paths, output, iterate, engine, tolerance, jobs, worker_log_level)
+
+    print("")
+    print("Global compatibility (row graph -> column graph):")
+    print(create_score_table(scores, paths).to_string())
+    print("")
+    print("Corpus calculation is complete. The scores are exported to {}".format(output))
+
+
+if __name__ == "__main__":
+    corpus_calculation()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+__author__ = "Quang Hai, Nguyen"
+__copyright__ = "Copyright 2023, Protocol Compatibility Measurement"
+__credits__ = ["Quang Hai, Nguyen"]
+__license__ = "GPL"
+__version__ = "0.0.1"
+__maintainer__ = "Quang Hai"
+__email__ = "hai.nguyen.quang@outlook.com"
+__status__ = "Prototype"
+
+""" Calculate the compatibility of edited graphs from a previous run
+
+The previous run is stored with compatibility_calculation.py --save-state. A
+state is edited when it is new, or when its type, its outgoing transitions or
+its incoming transitions have changed. At each iteration, a cell is calculated
+again only when one of its states is edited, or when the cell itself or one of
+the cells it reads through the next states of the transitions has a different
+value than in the previous run. The other cells are copied from the previous
+run, so the result is the same as a calculation from scratch.
+"""
+
+from compatibility_lib import Graph, State
+from compatibility_lib import create_graph
+from compatibility_lib import load_data_type_table
+from compatibility_lib import LabelCompatibilityTable
+from compatibility_lib import CompatibilityEngine
+from compatibility_lib import TauClosure, has_tau_transition
+from compatibility_calculation import calculate_compatibility
+from compatibility_calculation import calculate_pair_compatibility
+from compatibility_calculation import create_tau_propagation
+from compatibility_calculation import NO_TAU_PROPAGATION
+from compatibility_calculation import load_state, save_state
+from compatibility_calculation import write_result
+import pandas as pd
+import numpy as np
+import logging
+import click
+import os
+
+
+# create logger
+logger = logging.getLogger("INCREMENTAL")
+logger.setLevel(logging.INFO)
+#logger.setLevel(logging.DEBUG)
+#logger.setLevel(logging.WARNING)
+#logger.setLevel(logging.ERROR)
+#logger.setLevel(logging.CRITICAL)
+
+# create console handler and set level to debug
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+
+# create formatter
+formatter = logging.Formatter('%(name)s - %(funcName)s - %(levelname)s - %(message)s')
+
+# add formatter to ch
+ch.setFormatter(formatter)
+
+# add ch to logger
+logger.addHandler(ch)
+
+
+def transition_key(transition) -> tuple:
+    """Everything of a transition the calculation depends on
+
+    Args:
+        transition (Transition): the transition
+
+    Returns:
+        tuple: name, type, parameters and next state of the transition
+    """
+    return (transition.name, transition.type, tuple(transition.params), transition.next_state)
+
+
+def state_signature(state:State) -> tuple:
+    """Everything of a state the calculation of its cells depends on
+
+    Args:
+        state (State): the state
+
+    Returns:
+        tuple: type, outgoing and incoming transitions of the state
+    """
+    return (state._type,
+            tuple(transition_key(transition) for transition in state.get_outgoing_transitions_list()),
+            tuple(transition_key(transition) for transition in state.get_incoming_transitions_list()))
+
+
+def find_edited_states(old_graph:Graph, new_graph:Graph) -> list:
+    """Find the states of the new graph which are new or changed
+
+    A removed state is not listed, the states with a transition to it are
+    changed.
+
+    Args:
+        old_graph (Graph): graph of the previous run
+        new_graph (Graph): edited graph
+
+    Returns:
+        list: names of the edited states
+    """
+    old_signatures = {state.get_name(): state_signature(state) for state in old_graph.get_states_list()}
+
+    return [state.get_name() for state in new_graph.get_states_list()
+            if old_signatures.get(state.get_name()) != state_signature(state)]
+
+
+def get_predecessors(graph:Graph) -> list:
+    """Get the states with a transition to each state
+
+    Args:
+        graph (Graph): the graph
+
+    Returns:
+        list: for the state at each index, the indexes of its predecessors
+    """
+    states = graph.get_states_list()
+    index = {state.get_name(): i for i, state in enumerate(states)}
+
+    predecessors = [set() for state in states]
+    for i, state in enumerate(states):
+        for transition in state.get_outgoing_transitions_list():
+            predecessors[index[transition.next_state]].add(i)
+
+    return [sorted(states) for states in predecessors]
+
+
+def iterate_incremental_compatibility(old_graph1:Graph,
+                                      old_graph2:Graph,
+                                      old_matrices:list,
+                                      graph1:Graph,
+                                      graph2:Graph,
+                                      engine:str = "python",
+                                      lab_comp_table:LabelCompatibilityTable = None,
+                                      one_to_one:bool = False):
+    """Generate the compatibility matrices of the edited graphs for the
+    iterations 0, 1, 2, ...
+
+    The iterations of the previous run are replayed incrementally, the next
+    ones are fully calculated from the last replayed matrix.
+
+    Args:
+        old_graph1 (Graph): graph1 of the previous run
+        old_graph2 (Graph): graph2 of the previous run
+        old_matrices (list): matrices of the iterations of the previous run
+        graph1 (Graph): edited graph1
+        graph2 (Graph): edited graph2
+        engine (str, optional): engine of the iterations after the previous
+                                run, "python" or "numpy". Defaults to "python".
+        lab_comp_table (LabelCompatibilityTable, optional): label compatibility
+                                of the edited graphs. Defaults to None.
+        one_to_one (bool, optional): one-to-one best sums, as in the previous
+                                     run. Defaults to False.
+
+    Yields:
+        pd.DataFrame: compatibility matrix of the next iteration
+    """
+    if lab_comp_table is None:
+        lab_comp_table = LabelCompatibilityTable(graph1, graph2)
+
+    states1 = graph1.get_states_list()
+    states2 = graph2.get_states_list()
+    index = [state.get_name() for state in states2]
+    columns = [state.get_name() for state in states1]
+    shape = (len(index), len(columns))
+
+    edited1 = set(find_edited_states(old_graph1, graph1))
+    edited2 = set(find_edited_states(old_graph2, graph2))
+    logger.info("edited states: %d in %s, %d in %s", len(edited1), graph1._name, len(edited2), graph2._name)
+
+    # the cells of an edited state are calculated at every iteration
+    edited_mask = np.zeros(shape, dtype=bool)
+    edited_mask[[i for i, name in enumerate(index) if name in edited2], :] = True
+    edited_mask[:, [i for i, name in enumerate(columns) if name in edited1]] = True
+
+    predecessors1 = get_predecessors(graph1)
+    predecessors2 = get_predecessors(graph2)
+
+    # a cell also reads the cells reached by the tau transitions of its
+    # states, so with tau every cell is calculated
+    tau_closures = None
+    if has_tau_transition(graph1) or has_tau_transition(graph2):
+        logger.info("tau transitions, every cell is calculated")
+        tau_closures = (TauClosure(graph1), TauClosure(graph2))
+        edited_mask[:] = True
+
+    comp_matrix = calculate_compatibility(graph1, graph2, None)
+    yield comp_matrix
+
+    # iteration 0 is all ones in both runs
+    changed = []
+    for old_matrix in old_matrices[1:]:
+        # cells of new states are NaN, they are always calculated
+        old_array = old_matrix.reindex(index=index, columns=columns).to_numpy(dtype=np.float64)
+
+        mask = edited_mask.copy()
+        for row, column in changed:
+            mask[row, column] = True
+            mask[np.ix_(predecessors2[row], predecessors1[column])] = True
+
+        next_array = old_array.copy()
+        rows, cols = np.nonzero(mask)
+        propagation = NO_TAU_PROPAGATION
+        if tau_closures is not None:
+            propagation = create_tau_propagation(graph1, graph2, comp_matrix, lab_comp_table, one_to_one,
+                                                 tau_closures=tau_closures)
+        for row, column in zip(rows, cols):
+            compatibility = calculate_pair_compatibility(states1[column], states2[row], graph1, graph2,
+                                                         comp_matrix, lab_comp_table, one_to_one=one_to_one,
+                                                         propagation=propagation)
+            next_array[row, column] = round(compatibility,3)
+
+        changed = [(row, column) for row, column in zip(rows, cols)
+                   if not next_array[row, column] == old_array[row, column]]
+        logger.info("%d cells calculated, %d changed", len(rows), len(changed))
+
+        comp_matrix = pd.DataFrame(next_array, index=index, columns=columns)
+        yield comp_matrix
+
+    logger.info("no more iteration in the previous run, full calculation")
+    if engine == "numpy":
+        compiled = CompatibilityEngine(graph1, graph2, lab_comp_table, one_to_one)
+        matrix = compiled.to_array(comp_matrix)
+        while True:
+            matrix = compiled.step(matrix)
+            yield compiled.to_dataframe(matrix)
+    else:
+        while True:
+            comp_matrix = calculate_compatibility(graph1, graph2, comp_matrix, lab_comp_table, one_to_one,
+                                                  tau_closures=tau_closures)
+            yield comp_matrix
+
+
+@click.command()
+@click.option("--state", required=True, help="npz file of the previous run, from compatibility_calculation.py --save-state")
+@click.option("--graph", nargs = 2, help="path to the json files containing the edited graphs, same order as the previous run")
+@click.option("--iterate", help="number of iteration", default = 1)
+@click.option("--output", help="file to store the calculation", default = "result.txt")
+@click.option("--engine", help="calculation engine of the iterations after the previous run: python or numpy",
+              default = "python", type=click.Choice(["python", "numpy"]))
+@click.option("--save-state", "state_path", help="npz file to store the edited graphs and the new matrices",
+              default = None)
+@click.option("--data-types", "data_types_path", help="json file of the equivalent data types, the same as in the "
+              "previous run", default = None)
+def incremental_calculation(state, graph, iterate, output, engine, state_path, data_types_path):
+    if(len(graph) != 2):
+        logger.error("Invalid number of graph. Must be 2")
+        return
+
+    data_type_table = None
+    if data_types_path is not None:
+        data_type_table = load_data_type_table(data_types_path)
+
+    old_graph1, old_graph2, old_matrices, one_to_one = load_state(state, data_type_table)
+    logger.info("previous run: %d iterations, one-to-one = %s", len(old_matrices) - 1, one_to_one)
+
+    graph_texts = []
+    for path in graph:
+        with open(path, "r") as file:
+            graph_texts.append(file.read())
+    graph1 = create_graph(graph[0], data_type_table)
+    graph2 = create_graph(graph[1], data_type_table)
+
+    comp_matrices = []
+    for i, comp_matrix in enumerate(iterate_incremental_compatibility(old_graph1, old_graph2, old_matrices,
+                                                                      graph1, graph2, engine,
+                                                                      one_to_one=one_to_one)):
+        comp_matrices.append(comp_matrix)
+        if i == iterate:
+            break
+
+    if os.path.isfile(output) == True:
+        os.remove(output)
+
+    with open(output, "a") as file:
+        print("Results:")
+        for i in range(len(comp_matrices)):
+            write_result(file, i, comp_matrices[i])
+
+    if state_path is not None:
+        save_state(state_path, graph_texts, comp_matrices, one_to_one)
+        print("State is exported to {}".format(state_path))
+
+    print("Incremental calculation is complete. The result is exported to {}".format(output))
+
+
+if __name__ == "__main__":
+    incremental_calculation()